@@ -24,6 +24,10 @@ from .cmd_demo import Demo
 from .cmd_helper import Helper
 from .cmd_history import History
 from .cmd_schema import Schema
+from .cmd_pack import Pack
+from .cmd_stats import Stats
+from .cmd_gc import GC
+from .cmd_prune import Prune
 from ..utils.io import print_msg
 
 
@@ -49,6 +53,10 @@ def main():
         Helper(),
         History(),
         Schema(),
+        Pack(),
+        Stats(),
+        GC(),
+        Prune(),
     ]
     for cmd in commands:
         cmd.create_parser(subparsers)
@@ -80,5 +88,9 @@ __all__ = [
     "Demo",
     "Helper",
     "History",
+    "Pack",
+    "Stats",
+    "GC",
+    "Prune",
     "main",
 ]
@@ -0,0 +1,54 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+""""now gc" command"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import os
+
+from ..persistence import persistence_config
+from ..persistence.garbage import GarbageCollector
+from ..utils.io import print_msg
+
+from .cmd_stats import size_text
+from .command import Command
+
+
+class GC(Command):
+    """Remove contents that are not referenced by any trial"""
+
+    def add_arguments(self):
+        add_arg = self.add_argument
+        add_arg("-t", "--time-budget", type=float, default=0,
+                help="stop after this number of seconds and resume in the "
+                     "next execution. Use 0 for no limit (default: 0)")
+        add_arg("-g", "--grace", type=float, default=3600,
+                help="keep contents modified in the last GRACE seconds "
+                     "(default: 3600)")
+        add_arg("-n", "--dry-run", action="store_true",
+                help="only report what would be removed")
+        add_arg("--no-vacuum", action="store_true",
+                help="do not VACUUM the database after a complete collection")
+        add_arg("--dir", type=str,
+                help="set project path where is the database. Default to "
+                     "current directory")
+
+    def execute(self, args):
+        persistence_config.connect_existing(args.dir or os.getcwd())
+        collector = GarbageCollector(
+            grace=args.grace, time_budget=args.time_budget,
+            dry_run=args.dry_run
+        ).collect(vacuum=not args.no_vacuum)
+        verb = "would remove" if args.dry_run else "removed"
+        print_msg("{} {} contents ({}) from {} live contents".format(
+            verb, collector.removed_objects,
+            size_text(collector.removed_bytes), len(collector.live)), True)
+        if collector.repacked:
+            print_msg("rewrote {} packfiles".format(collector.repacked), True)
+        if collector.removed_memo:
+            print_msg("{} {} hash cache entries".format(
+                verb, collector.removed_memo), True)
+        if not collector.complete:
+            print_msg("time budget expired. Run it again to continue", True)
@@ -0,0 +1,31 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+""""now pack" command"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import os
+
+from ..persistence import persistence_config, content
+from ..utils.io import print_msg
+
+from .command import Command
+
+
+class Pack(Command):
+    """Move loose contents of the content database into packfiles"""
+
+    def add_arguments(self):
+        add_arg = self.add_argument
+        add_arg("--keep-loose", action="store_true",
+                help="do not remove loose contents after packing them")
+        add_arg("--dir", type=str,
+                help="set project path where is the database. Default to "
+                     "current directory")
+
+    def execute(self, args):
+        persistence_config.connect_existing(args.dir or os.getcwd())
+        count, size = content.pack_loose_objects(remove=not args.keep_loose)
+        print_msg("packed {} contents ({} bytes)".format(count, size), True)
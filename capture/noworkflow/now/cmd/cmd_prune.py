@@ -0,0 +1,79 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+""""now prune" command"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import argparse
+import os
+
+from datetime import datetime
+
+from ..persistence import persistence_config
+from ..persistence.garbage import GarbageCollector
+from ..persistence.retention import RetentionPolicy, prune_trials
+from ..utils.io import print_msg
+
+from .cmd_run import non_negative
+from .cmd_stats import size_text
+from .command import Command
+
+
+def date(string):
+    """Parse date argument"""
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(string, fmt)
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(
+        "{} is not a date in the format YYYY-MM-DD [HH:MM[:SS]]"
+        .format(string))
+
+
+class Prune(Command):
+    """Remove old trials according to retention policies"""
+
+    def add_arguments(self):
+        add_arg = self.add_argument
+        add_arg("-l", "--keep-last", type=non_negative,
+                help="keep the last KEEP_LAST trials of each script")
+        add_arg("-s", "--keep-since", type=date,
+                help="keep trials that started after this date "
+                     "(YYYY-MM-DD [HH:MM[:SS]])")
+        add_arg("--no-keep-tagged", action="store_false", dest="keep_tagged",
+                help="also remove trials with user defined tags")
+        add_arg("-n", "--dry-run", action="store_true",
+                help="only list trials that would be removed")
+        add_arg("--no-gc", action="store_true",
+                help="do not remove unreferenced contents after pruning")
+        add_arg("--dir", type=str,
+                help="set project path where is the database. Default to "
+                     "current directory")
+
+    def execute(self, args):
+        if args.keep_last is None and args.keep_since is None:
+            print_msg("at least one of --keep-last and --keep-since is "
+                      "required", True)
+            return
+        persistence_config.connect_existing(args.dir or os.getcwd())
+        policy = RetentionPolicy(
+            keep_last=args.keep_last, keep_since=args.keep_since,
+            keep_tagged=args.keep_tagged)
+        keep, remove = policy.select()
+        if args.dry_run:
+            print_msg("would remove {} trials and keep {}".format(
+                len(remove), len(keep)), True)
+            if remove:
+                print("  " + " ".join(str(tid) for tid in sorted(remove)))
+            return
+        prune_trials(remove)
+        print_msg("removed {} trials. Kept {}".format(
+            len(remove), len(keep)), True)
+        if remove and not args.no_gc:
+            collector = GarbageCollector().collect()
+            print_msg("removed {} contents ({})".format(
+                collector.removed_objects,
+                size_text(collector.removed_bytes)), True)
@@ -15,10 +15,12 @@ from future.utils import viewitems
 
 from ..collection.metadata import Metascript
 from ..persistence.models import Trial, Module, Dependency, FileAccess
-from ..persistence import persistence_config, content
+from ..persistence.models import HashCache
+from ..persistence import persistence_config, content, relational
 from ..utils.io import print_msg
 
 from .command import Command
+from .cmd_run import non_negative
 
 
 class Restore(Command):
@@ -41,6 +43,9 @@ class Restore(Command):
                 help="skip local modules")
         add_arg("-a", "--skip-access", action="store_true",
                 help="skip file access")
+        add_arg("--hash-cache-size", type=non_negative, default=100000,
+                help="maximum number of file hashes memoized by path and "
+                     "stat. Use 0 to disable it (default: 100000)")
 
         add_arg("-f", "--file", nargs=argparse.REMAINDER,
                 type=str,
@@ -79,10 +84,11 @@ class Restore(Command):
             )
         )
 
-        tid, partial = metascript.trial_id, True
-        Module.fast_store(tid, modules, partial)
-        Dependency.fast_store(tid, dependencies, partial)
-        FileAccess.fast_store(tid, accesses, partial)
+        tid, partial = metascript.trial_id, False
+        with relational.store_transaction():
+            Module.fast_store(tid, modules, partial)
+            Dependency.fast_store(tid, dependencies, partial)
+            FileAccess.fast_store(tid, accesses, partial)
 
         print_msg("Backup Trial {} created".format(metascript.trial_id),
                   self.print_msg)
@@ -132,6 +138,14 @@ class Restore(Command):
 
     def execute(self, args):
         persistence_config.connect_existing(args.dir or os.getcwd())
+        HashCache.load_memo(args.hash_cache_size)
+        try:
+            self._execute(args)
+        finally:
+            HashCache.store_memo(args.hash_cache_size)
+
+    def _execute(self, args):
+        """Restore files or create backup trial"""
         metascript = Metascript().read_restore_args(args)
         self.trial = trial = metascript.trial = Trial(trial_ref=args.trial)
         metascript.trial_id = trial.id
@@ -232,8 +246,7 @@ def file_hash(path):
     if not os.path.isfile(abs_path):
         return None
     else:
-        with open(abs_path, "rb") as fil:
-            return content.put(fil.read())
+        return content.put_file(abs_path)
 
 
 def skip_dict(args):
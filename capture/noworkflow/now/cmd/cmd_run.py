@@ -11,7 +11,11 @@ import os
 import sys
 
 from ..collection.metadata import Metascript
-from ..persistence.models import Tag, Trial
+from ..persistence import content, relational
+from ..persistence.content_database import BACKENDS
+from ..persistence.models import Tag, Trial, HashCache
+from ..persistence.relational_database import SYNCHRONOUS
+from ..persistence.serializers import SERIALIZERS
 from ..utils import io, metaprofiler
 from ..utils.cross_version import PY3
 
@@ -27,6 +31,16 @@ def non_negative(string):
     return value
 
 
+def sample_rate(string):
+    """Check if argument is an interval >= 1 or a probability in (0, 1)"""
+    value = float(string)
+    if value <= 0 or (value > 1 and value != int(value)):
+        raise argparse.ArgumentTypeError(
+            "{} is neither an integer interval nor a probability"
+            "".format(string))
+    return int(value) if value >= 1 else value
+
+
 class ScriptArgs(argparse.Action):                                               # pylint: disable=too-few-public-methods
     """Action to create script attribute"""
     def __call__(self, parser, namespace, values, option_string=None):
@@ -48,8 +62,15 @@ class ScriptArgs(argparse.Action):
 def run(metascript):
     """Execute noWokflow to capture provenance from script"""
     try:
+        HashCache.load_memo(metascript.hash_cache_size)
+        content.backend = metascript.content_backend
+        content.chunking = metascript.content_chunking
+        relational.synchronous = metascript.synchronous
         metascript.trial_id = Trial.store(*metascript.create_trial_args())
         Tag.create_automatic_tag(*metascript.create_automatic_tag_args())
+        if metascript.capture_in_memory:
+            relational.start_memory_capture(
+                metascript.memory_flush * 1024 * 1024)
 
         io.print_msg("collecting definition provenance")
         metascript.definition.collect_provenance()
@@ -66,6 +87,8 @@ def run(metascript):
         metaprofiler.meta_profiler.save()
 
     finally:
+        relational.stop_memory_capture()
+        HashCache.store_memo(metascript.hash_cache_size)
         metascript.create_last()
 
 
@@ -96,6 +119,10 @@ class Run(Command):
         add_arg("-b", "--bypass-modules", action="store_true",
                 help="bypass module dependencies analysis, assuming that no "
                      "module changes occurred since last execution")
+        add_arg("--hash-cache-size", type=non_negative, default=100000,
+                help="maximum number of file hashes memoized by path and "
+                     "stat in the provenance store. Unchanged files are not "
+                     "read again. Use 0 to disable it (default: 100000)")
 
         # Execution
         if not self.is_ipython:
@@ -111,13 +138,15 @@ class Run(Command):
                      "selected context (default: 1)")
         add_arg("-e", "--execution-provenance",
                 default=self.default_execution_provenance,
-                choices=["Profiler", "Tracer", "Tracker"],
+                choices=["Profiler", "Tracer", "Tracker", "Instrumenter"],
                 help="R|execution provenance provider. (default: Profiler)\n"
                      "Profiler captures function calls, parameters, file \n"
                      "accesses, and globals. \n"
                      "Tracker captures everything the Profiler captures, \n"
                      "in addition to variables and dependencies.\n"
-                     "Tracer is an alias to Tracker")
+                     "Tracer is an alias to Tracker.\n"
+                     "Instrumenter captures what the Profiler captures \n"
+                     "through probes inserted in the bytecode of the script")
         add_arg("-c", "--context", choices=["main", "package", "all"],
                 default=self.default_context,
                 help="functions subject to depth computation when capturing "
@@ -128,6 +157,74 @@ class Run(Command):
         add_arg("-S", "--call-storage-frequency", type=non_negative,
                 default=self.default_call_storage_frequency,
                 help="frequency (in calls) to save partial provenance")
+        add_arg("--sample", type=sample_rate, default=1,
+                help="R|sample function activations by function.\n"
+                     "N >= 1 captures every Nth activation.\n"
+                     "0 < P < 1 captures activations with probability P.\n"
+                     "Captured activations have weights that scale\n"
+                     "durations and call counts. The script activation,\n"
+                     "module activations, and file accesses are always\n"
+                     "captured. Program slicing ignores it (default: 1)")
+        add_arg("--aggregate", type=non_negative, default=0,
+                help="number of calls to the same function in the same line "
+                     "of an activation that are captured individually. "
+                     "Further calls are folded into an aggregate record with "
+                     "count, durations and first/last arguments. Program "
+                     "slicing ignores it. Use 0 to disable it (default: 0)")
+        add_arg("--max-overhead", type=non_negative, default=0,
+                help="target share (in %%) of the execution time spent by "
+                     "the tracer. Above it, the capture stops for the "
+                     "function with most activations or its depth decreases. "
+                     "The capture is restored when the overhead drops. "
+                     "Use 0 to disable it (default: 0)")
+        add_arg("--max-capture-memory", type=non_negative, default=0,
+                help="estimated size (in MB) of the capture stores that "
+                     "triggers a spill. Stored records leave the memory and "
+                     "records that are still referenced stay as stubs. "
+                     "Use 0 to disable it (default: 0)")
+        add_arg("--serializer", choices=SERIALIZERS, default="repr",
+                help="R|representation of captured values (default: repr)\n"
+                     "repr uses the representation of objects.\n"
+                     "simple bounds representations by length and depth.\n"
+                     "content stores jsonpickle representations in the\n"
+                     "content database")
+        add_arg("--serializer-length", type=non_negative, default=1000,
+                help="maximum length of representations of the simple "
+                     "serializer (default: 1000)")
+        add_arg("--serializer-depth", type=non_negative, default=5,
+                help="maximum nested levels of representations of the simple "
+                     "serializer (default: 5)")
+        add_arg("--value-threshold", type=non_negative, default=0,
+                help="length of representations of captured values above "
+                     "which they are stored in the content database and "
+                     "referenced by the relational database. Use 0 to "
+                     "disable it (default: 0)")
+        add_arg("--content-writers", type=non_negative, default=0,
+                help="number of threads that write file contents in "
+                     "background during the execution. Use 0 to write them "
+                     "synchronously (default: 0)")
+        add_arg("--content-backend", choices=BACKENDS, default="loose",
+                help="R|storage of file contents (default: loose)\n"
+                     "loose stores one file per content.\n"
+                     "pack appends contents to packfiles.\n"
+                     "Both layouts remain readable. Use 'now pack' to move\n"
+                     "existing loose contents into packfiles")
+        add_arg("--content-chunking", action="store_true",
+                help="store large files as content-defined chunks. Unchanged "
+                     "regions of files are shared across trials")
+        add_arg("--synchronous", choices=SYNCHRONOUS, default="NORMAL",
+                help="SQLite synchronous level of the provenance database. "
+                     "The database uses write-ahead logging. NORMAL is safe "
+                     "against application crashes (default: NORMAL)")
+        add_arg("--capture-in-memory", action="store_true",
+                help="store provenance in an in-memory database during the "
+                     "execution and merge it into the provenance database at "
+                     "the end. Partial saves do not touch the disk")
+        add_arg("--memory-flush", type=non_negative, default=256,
+                help="size (in MB) of the in-memory database that triggers "
+                     "a merge into the provenance database. It bounds the "
+                     "provenance lost in a crash. Use 0 to merge only at "
+                     "the end (default: 256)")
 
         # Other
         if not self.is_ipython:
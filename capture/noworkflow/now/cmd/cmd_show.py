@@ -38,6 +38,11 @@ def print_function_activation(trial, activation, level=1):
     for inner_activation in activation.children:
         print_function_activation(trial, inner_activation, level + 1)
 
+    for aggregate in activation.aggregates:
+        initial = "  " * (level + 1)
+        aggregate.show(_print=lambda x, offset=0: print(
+            wrap(x, initial=initial + "  " * offset)))
+
 
 class Show(NotebookCommand):
     """Show the collected provenance of a trial"""
@@ -56,6 +61,8 @@ class Show(NotebookCommand):
                 help="shows function activations")
         add_arg("-f", "--file-accesses", action="store_true",
                 help="shows read/write access to files")
+        add_arg("-g", "--governor-events", action="store_true",
+                help="shows capture adjustments made by --max-overhead")
         add_arg("--dir", type=str,
                 help="set project path where is the database. Default to "
                      "current directory")
@@ -91,6 +98,12 @@ class Show(NotebookCommand):
             print_msg("this trial accessed the following files:", True)
             print_trial_relationship(trial.file_accesses)
 
+        if args.governor_events:
+            print_msg("this trial adjusted the capture at the following "
+                      "moments:", True)
+            print_trial_relationship(trial.governor_events, breakline="\n",
+                                     other="\n  ")
+
     def execute_export(self, args):
         persistence_config.connect_existing(args.dir or os.getcwd())
         Trial(trial_ref=args.trial)
@@ -0,0 +1,92 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+""""now stats" command"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import os
+
+from collections import defaultdict
+
+from ..persistence import persistence_config, content
+from ..persistence import compression
+from ..utils.io import print_msg
+
+from .command import Command
+
+
+def size_text(size):
+    """Return human readable size"""
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024:
+            return "{:.1f} {}".format(size, unit)
+        size /= 1024
+    return "{:.1f} TB".format(size)
+
+
+class Stats(Command):
+    """Show storage statistics of the content database"""
+
+    def add_arguments(self):
+        add_arg = self.add_argument
+        add_arg("-e", "--estimate", action="store_true",
+                help="compress raw contents in memory to estimate the space "
+                     "that compression would save on them")
+        add_arg("--dir", type=str,
+                help="set project path where is the database. Default to "
+                     "current directory")
+
+    def execute(self, args):
+        persistence_config.connect_existing(args.dir or os.getcwd())
+        counts = defaultdict(int)
+        stored = defaultdict(int)
+        original = defaultdict(int)
+        sizes = {}
+        chunks = set()
+        references = 0
+        estimate = 0
+        for content_hash, stored_size, head in content.stored_objects():
+            codec, size = compression.describe(head, stored_size)
+            counts[codec] += 1
+            stored[codec] += stored_size
+            original[codec] += size
+            sizes[content_hash] = stored_size
+            if codec == "chunked":
+                hashes = compression.decode_manifest(
+                    content.get_stored(content_hash))
+                references += len(hashes)
+                chunks.update(hashes)
+            if args.estimate and codec == "raw":
+                estimate += len(compression.encode(content.get(content_hash)))
+
+        print_msg("content database statistics:", True)
+        for codec in sorted(counts):
+            print("  {}: {} contents, {} stored, {} original".format(
+                codec, counts[codec], size_text(stored[codec]),
+                size_text(original[codec])))
+        # Chunks are counted as contents. Manifests only add their own size
+        total_stored = sum(stored.values())
+        blobs_stored = total_stored - stored["chunked"]
+        blobs_original = sum(
+            size for codec, size in original.items() if codec != "chunked")
+        saved = blobs_original - blobs_stored
+        print("  total: {} contents, {} stored".format(
+            sum(counts.values()), size_text(total_stored)))
+        print("  compression saved {} ({:.1%})".format(
+            size_text(saved), saved / blobs_original if blobs_original else 0))
+        if args.estimate:
+            raw_saved = stored["raw"] - estimate
+            print("  compressing raw contents would save {}".format(
+                size_text(raw_saved)))
+        if counts["chunked"]:
+            logical = original["chunked"]
+            physical = stored["chunked"] + sum(
+                sizes.get(chunk_hash, 0) for chunk_hash in chunks)
+            print("  chunked files: {} files, {} logical, {} unique chunks "
+                  "({} references), {} stored".format(
+                      counts["chunked"], size_text(logical), len(chunks),
+                      references, size_text(physical)))
+            print("  deduplication ratio: {:.2f}".format(
+                logical / physical if physical else 0))
@@ -10,17 +10,18 @@ import fnmatch
 import os
 import sys
 
-from datetime import datetime
-
 from pyposast import native_decode_source
 
 from ..persistence import persistence_config, get_serializer
-from ..persistence.lightweight import ObjectStore
+from ..persistence.lightweight import ObjectStore, ColumnarObjectStore, clock
+from ..persistence.lightweight import ValueLW, values
 from ..persistence.lightweight import DefinitionLW, ObjectLW
 from ..persistence.lightweight import EnvironmentAttrLW
 from ..persistence.lightweight import ModuleLW, DependencyLW
-from ..persistence.lightweight import ActivationLW, ObjectValueLW
-from ..persistence.lightweight import FileAccessLW, VariableLW
+from ..persistence.lightweight import ActivationLW, AggregateActivationLW
+from ..persistence.lightweight import ObjectValueLW
+from ..persistence.lightweight import FileAccessLW, GovernorEventLW
+from ..persistence.lightweight import VariableLW
 from ..persistence.lightweight import VariableUsageLW, VariableDependencyLW
 from ..utils import io
 
@@ -54,12 +55,18 @@ class Metascript(object):
         self.dependencies_store = ObjectStore(DependencyLW)
 
         self.activations_store = ObjectStore(ActivationLW)
-        self.object_values_store = ObjectStore(ObjectValueLW)
+        self.aggregate_activations_store = ObjectStore(AggregateActivationLW)
+        self.object_values_store = ColumnarObjectStore(ObjectValueLW)
         self.file_accesses_store = ObjectStore(FileAccessLW)
+        self.governor_events_store = ObjectStore(GovernorEventLW)
 
-        self.variables_store = ObjectStore(VariableLW)
-        self.variables_dependencies_store = ObjectStore(VariableDependencyLW)
-        self.usages_store = ObjectStore(VariableUsageLW)
+        self.variables_store = ColumnarObjectStore(VariableLW)
+        self.variables_dependencies_store = ColumnarObjectStore(
+            VariableDependencyLW)
+        self.usages_store = ColumnarObjectStore(VariableUsageLW)
+        # Values of object values and variables are interned on storage
+        self.values_store = ObjectStore(ValueLW)
+        values.reset(self.values_store)
 
         # Definition object : Definition
         self.definition = Definition(self)
@@ -103,6 +110,20 @@ class Metascript(object):
 
         # Bypass module check : bool
         self.bypass_modules = False
+        # Maximum number of memoized file hashes : int
+        self.hash_cache_size = 100000
+        # Number of background content writers : int
+        self.content_writers = 0
+        # Content database backend for new contents : str
+        self.content_backend = "loose"
+        # Split large files into chunks : bool
+        self.content_chunking = False
+        # SQLite synchronous level : str
+        self.synchronous = "NORMAL"
+        # Store provenance in memory during the execution : bool
+        self.capture_in_memory = False
+        # Size of memory database that triggers a flush (in MB) : int
+        self.memory_flush = 256
 
         # Depth for capturing function activations : int
         self.depth = sys.getrecursionlimit()
@@ -116,6 +137,16 @@ class Metascript(object):
         self.save_frequency = 1000
         # Save after closing X activations
         self.call_storage_frequency = 0
+        # Capture every Nth activation (int) or with probability (float)
+        self.sample = 1
+        # Calls by caller, function and line before folding them. 0 disables
+        # aggregation : int
+        self.aggregate = 0
+        # Target tracer overhead (in %). 0 disables the governor : int
+        self.max_overhead = 0
+        # Estimated size of capture stores (in MB) that triggers a spill to
+        # the database. 0 disables it : int
+        self.max_capture_memory = 0
 
         # Passed arguments : str
         self.command = ""
@@ -204,6 +235,25 @@ class Metascript(object):
         # Clear argv
         sys.argv = self.argv
 
+    def execution_stores(self):
+        """Return stores that grow during the execution"""
+        return [
+            self.activations_store, self.aggregate_activations_store,
+            self.object_values_store, self.file_accesses_store,
+            self.governor_events_store, self.variables_store,
+            self.variables_dependencies_store, self.usages_store,
+            self.values_store,
+        ]
+
+    def columnar_stores(self):
+        """Return stores that keep rows in array columns"""
+        return [store for store in self.execution_stores()
+                if isinstance(store, ColumnarObjectStore)]
+
+    def stores_memory(self):
+        """Return estimated size of execution stores in bytes"""
+        return sum(store.memory_size() for store in self.execution_stores())
+
     def read_cmd_args(self, args, cmd=None):
         """Read cmd line argument object"""
         if not cmd:
@@ -235,7 +285,6 @@ class Metascript(object):
 
     def _read_args(self, args):
         """Read cmd line argument object"""
-        # ToDo #54: add serializer param
         self.serialize = get_serializer(args)
         self.verbose = args.verbose
         self.meta = args.meta
@@ -243,12 +292,26 @@ class Metascript(object):
         self.disasm = args.disasm
         self.disasm0 = args.disasm0
         self.bypass_modules = args.bypass_modules
+        self.hash_cache_size = args.hash_cache_size
+        self.content_writers = args.content_writers
+        self.content_backend = args.content_backend
+        self.content_chunking = args.content_chunking
+        self.synchronous = args.synchronous
+        self.capture_in_memory = args.capture_in_memory
+        self.memory_flush = args.memory_flush
 
         self.depth = args.depth
         self.non_user_depth = args.non_user_depth
         self.execution_provenance = args.execution_provenance
         self.save_frequency = args.save_frequency
         self.call_storage_frequency = args.call_storage_frequency
+        self.sample = args.sample
+        self.aggregate = args.aggregate
+        self.max_overhead = args.max_overhead
+        self.max_capture_memory = args.max_capture_memory
+        if self.max_capture_memory:
+            for store in self.columnar_stores():
+                store.enable_spill()
 
         io.print_msg("setting up local provenance store")
         persistence_config.connect(self.dir)
@@ -273,7 +336,7 @@ class Metascript(object):
         """Return arguments for Trial.store"""
         if args is None:
             args = " ".join(sys.argv[1:])
-        now = datetime.now()
+        now = clock.reset()
         return (
             now, self.name, self.code_hash, args,
             self.bypass_modules, self.command, run,
@@ -18,6 +18,7 @@ import pyposast
 
 from .slicing_visitor import SlicingVisitor
 
+from ...persistence import relational
 from ...persistence.models import FunctionDef, Object
 from ...utils.io import print_msg
 from ...utils.metaprofiler import meta_profiler
@@ -76,8 +77,9 @@ class Definition(object):
         tid = metascript.trial_id
         # Remove after save
         partial = True
-        FunctionDef.fast_store(tid, metascript.definitions_store, partial)
-        Object.fast_store(tid, metascript.objects_store, partial)
+        with relational.store_transaction():
+            FunctionDef.fast_store(tid, metascript.definitions_store, partial)
+            Object.fast_store(tid, metascript.objects_store, partial)
 
     def _visit_ast(self, file_definition):
         """Return a visitor that visited the tree"""
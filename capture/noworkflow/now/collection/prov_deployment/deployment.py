@@ -20,7 +20,7 @@ from future.utils import viewitems
 from future.builtins import map as cvmap
 
 from ...persistence.models import EnvironmentAttr, Module, Dependency
-from ...persistence import content
+from ...persistence import content, relational
 from ...utils.io import print_msg, redirect_output
 from ...utils.metaprofiler import meta_profiler
 from ...utils.cross_version import string, default_string
@@ -128,8 +128,7 @@ class Deployment(object):
                 if path is None:
                     code_hash = None
                 else:
-                    with open(path, "rb") as fil:
-                        code_hash = content.put(fil.read())
+                    code_hash = content.put_file(path)
                 info = (name, module_version, path, code_hash)
                 mid = Module.fast_load_module_id(*info) or modules.add(*info)
                 dependencies.add(mid)
@@ -190,7 +189,8 @@ class Deployment(object):
         tid = metascript.trial_id
         # Remove after save
         partial = True
-        EnvironmentAttr.fast_store(tid, metascript.environment_attrs_store,
-                                   partial)
-        Module.fast_store(tid, metascript.modules_store, partial)
-        Dependency.fast_store(tid, metascript.dependencies_store, partial)
+        with relational.store_transaction():
+            EnvironmentAttr.fast_store(
+                tid, metascript.environment_attrs_store, partial)
+            Module.fast_store(tid, metascript.modules_store, partial)
+            Dependency.fast_store(tid, metascript.dependencies_store, partial)
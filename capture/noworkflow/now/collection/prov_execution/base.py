@@ -46,6 +46,10 @@ class ExecutionProvider(object):
         """Call this function when trace event is not defined"""
         pass
 
+    def instrument(self, code):                                                  # pylint: disable=no-self-use
+        """Return code that will be executed. Override it on subclasses"""
+        return code
+
     def store(self, partial=False):
         """Store provenance. Override it on subclasses"""
         pass
@@ -9,11 +9,13 @@ from __future__ import (absolute_import, print_function,
 import traceback
 import weakref
 
+from ...persistence import content
 from ...utils.cross_version import cross_compile
 from ...utils.io import print_msg
 from ...utils.metaprofiler import meta_profiler
 
 from .debugger import debugger_builtins
+from .instrumenter import Instrumenter                                           # pylint: disable=unused-import
 from .profiler import Profiler
 from .slicing import Tracer                                                      # pylint: disable=unused-import
 
@@ -55,10 +57,13 @@ class Execution(object):
             self.provider, metascript.namespace["__builtins__"], metascript
         )
 
+        compiled = self.provider.instrument(metascript.compiled)
+        content.start_writers(metascript.content_writers)
+
         print_msg("  executing the script")
         self.provider.tearup()  # It must be right before exec
         try:
-            exec(metascript.compiled, metascript.namespace)                      # pylint: disable=exec-used
+            exec(compiled, metascript.namespace)                                 # pylint: disable=exec-used
             if '__doc__' in metascript.namespace:
                 metascript.docstring = metascript.namespace['__doc__']
         except SystemExit as ex:
@@ -82,6 +87,10 @@ class Execution(object):
     def store_provenance(self):
         """Disable provider and store provenance"""
         self.provider.teardown()
-        self.provider.store(partial=self.partial)
+        try:
+            self.provider.store(partial=self.partial)
+        finally:
+            content.stop_writers()
+            content.flush()
         if self.msg:
             print_msg(self.msg, self.force_msg)
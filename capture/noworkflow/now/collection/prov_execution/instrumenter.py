@@ -0,0 +1,368 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Instrumenter Provider. Insert probes into the bytecode of user code
+
+The script code objects receive probes at function entry, before returns and
+yields, after yields (resume), and around call instructions.
+Call probes receive the callable and its packed arguments, and return them
+to the stack unchanged.
+There is no global profile function: library and C code run without
+overhead.
+Probes are only executed in Python frames, thus activations of frames that
+exit with exceptions are closed by the next probe of a caller frame.
+Other user modules receive probes when the script imports them. Functions
+of user modules imported before the execution receive probes in place.
+"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import imp
+import inspect
+import os
+import sys
+
+from collections import namedtuple
+from dis import opmap
+from types import BuiltinFunctionType, FunctionType, ModuleType
+
+from ...persistence import content
+from ...persistence.lightweight import clock
+from ...utils.bytecode.interpreter import CALL_FUNCTIONS
+from ...utils.bytecode.transformers import insert_instructions
+from ...utils.cross_version import cross_compile
+
+from .profiler import Profiler
+
+
+LOAD_CONST = opmap["LOAD_CONST"]
+CALL_FUNCTION = opmap["CALL_FUNCTION"]
+BUILD_TUPLE = opmap["BUILD_TUPLE"]
+UNPACK_SEQUENCE = opmap["UNPACK_SEQUENCE"]
+POP_TOP = opmap["POP_TOP"]
+ROT_TWO = opmap["ROT_TWO"]
+ROT_THREE = opmap["ROT_THREE"]
+RETURN_VALUE = opmap["RETURN_VALUE"]
+YIELD_VALUE = opmap["YIELD_VALUE"]
+VAR_CALLS = {opmap["CALL_FUNCTION_VAR"], opmap["CALL_FUNCTION_VAR_KW"]}
+KW_CALLS = {opmap["CALL_FUNCTION_KW"], opmap["CALL_FUNCTION_VAR_KW"]}
+PROBE_STACK = 3
+# Distance between the call probe and the call instruction
+CALL_DISTANCE = 6
+
+# Kinds of entries
+FRAME, CALL, LIBRARY, USER, OTHER = range(5)
+
+
+# Frame replacement for argument captors
+CallFrame = namedtuple("CallFrame", "f_code f_locals")
+
+
+def unpack_arguments(packed, signature):
+    """Return args and kwargs of packed call arguments
+
+    Arguments:
+    packed -- list of values above the callable in the stack
+    signature -- (positional, keywords, has *args, has **kwargs)
+    """
+    positional, keywords, varargs, varkw = signature
+    args = list(packed[:positional])
+    kwargs = {}
+    position = positional
+    for _ in range(keywords):
+        kwargs[packed[position]] = packed[position + 1]
+        position += 2
+    if varargs:
+        args.extend(packed[position])
+        position += 1
+    if varkw:
+        kwargs.update(packed[position])
+    return args, kwargs
+
+
+def module_source(module):
+    """Return source path of module or None"""
+    path = getattr(module, "__file__", None)
+    if path and path.endswith((".pyc", ".pyo")):
+        path = path[:-1]
+    return path
+
+
+class ProbeImporter(object):
+    """PEP 302 importer that inserts probes into user modules"""
+
+    def __init__(self, provider):
+        self.provider = provider
+        # Modules found by find_module: name -> (path, is package)
+        self.found = {}
+
+    def find_module(self, fullname, path=None):
+        """Return importer if fullname is a user module"""
+        try:
+            handle, pathname, description = imp.find_module(
+                fullname.rpartition(".")[2], path)
+        except ImportError:
+            return None
+        if handle is not None:
+            handle.close()
+        package = description[2] == imp.PKG_DIRECTORY
+        if package:
+            pathname = os.path.join(pathname, "__init__.py")
+        elif description[2] != imp.PY_SOURCE:
+            return None
+        if pathname not in self.provider.paths:
+            return None
+        self.found[fullname] = (pathname, package)
+        return self
+
+    def load_module(self, fullname):
+        """Execute user module with probes"""
+        if fullname in sys.modules:
+            return sys.modules[fullname]
+        pathname, package = self.found.pop(fullname)
+        module = sys.modules[fullname] = ModuleType(str(fullname))
+        module.__file__ = pathname
+        module.__loader__ = self
+        module.__package__ = fullname.rpartition(".")[0]
+        if package:
+            module.__package__ = fullname
+            module.__path__ = [os.path.dirname(pathname)]
+        try:
+            with content.std_open(pathname, "rb") as source:
+                code = cross_compile(source.read(), pathname, "exec")
+            exec(self.provider.instrument(code), vars(module))                   # pylint: disable=exec-used
+        except:                                                                  # pylint: disable=bare-except
+            del sys.modules[fullname]
+            raise
+        return sys.modules[fullname]
+
+
+class Instrumenter(Profiler):                                                    # pylint: disable=too-many-instance-attributes
+    """Profiler based on bytecode probes"""
+
+    def __init__(self, *args):
+        super(Instrumenter, self).__init__(*args)
+        # Frames with probes and their calls: [frame, kind, call lasti]
+        self.frames = []
+        # Code objects with probes
+        self.probed = set()
+        self.importer = ProbeImporter(self)
+
+        self.event_map["library_call"] = self.trace_library_call
+        self.event_map["library_return"] = self.trace_library_return
+
+    def instrument(self, code):
+        """Return code with probes"""
+        if code in self.probed:
+            return code
+        result = insert_instructions(code, self.process, PROBE_STACK)
+        self.probed.add(result)
+        return result
+
+    def instrument_function(self, function):
+        """Insert probes into function of user module in place"""
+        function = getattr(function, "__func__", function)
+        if (isinstance(function, FunctionType) and
+                function.__code__.co_filename in self.paths):
+            function.__code__ = self.instrument(function.__code__)
+
+    def instrument_loaded(self):
+        """Insert probes into functions of user modules imported before
+        the execution. Functions are found in modules and their classes
+        """
+        for name, module in list(sys.modules.items()):
+            if module is None or module_source(module) not in self.paths:
+                continue
+            objects = [module]
+            visited = set()
+            while objects:
+                obj = objects.pop()
+                visited.add(id(obj))
+                for value in list(vars(obj).values()):
+                    if isinstance(value, property):
+                        for accessor in (value.fget, value.fset, value.fdel):
+                            self.instrument_function(accessor)
+                    elif (inspect.isclass(value) and
+                          getattr(value, "__module__", None) == name and
+                          id(value) not in visited):
+                        objects.append(value)
+                    else:
+                        self.instrument_function(value)
+
+    def process(self, code, offset, opcode, arg, line, const):                   # pylint: disable=too-many-arguments, unused-argument
+        """Return probes inserted before and after instruction"""
+        before, after = [], []
+        if code.co_filename not in self.paths:
+            return before, after
+        if offset == 0:
+            before += [(LOAD_CONST, const(self.probe_enter)),
+                       (CALL_FUNCTION, 0), (POP_TOP, None)]
+        if opcode in (RETURN_VALUE, YIELD_VALUE):
+            before += [(LOAD_CONST, const(self.probe_leave)),
+                       (ROT_TWO, None), (CALL_FUNCTION, 1)]
+        if opcode == YIELD_VALUE:
+            after += [(LOAD_CONST, const(self.probe_enter)),
+                      (CALL_FUNCTION, 0), (POP_TOP, None)]
+        if opcode in CALL_FUNCTIONS:
+            signature = (arg & 0xFF, (arg >> 8) & 0xFF,
+                         opcode in VAR_CALLS, opcode in KW_CALLS)
+            size = signature[0] + 2 * signature[1] + sum(signature[2:])
+            # callable, packed arguments -> probe_call -> callable, arguments
+            before += [(BUILD_TUPLE, size),
+                       (LOAD_CONST, const(self.probe_call)), (ROT_THREE, None),
+                       (LOAD_CONST, const(signature)), (CALL_FUNCTION, 3),
+                       (UNPACK_SEQUENCE, size + 1)]
+            after += [(LOAD_CONST, const(self.probe_done)),
+                      (ROT_TWO, None), (CALL_FUNCTION, 1)]
+        return before, after
+
+    def close(self, entry, value=None):
+        """Close frame or call"""
+        frame, kind, _ = entry
+        if kind == FRAME:
+            self.tracer(frame, "return", value)
+        elif kind == CALL:
+            self.tracer(frame, "c_return", None)
+        elif kind == LIBRARY:
+            self.tracer(frame, "library_return", value)
+
+    def unwind(self, frame):
+        """Close entries above frame. They exited with exceptions"""
+        frames = self.frames
+        while frames and frames[-1][0] is not frame:
+            self.close(frames.pop())
+
+    def close_calls(self, frame, lasti=None):
+        """Close calls of frame, except the one that is running at lasti
+        Remaining calls raised exceptions"""
+        frames = self.frames
+        while (frames and frames[-1][0] is frame and
+               frames[-1][1] != FRAME and frames[-1][2] != lasti):
+            self.close(frames.pop())
+
+    def probe_enter(self):
+        """Probe at function entry and after yields"""
+        frame = sys._getframe(1)                                                 # pylint: disable=protected-access
+        parent = frame.f_back
+        frames = self.frames
+        if frames and frames[-1][0] is not parent:
+            ancestors = set()
+            while parent is not None:
+                ancestors.add(id(parent))
+                parent = parent.f_back
+            while frames and id(frames[-1][0]) not in ancestors:
+                self.close(frames.pop())
+            parent = frame.f_back
+        if parent is not None:
+            self.close_calls(parent, parent.f_lasti)
+        frames.append([frame, FRAME, None])
+        self.tracer(frame, "call", None)
+
+    def probe_leave(self, value):
+        """Probe before returns and yields"""
+        frame = sys._getframe(1)                                                 # pylint: disable=protected-access
+        self.unwind(frame)
+        self.close_calls(frame)
+        if self.frames:
+            self.close(self.frames.pop(), value)
+        return value
+
+    def probe_call(self, func, packed, signature):
+        """Probe before call. Return callable and arguments reversed
+        Calls to user functions are registered by probe_enter"""
+        frame = sys._getframe(1)                                                 # pylint: disable=protected-access
+        self.unwind(frame)
+        self.close_calls(frame)
+        target = getattr(func, "__func__", func)
+        kind = OTHER
+        if isinstance(target, FunctionType):
+            kind = LIBRARY
+            if target.__code__.co_filename in self.paths:
+                kind = USER
+        elif isinstance(func, BuiltinFunctionType):
+            kind = CALL
+        self.frames.append([frame, kind, frame.f_lasti + CALL_DISTANCE])
+        if kind == CALL:
+            self.tracer(frame, "c_call", func)
+        elif kind == LIBRARY:
+            if signature[2]:
+                # Consume *args iterators only once
+                packed = list(packed)
+                position = signature[0] + 2 * signature[1]
+                packed[position] = tuple(packed[position])
+            self.tracer(frame, "library_call", (
+                func, unpack_arguments(packed, signature)))
+        # UNPACK_SEQUENCE pushes the last item first
+        result = [func]
+        result.extend(packed)
+        result.reverse()
+        return result
+
+    def probe_done(self, value):
+        """Probe after call"""
+        frame = sys._getframe(1)                                                 # pylint: disable=protected-access
+        self.unwind(frame)
+        frames = self.frames
+        if frames and frames[-1][1] != FRAME:
+            self.close(frames.pop(), value)
+        return value
+
+    def trace_library_call(self, frame, event, arg):                             # pylint: disable=unused-argument
+        """Trace call to function without probes. Increase non_user depth"""
+        self.depth_non_user += 1
+        if not self.valid_depth():
+            return
+        func, (args, kwargs) = arg
+        code = getattr(func, "__func__", func).__code__
+        weight = self.sample_weight(code.co_filename, code.co_name)
+        if not weight:
+            self.skip_activation()
+            return
+        try:
+            values = inspect.getcallargs(func, *args, **kwargs)
+        except Exception:                                                        # pylint: disable=broad-except
+            values = {}
+        if self.aggregate_threshold:
+            aggregate = self.aggregate(
+                code.co_filename, code.co_name, frame.f_lineno)
+            if aggregate is not None:
+                self.fold_activation(aggregate, weight, (
+                    self.serialize_arguments(code, values)))
+                return
+        aid = self.activations.add(
+            code.co_filename, frame.f_code.co_filename, code.co_name,
+            frame.f_lineno, frame.f_lasti, self.activation_stack[-1], False
+        )
+        activation = self.activations[aid]
+        activation.weight = weight
+        self.argument_captor.capture(CallFrame(code, values), activation)
+        activation.start_ns = clock.now()
+        self.add_activation(aid)
+
+    def trace_library_return(self, frame, event, arg):                           # pylint: disable=unused-argument
+        """Trace return of function without probes. Decrease non_user depth"""
+        if self.valid_depth():
+            self.close_activation(frame, "return", arg)
+        self.depth_non_user -= 1
+
+    def store(self, partial=False):
+        """Close frames that exited with exceptions before storing"""
+        if not partial:
+            while self.frames:
+                self.close(self.frames.pop())
+        super(Instrumenter, self).store(partial=partial)
+
+    def tearup(self):
+        """Insert probes into user modules
+        Probes do not produce a tearup return
+        """
+        self.instrument_loaded()
+        sys.meta_path.insert(0, self.importer)
+        self.skip_first_return = False
+
+    def teardown(self):
+        """Stop inserting probes into imported modules"""
+        if self.importer in sys.meta_path:
+            sys.meta_path.remove(self.importer)
+        super(Instrumenter, self).teardown()
@@ -13,12 +13,17 @@ import traceback
 import time
 import io
 import codecs
+import random
 
+from collections import defaultdict
 from datetime import datetime
 
-from ...persistence import content
+from ...persistence import content, relational
+from ...persistence.lightweight import clock
 from ...persistence.models import Activation, ObjectValue, FileAccess, Trial
+from ...persistence.models import AggregateActivation, GovernorEvent, Value
 from ...utils.cross_version import builtins
+from ...utils.io import print_msg
 
 from .base import ExecutionProvider
 from .argument_captors import ProfilerArgumentCaptor
@@ -91,8 +96,12 @@ class Profiler(ExecutionProvider):
 
         # Store provenance
         self.activations = self.metascript.activations_store
+        self.aggregate_activations = (
+            self.metascript.aggregate_activations_store)
         self.object_values = self.metascript.object_values_store
         self.file_accesses = self.metascript.file_accesses_store
+        self.governor_events = self.metascript.governor_events_store
+        self.values = self.metascript.values_store
 
         # Avoid using the same event for tracer and profiler
         self.last_event = None
@@ -125,10 +134,61 @@ class Profiler(ExecutionProvider):
         # Skip tear_up return
         self.skip_first_return = True
         self.enabled = True
+        # Ignore events of capture work called by call_untraced
+        self.paused = False
 
         # Capture arguments
         self.argument_captor = ProfilerArgumentCaptor(self)
 
+        # Map of code object to boolean indicating if it is user code
+        self.user_codes = {}
+        # Event counters
+        self.handled_events = 0
+        self.skipped_events = 0
+        # Number of frames without local tracer
+        self.skipped_frames = 0
+
+        # Capture every Nth activation (int) or with probability (float)
+        self.sample = self.metascript.sample
+        # Number of activations by (definition file, name)
+        self.sample_counts = defaultdict(int)
+        # Do not change the state of the random module used by the script
+        self.sample_random = random.Random()
+
+        # Calls captured individually by caller, function and line : int
+        self.aggregate_threshold = self.metascript.aggregate
+        # Map of caller activation id to {(definition file, name, line):
+        #   [number of calls, aggregate activation or None]}
+        self.aggregation = {}
+        # Folded calls that are running: (stack size, aggregate, start time)
+        self.open_aggregates = []
+
+        # Target share of the execution time spent by the tracer : float
+        self.max_overhead = self.metascript.max_overhead / 100.0
+        # Length of the governor window in seconds
+        self.governor_window = 0.5
+        # The governor may stop capturing hot functions
+        self.governor_untrace = True
+        # Depth that the depth_threshold follows when it is safe to change it
+        self.depth_target = self.depth_threshold
+        # Functions that are not captured by (definition file, name)
+        self.untraced = set()
+        # Stack of governor reductions: (action, previous depth or function)
+        self.reductions = []
+        # Estimated size of capture stores (in bytes) that triggers a spill
+        self.max_capture_memory = self.metascript.max_capture_memory * 1048576
+        # Number of handled events between memory checks
+        self.memory_check_events = 10000
+        # Activations by (definition file, name) in the current window
+        self.window_counts = defaultdict(int)
+        # Deepest captured activation in the current window
+        self.window_depth = 0
+        self.window_start = self.timer()
+        self.tracer_time = 0.0
+        if self.max_overhead:
+            self.ungoverned_tracer = self.tracer
+            self.tracer = self.governed_tracer
+
         if sys.version_info >= (3, 0):
             Profiler.add_activation = Profiler.initial_add_activation
 
@@ -154,12 +214,10 @@ class Profiler(ExecutionProvider):
                 fid = self.file_accesses.add(name)
                 file_access = self.file_accesses[fid]
 
-                if os.path.exists(name):
+                if os.path.isfile(name):
                     # Read previous content if file exists
-                    with content.std_open(name, "rb") as fil:
-                        file_access.content_hash_before = content.put(
-                            fil.read()
-                        )
+                    file_access.content_hash_before = self.call_untraced(
+                        content.put_file, name)
 
                 # Update with the informed keyword arguments (mode / buffering)
                 file_access.update(kwargs)
@@ -183,12 +241,32 @@ class Profiler(ExecutionProvider):
 
         return open
 
+    def call_untraced(self, function, *args):
+        """Call function from traced code ignoring its events
+        Used for expensive capture work, such as file snapshots
+        The hooks stay in place: replacing them from traced code produces
+        c_call events without matching c_return events
+        """
+        self.paused = True
+        try:
+            return function(*args)
+        finally:
+            self.paused = False
+
     def add_file_access(self, file_access):
         """After activation that called open finish, add file_accesses to it"""
         activation = self.current_activation
         file_access.function_activation_id = activation.id
         activation.file_accesses.append(file_access)
 
+    def is_user_code(self, code):
+        """Check if code object belongs to user paths. Cache decision"""
+        try:
+            return self.user_codes[code]
+        except KeyError:
+            result = self.user_codes[code] = code.co_filename in self.paths
+            return result
+
     def valid_depth(self, extra=0):
         """Check if it is capturing in a valid depth
         Consider both user depth and non user depth.
@@ -201,6 +279,73 @@ class Profiler(ExecutionProvider):
             return False
         return self.depth_non_user <= self.non_user_depth_threshold
 
+    def sample_weight(self, definition_file, name):
+        """Return weight of activation or 0 if it should not be captured
+        Activations without a caller are always captured. Calls made by the
+        script at main level are sampled like any other call"""
+        if len(self.activation_stack) < 2:
+            return 1
+        key = (definition_file, name)
+        if self.max_overhead:
+            if key in self.untraced:
+                return 0
+            self.window_counts[key] += 1
+            depth = self.depth_user + self.depth_non_user
+            if depth > self.window_depth:
+                self.window_depth = depth
+        sample = self.sample
+        if sample == 1:
+            return 1
+        if isinstance(sample, int):
+            count = self.sample_counts[key]
+            self.sample_counts[key] = count + 1
+            return sample if count % sample == 0 else 0
+        if self.sample_random.random() < sample:
+            return 1 / sample
+        return 0
+
+    def skip_activation(self):
+        """Repeat current activation in the stack for activation that was not
+        sampled. Its calls and file accesses belong to the current activation
+        """
+        self.activation_stack.append(self.activation_stack[-1])
+
+    def aggregate(self, definition_file, name, line):
+        """Return aggregate activation if the call should be folded
+        Calls are folded after aggregate_threshold calls to the same function
+        in the same line of the current activation"""
+        caller_id = self.activation_stack[-1]
+        calls = self.aggregation.get(caller_id)
+        if calls is None:
+            calls = self.aggregation[caller_id] = {}
+        key = (definition_file, name, line)
+        entry = calls.get(key)
+        if entry is None:
+            entry = calls[key] = [0, None]
+        entry[0] += 1
+        if entry[0] <= self.aggregate_threshold:
+            return None
+        if entry[1] is None:
+            entry[1] = self.aggregate_activations.add_object(
+                name, line, caller_id)
+        return entry[1]
+
+    def fold_activation(self, aggregate, weight, arguments):
+        """Fold call into aggregate. Like activations that were not sampled,
+        its calls and file accesses belong to the current activation"""
+        aggregate.add_call(weight, arguments)
+        self.skip_activation()
+        self.open_aggregates.append(
+            (len(self.activation_stack), aggregate, self.timer()))
+
+    def serialize_arguments(self, code, values):
+        """Serialize arguments of code from values dict"""
+        count = code.co_argcount + getattr(code, "co_kwonlyargcount", 0)
+        return ", ".join(
+            "{}={}".format(name, self.serialize(values[name]))
+            for name in code.co_varnames[:count] if name in values
+        )
+
     def add_activation(self, aid):                                               # pylint: disable=function-redefined
         """Add activation to activation stack"""
         self.activation_stack.append(aid)
@@ -219,9 +364,26 @@ class Profiler(ExecutionProvider):
 
     def close_activation(self, frame, event, arg):                               # pylint: disable=unused-argument
         """Remove activation from stack, set finish time and add accesses"""
+        stack = self.activation_stack
+        if len(stack) > 1 and stack[-1] == stack[-2]:
+            # Activation was not sampled or it was folded
+            aggregates = self.open_aggregates
+            if aggregates and aggregates[-1][0] == len(stack):
+                _, aggregate, start = aggregates.pop()
+                aggregate.add_duration(
+                    int((self.timer() - start) * 1000000))
+            stack.pop()
+            return
         activation = self.current_activation
-        self.activation_stack.pop()
-        activation.finish = datetime.now()
+        stack.pop()
+        activation.finish_ns = clock.now()
+        self.activations.complete(activation)
+        calls = self.aggregation.pop(activation.id, None)
+        if calls:
+            for _, aggregate in calls.values():
+                if aggregate is not None:
+                    aggregate.done = True
+                    self.aggregate_activations.complete(aggregate)
         try:
             if event == "return":
                 activation.return_value = self.serialize(arg)
@@ -230,10 +392,11 @@ class Profiler(ExecutionProvider):
         # Update content of accessed files
         for file_access in activation.file_accesses:
             # Checks if file still exists
-            if os.path.exists(file_access.name):
-                with content.std_open(file_access.name, "rb") as fil:
-                    file_access.content_hash_after = content.put(fil.read())
+            if os.path.isfile(file_access.name):
+                file_access.content_hash_after = content.put_file(
+                    file_access.name)
             file_access.done = True
+            self.file_accesses.complete(file_access)
         self.closed_activations += 1
         if (self.call_storage_frequency and
                 (self.closed_activations % self.call_storage_frequency == 0)):
@@ -243,20 +406,30 @@ class Profiler(ExecutionProvider):
         """Trace c_call. Increase non_user depth"""
         self.depth_non_user += 1
         if self.valid_depth():
-            self.add_activation(self.activations.add(
-                "now(n/a)",
-                frame.f_code.co_filename,
-                arg.__name__ if arg.__self__ is None else ".".join(
-                    [type(arg.__self__).__name__, arg.__name__]),
+            name = arg.__name__ if arg.__self__ is None else ".".join(
+                [type(arg.__self__).__name__, arg.__name__])
+            weight = self.sample_weight("now(n/a)", name)
+            if not weight:
+                self.skip_activation()
+                return
+            if self.aggregate_threshold:
+                aggregate = self.aggregate("now(n/a)", name, frame.f_lineno)
+                if aggregate is not None:
+                    self.fold_activation(aggregate, weight, None)
+                    return
+            aid = self.activations.add(
+                "now(n/a)", frame.f_code.co_filename, name,
                 frame.f_lineno, frame.f_lasti, self.activation_stack[-1],
                 False
-            ))
+            )
+            self.activations[aid].weight = weight
+            self.add_activation(aid)
 
     def trace_call(self, frame, event, arg):                                     # pylint: disable=unused-argument
         """Trace call. Increase depth and create activation"""
         co_name = frame.f_code.co_name
         co_filename = frame.f_code.co_filename
-        if co_filename in self.paths:
+        if self.is_user_code(frame.f_code):
             self.depth_user += 1
             in_paths = True
         else:
@@ -264,6 +437,19 @@ class Profiler(ExecutionProvider):
             in_paths = False
 
         if self.valid_depth():
+            weight = 1
+            if co_name != "<module>":
+                weight = self.sample_weight(co_filename, co_name)
+            if not weight:
+                self.skip_activation()
+                return
+            if self.aggregate_threshold and co_name != "<module>":
+                aggregate = self.aggregate(
+                    co_filename, co_name, frame.f_back.f_lineno)
+                if aggregate is not None:
+                    self.fold_activation(aggregate, weight, (
+                        self.serialize_arguments(frame.f_code, frame.f_locals)))
+                    return
             aid = self.activations.add(
                 co_filename,
                 frame.f_back.f_code.co_filename,
@@ -273,6 +459,7 @@ class Profiler(ExecutionProvider):
                 in_paths and self.valid_depth(extra=1)
             )
             activation = self.activations[aid]
+            activation.weight = weight
 
             if activation.is_main:
                 self.main_activation = activation
@@ -289,7 +476,7 @@ class Profiler(ExecutionProvider):
                     global_var, self.serialize(fglobals[global_var]),
                     "GLOBAL", aid)
 
-            activation.start = datetime.now()
+            activation.start_ns = clock.now()
             self.add_activation(aid)
 
     def trace_c_return(self, frame, event, arg):                                 # pylint: disable=unused-argument
@@ -313,7 +500,7 @@ class Profiler(ExecutionProvider):
         if self.valid_depth():
             self.close_activation(frame, event, arg)
 
-        if frame.f_code.co_filename in self.paths:
+        if self.is_user_code(frame.f_code):
             if frame.f_code.co_name == "<module>":
                 self.enabled = False
             self.depth_user -= 1
@@ -331,20 +518,126 @@ class Profiler(ExecutionProvider):
     def tracer(self, frame, event, arg):
         """Check if event is valid before executing tracer
         Call event function from event_map
+        Return local tracer of frame
         """
+        if self.paused:
+            return None
+        local = self.tracer
         try:
+            handled = False
             if self.enabled:
                 if self.unique_events or self.new_event(frame, event, arg):
+                    handled = True
+                    self.handled_events += 1
                     self.pre_tracer(frame, event, arg)
                     self.event_map[event](frame, event, arg)
+                    if (self.max_capture_memory and not
+                            self.handled_events % self.memory_check_events):
+                        self.check_memory()
+                else:
+                    self.skipped_events += 1
                 if (self.save_frequency and
                         (self.timer() - self.last_time > self.save_frequency)):
                     self.store(partial=True)
                     self.last_time = self.timer()
+            if event == "call":
+                local = self.local_tracer(frame)
+                if local is None and handled:
+                    self.skipped_frames += 1
         except Exception:                                                        # pylint: disable=broad-except
             traceback.print_exc()
         finally:
-            return self.tracer                                                   # pylint: disable=lost-exception
+            return local                                                         # pylint: disable=lost-exception
+
+    def check_memory(self):
+        """Spill stores if their estimated size approaches the limit"""
+        if self.metascript.stores_memory() > 0.9 * self.max_capture_memory:
+            self.spill()
+
+    def spill(self):
+        """Move stored records out of memory
+        Partial stores remove complete records from the stores"""
+        self.store(partial=True)
+        self.last_time = self.timer()
+
+    def governed_tracer(self, frame, event, arg):
+        """Measure the time spent by the tracer and adapt the capture when
+        the overhead of a window exceeds max_overhead"""
+        start = self.timer()
+        local = self.ungoverned_tracer(frame, event, arg)
+        if self.depth_target != self.depth_threshold:
+            self.follow_depth_target()
+        finish = self.timer()
+        self.tracer_time += finish - start
+        if finish - self.window_start > self.governor_window:
+            self.govern(finish)
+        return local
+
+    def follow_depth_target(self):
+        """Move depth_threshold towards depth_target
+        Open frames must keep the decision they had on call. Thus, the
+        threshold only decreases to the current depth and it only increases
+        when no open frame is above it
+        """
+        depth = self.depth_user + self.depth_non_user
+        threshold = self.depth_threshold
+        if self.depth_target < threshold:
+            self.depth_threshold = min(threshold, max(self.depth_target, depth))
+        elif depth <= threshold:
+            self.depth_threshold = self.depth_target
+
+    def govern(self, now):
+        """Reduce the capture if the overhead of the window is above
+        max_overhead. Restore it if the overhead is below half of it"""
+        overhead = self.tracer_time / (now - self.window_start)
+        if overhead > self.max_overhead:
+            self.reduce_capture(overhead)
+        elif overhead < self.max_overhead / 2 and self.reductions:
+            self.restore_capture(overhead)
+        self.window_counts.clear()
+        self.window_depth = 0
+        self.tracer_time = 0.0
+        self.window_start = self.timer()
+
+    def reduce_capture(self, overhead):
+        """Stop capturing the function with most activations in the window
+        If there is none, decrease the depth"""
+        counts = self.window_counts
+        if self.governor_untrace and counts:
+            key = max(counts, key=counts.get)
+            self.untraced.add(key)
+            self.reductions.append(("untrace", key))
+            self.add_governor_event("untrace", key, overhead)
+            return
+        if not self.window_depth:
+            return
+        depth = max(1, min(self.depth_target, self.window_depth) - 1)
+        if depth < self.depth_target:
+            self.reductions.append(("lower_depth", self.depth_target))
+            self.depth_target = depth
+            self.add_governor_event("lower_depth", None, overhead)
+
+    def restore_capture(self, overhead):
+        """Undo the last reduction"""
+        action, value = self.reductions.pop()
+        if action == "untrace":
+            self.untraced.discard(value)
+            self.add_governor_event("trace", value, overhead)
+        else:
+            self.depth_target = value
+            self.add_governor_event("raise_depth", None, overhead)
+
+    def add_governor_event(self, action, key, overhead):
+        """Record governor adjustment"""
+        definition_file, name = key or (None, None)
+        self.governor_events.add(
+            action, definition_file, name, self.depth_target, overhead)
+        print_msg("  governor: {} {}. Depth: {}. Overhead: {:.1%}".format(
+            action, name or "", self.depth_target, overhead))
+
+    def local_tracer(self, frame):                                               # pylint: disable=unused-argument
+        """Return local tracer of frame. Profilers do not use it"""
+        return self.tracer
 
     def pre_tracer(self, frame, event, arg):                                     # pylint: disable=unused-argument, no-self-use
         """It is executed before the tracing event"""
@@ -357,9 +650,15 @@ class Profiler(ExecutionProvider):
             now = datetime.now()
             Trial.fast_update(tid, now, self.metascript.docstring)
 
-        Activation.fast_store(tid, self.activations, partial)
-        ObjectValue.fast_store(tid, self.object_values, partial)
-        FileAccess.fast_store(tid, self.file_accesses, partial)
+        with relational.store_transaction():
+            Activation.fast_store(tid, self.activations, partial)
+            AggregateActivation.fast_store(
+                tid, self.aggregate_activations, partial)
+            ObjectValue.fast_store(tid, self.object_values, partial)
+            FileAccess.fast_store(tid, self.file_accesses, partial)
+            GovernorEvent.fast_store(tid, self.governor_events, partial)
+            # Values interned by the stores above
+            Value.fast_store(tid, self.values, partial)
 
     def tearup(self):
         """Activate profiler"""
@@ -370,3 +669,5 @@ class Profiler(ExecutionProvider):
         builtins.open = content.std_open
         super(Profiler, self).teardown()
         sys.setprofile(self.default_profile)
+        print_msg("  handled {} events, skipped {} events and {} frames".format(
+            self.handled_events, self.skipped_events, self.skipped_frames))
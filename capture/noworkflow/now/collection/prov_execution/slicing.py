@@ -11,16 +11,17 @@ import linecache
 import traceback
 
 from collections import namedtuple
-from datetime import datetime
 from functools import partial
 from inspect import ismethod
 from copy import copy
 
-from future.utils import viewitems
+from future.utils import viewitems, viewvalues
 
+from ...persistence import relational
+from ...persistence.lightweight import VariableLW, clock
 from ...persistence.models import Variable, VariableDependency
-from ...persistence.models import VariableUsage
-from ...utils.io import print_fn_msg
+from ...persistence.models import VariableUsage, Value
+from ...utils.io import print_fn_msg, print_msg
 from ...utils.bytecode.f_trace import find_f_trace, get_f_trace
 from ...utils.cross_version import IMMUTABLE, builtins
 from ...utils.functions import NOWORKFLOW_DIR
@@ -34,6 +35,8 @@ from .profiler import Profiler
 
 ActivationSlicing = namedtuple("ActivationSlicing",
                                "call_var return_var activation_id id")
+# Locals of lines that do not read local variables during slicing
+NO_LOCALS = {}
 
 
 class JointPartial(partial):                                                     # pylint: disable=inherit-non-class, too-few-public-methods
@@ -189,6 +192,22 @@ class Tracer(Profiler):
         # List of calls in comprehension
         self.comprehension_dependencies = None
 
+        # Map of code object to boolean indicating if it may set f_trace
+        self.f_trace_codes = {}
+        # Names of local variables read by slicing by (filename, line)
+        self.line_locals = {}
+
+        if self.sample != 1:
+            print_msg("program slicing requires all activations. "
+                      "Ignoring --sample", True)
+            self.sample = 1
+        if self.aggregate_threshold:
+            print_msg("program slicing requires all activations. "
+                      "Ignoring --aggregate", True)
+            self.aggregate_threshold = 0
+        # Untraced functions would move their lines to the caller activation
+        self.governor_untrace = False
+
 
     def add_variable(self, act_id, name, line, f_locals, typ, value="--chk--"):     # pylint: disable=too-many-arguments
         """Add variable
@@ -208,7 +227,7 @@ class Tracer(Profiler):
         else:
             value = "now(n/a)"
         return self.variables.add(
-            act_id, name, line, value, datetime.now(), typ)
+            act_id, name, line, value, clock.now(), typ)
 
 
     def find_variable(self, activation, name, definition):
@@ -397,6 +416,39 @@ class Tracer(Profiler):
             #deps = list(deps)
             self.slice_dependencies(activation, lineno, f_locals, var, deps)
 
+    def local_names(self, filename, lineno):
+        """Return names of local variables that slicing reads after the line
+        Loop variables are read at the first line in the scope of the loop
+        """
+        key = (filename, lineno)
+        names = self.line_locals.get(key)
+        if names is None:
+            names = {
+                var.name
+                for var in self.line_dependencies[filename].get(lineno, ())
+                if isinstance(var, Var)
+            }
+            for loop_def in viewvalues(self.loops[filename]):
+                if loop_def.first_line_in_scope == lineno:
+                    names.update(var.name for var in loop_def.iter_var
+                                 if isinstance(var, Var))
+            names = self.line_locals[key] = frozenset(names)
+        return names
+
+    def line_values(self, frame, filename, lineno):
+        """Return values of local variables that slicing reads after the line
+        Pending lines keep only these values. They are read again from the
+        frame before slicing, unless the frame is gone
+        Module frames return their globals, which outlive the line anyway
+        """
+        names = self.local_names(filename, lineno)
+        if not names:
+            return NO_LOCALS
+        f_locals = frame.f_locals
+        if f_locals is frame.f_globals:
+            return f_locals
+        return {name: f_locals[name] for name in names if name in f_locals}
+
     def add_fake_call(self, activation, call_uid):
         """Create fake call for builtins"""
         line, col = call_uid
@@ -471,7 +523,11 @@ class Tracer(Profiler):
         """
         activation = self.current_activation
         for line in activation.slice_stack:
+            if frame and line[2] is not NO_LOCALS:
+                line[2] = self.line_values(frame, line[3], line[1])
             self.slice_line(*line)
+        # Release locals of the frame. The activation may outlive it
+        del activation.slice_stack[:]
         super(Tracer, self).close_activation(frame, event, arg)
         if frame and not activation.is_main:
             _return = self.add_generic_return(activation, frame)
@@ -605,11 +661,13 @@ class Tracer(Profiler):
         filename = frame.f_code.co_filename
         lineno = frame.f_lineno
 
-        loc, glob = frame.f_locals, frame.f_globals
-        if find_f_trace(code, loc, glob, frame.f_lasti):
-            _frame = get_f_trace(code, loc, glob)
-            if _frame.f_trace:
-                self.f_trace_frames.append(_frame)
+        if "f_trace" in code.co_names:
+            # Other frames do not need their locals here
+            loc, glob = frame.f_locals, frame.f_globals
+            if find_f_trace(code, loc, glob, frame.f_lasti):
+                _frame = get_f_trace(code, loc, glob)
+                if _frame.f_trace:
+                    self.f_trace_frames.append(_frame)
 
         activation = self.current_activation
 
@@ -629,9 +687,29 @@ class Tracer(Profiler):
         print_fn_msg(lambda: "[{}] -> {}".format(
             lineno, linecache.getline(filename, lineno).strip()))
         if activation.slice_stack:
-            self.slice_line(*activation.slice_stack.pop())
+            line = activation.slice_stack.pop()
+            if line[2] is not NO_LOCALS:
+                # Refresh values after the line executes
+                line[2] = self.line_values(frame, line[3], line[1])
+            self.slice_line(*line)
         activation.slice_stack.append([
-            activation, lineno, frame.f_locals, filename])
+            activation, lineno, self.line_values(frame, filename, lineno),
+            filename])
+
+    def local_tracer(self, frame):
+        """Return local tracer of frame
+        Only frames with definitions in a valid depth and frames that may
+        set f_trace receive line events. Other frames return None
+        """
+        code = frame.f_code
+        if self.is_user_code(code) and self.valid_depth(extra=1):
+            return self.tracer
+        try:
+            sets_f_trace = self.f_trace_codes[code]
+        except KeyError:
+            sets_f_trace = self.f_trace_codes[code] = (
+                "f_trace" in code.co_names)
+        return self.tracer if sets_f_trace else None
 
     def trace_pre_tracer(self, frame, event, arg):                               # pylint: disable=unused-argument
         """It is executed before the tracing event. Check f_trace is set"""
@@ -665,11 +743,26 @@ class Tracer(Profiler):
         if not partial:
             while len(self.activation_stack) > 1:
                 self.close_activation(None, "store", None)
-        super(Tracer, self).store(partial=partial)
+        with relational.store_transaction():
+            super(Tracer, self).store(partial=partial)
+            tid = self.trial_id
+            Variable.fast_store(tid, self.variables, partial)
+            VariableDependency.fast_store(tid, self.dependencies, partial)
+            VariableUsage.fast_store(tid, self.usages, partial)
+            Value.fast_store(tid, self.values, partial)
+
+    def spill(self):
+        """Move stored records out of memory
+        Variables are never complete. They are stored and evicted. Variables
+        referenced by the tracer stay as stubs and other variables are loaded
+        from the database on demand"""
         tid = self.trial_id
-        Variable.fast_store(tid, self.variables, partial)
-        VariableDependency.fast_store(tid, self.dependencies, partial)
-        VariableUsage.fast_store(tid, self.usages, partial)
+        with relational.store_transaction():
+            super(Tracer, self).spill()
+            Variable.fast_store(tid, self.variables, False)
+            Value.fast_store(tid, self.values, True)
+        self.variables.evict(
+            lambda vid: Variable.fast_load(tid, vid, VariableLW))
 
     def view_slicing_data(self, show=True):
         """View captured slicing"""
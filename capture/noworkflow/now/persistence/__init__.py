@@ -15,15 +15,12 @@ content = ContentDatabase(persistence_config)
 relational = RelationalDatabase(persistence_config)                              # pylint: disable=invalid-name
 
 
-def get_serializer(arg):                                                         # pylint: disable=unused-argument
-    """Select serializer according to argument"""
-    # ToDo #54: use arg to select serialize
-    # from .serializers import jsonpickle_serializer, jsonpickle_content
-    # from .serializers import SimpleSerializer
-    # return SimpleSerializer().serialize
-    # return jsonpickle_serializer
-    # return jsonpickle_content
-    return repr
+def get_serializer(args):
+    """Select serializer according to arguments"""
+    from .serializers import create_serializer
+    return create_serializer(
+        args.serializer, args.serializer_length, args.serializer_depth,
+        args.value_threshold)
 
 
 __all__ = [
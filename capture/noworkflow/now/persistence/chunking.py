@@ -0,0 +1,64 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Content-defined chunking for the Content Database
+
+Chunk boundaries depend only on nearby content, so inserting or appending
+data to a file changes only the chunks around the modification.
+Candidate boundaries are ANCHOR bytes found by bytes.find. A candidate is
+a boundary when the crc32 of the WINDOW bytes before it matches MASK.
+Content without anchors is split at MAX_SIZE.
+"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import zlib
+
+
+ANCHOR = b"\n"
+WINDOW = 48
+MASK = (1 << 8) - 1  # Accept 1/256 of the candidates
+MIN_SIZE = 16 * 1024
+MAX_SIZE = 256 * 1024
+
+
+def cut_point(data, start=0):
+    """Return end of the chunk that starts at start
+    Return None if data does not have enough bytes to decide"""
+    limit = start + MAX_SIZE
+    position = data.find(ANCHOR, start + MIN_SIZE, limit)
+    while position != -1:
+        window = data[position - WINDOW:position]
+        if not zlib.crc32(window) & MASK:
+            return position + 1
+        position = data.find(ANCHOR, position + 1, limit)
+    if len(data) >= limit:
+        return limit
+    return None
+
+
+def split(read, block_size):
+    """Split stream into content-defined chunks
+
+    Arguments:
+    read -- function that reads at most block_size bytes
+    block_size -- number of bytes to read at a time
+    """
+    data = b""
+    start = 0
+    eof = False
+    while True:
+        end = cut_point(data, start)
+        if end is not None:
+            yield data[start:end]
+            start = end
+            continue
+        if eof:
+            break
+        block = read(block_size)
+        eof = not block
+        data = data[start:] + block
+        start = 0
+    if start < len(data):
+        yield data[start:]
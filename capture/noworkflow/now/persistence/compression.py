@@ -0,0 +1,132 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Compression of Content Database blobs
+
+Compressed blobs start with a header: magic, codec, original size.
+Blobs without the magic are stored raw. Raw blobs that start with the magic
+receive a RAW header to avoid ambiguity.
+Chunked blobs use the same header followed by a manifest of chunk hashes.
+"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import struct
+import zlib
+
+try:
+    import lzma
+except ImportError:
+    lzma = None                                                                  # pylint: disable=invalid-name
+
+
+MAGIC = b"\x89NWZ"
+HEADER = struct.Struct(">4scQ")
+RAW, ZLIB, LZMA, CHUNKED = b"r", b"z", b"x", b"c"
+CODEC_NAMES = {RAW: "raw", ZLIB: "zlib", LZMA: "lzma", CHUNKED: "chunked"}
+MIN_SIZE = 512  # Smaller blobs are not worth compressing
+LZMA_SIZE = 1024 * 1024  # Use lzma for blobs larger than it
+SIGNATURES = (
+    MAGIC,
+    b"\x1f\x8b",  # gzip
+    b"PK\x03\x04",  # zip, docx, xlsx, jar, npz
+    b"BZh",  # bzip2
+    b"\xfd7zXZ\x00",  # xz
+    b"7z\xbc\xaf\x27\x1c",  # 7z
+    b"\x28\xb5\x2f\xfd",  # zstd
+    b"\x04\x22\x4d\x18",  # lz4
+    b"\x89PNG",
+    b"\xff\xd8\xff",  # jpeg
+    b"GIF8",
+    b"OggS",
+    b"fLaC",
+    b"ID3",  # mp3
+)
+
+
+def choose_codec(head, size):
+    """Choose codec by size and by the first bytes of the content"""
+    if size < MIN_SIZE or head.startswith(SIGNATURES):
+        return RAW
+    if lzma is not None and size >= LZMA_SIZE:
+        return LZMA
+    return ZLIB
+
+
+def compressor(codec):
+    """Return compressor object for codec. None for RAW"""
+    if codec == ZLIB:
+        return zlib.compressobj(6)
+    if codec == LZMA:
+        return lzma.LZMACompressor(preset=1)
+    return None
+
+
+def header(codec, size):
+    """Return blob header"""
+    return HEADER.pack(MAGIC, codec, size)
+
+
+def encode(content, compress=True):
+    """Return stored representation of content"""
+    codec = choose_codec(content[:8], len(content)) if compress else RAW
+    comp = compressor(codec)
+    if comp is not None:
+        data = comp.compress(content) + comp.flush()
+        if len(data) + HEADER.size < len(content):
+            return header(codec, len(content)) + data
+    if content.startswith(MAGIC):
+        return header(RAW, len(content)) + content
+    return content
+
+
+def encode_manifest(size, hashes):
+    """Return stored representation of a chunked content
+
+    Arguments:
+    size -- size of the whole content
+    hashes -- list of chunk hashes
+    """
+    return header(CHUNKED, size) + "\n".join(hashes).encode("ascii")
+
+
+def decode_manifest(stored):
+    """Return list of chunk hashes of stored representation
+    Return None if it is not a chunked content"""
+    if not stored.startswith(MAGIC):
+        return None
+    _, codec, _ = HEADER.unpack_from(stored)
+    if codec != CHUNKED:
+        return None
+    payload = stored[HEADER.size:].decode("ascii")
+    return payload.split("\n") if payload else []
+
+
+def decode(stored):
+    """Return content of stored representation
+    Chunked contents must be resolved by decode_manifest"""
+    if not stored.startswith(MAGIC):
+        return stored
+    _, codec, _ = HEADER.unpack_from(stored)
+    data = stored[HEADER.size:]
+    if codec == ZLIB:
+        return zlib.decompress(data)
+    if codec == LZMA:
+        if lzma is None:
+            raise IOError("lzma is not available to decompress content")
+        return lzma.decompress(data)
+    return data
+
+
+def describe(head, stored_size):
+    """Return codec name and original size of a stored blob
+
+    Arguments:
+    head -- first HEADER.size bytes of the stored blob
+    stored_size -- size of the stored blob
+    """
+    if len(head) < HEADER.size or not head.startswith(MAGIC):
+        return "raw", stored_size
+    _, codec, size = HEADER.unpack_from(head)
+    return CODEC_NAMES.get(codec, "unknown"), size
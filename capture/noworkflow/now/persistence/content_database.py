@@ -7,12 +7,25 @@ from __future__ import (absolute_import, print_function,
                         division, unicode_literals)
 
 import hashlib
+import itertools
 import os
+import threading
+import time
 
 from os.path import join, isdir, isfile
 
+from ..utils.cross_version import queue
+from ..utils.metaprofiler import meta_profiler
+
+from . import chunking, compression
+from .packfile import PackStore, PACK_DIRNAME
+
 
 CONTENT_DIRNAME = "content"
+CHUNK_SIZE = 1024 * 1024
+RACY_INTERVAL = 2  # seconds. Files modified recently are not memoized
+WRITE_QUEUE_SIZE = 256  # Maximum number of blobs waiting for a writer
+BACKENDS = ("loose", "pack")
 
 
 class ContentDatabase(object):
@@ -21,17 +34,37 @@ class ContentDatabase(object):
     def __init__(self, persistence_config):
         self.content_path = None  # Base path for storing content of files
         self.std_open = open  # Original Python open function.
+        self.temp_ids = itertools.count()  # Unique suffixes for temp files
+        # Map of absolute path to [inode, size, mtime_ns, content_hash]
+        # None disables the memo
+        self.stat_memo = None
+        self.stat_memo_used = set()  # Paths that should be stored
+        # Asynchronous writes. None writes blobs synchronously
+        self.write_queue = None
+        self.writers = []
+        self.pending_hashes = set()  # Hashes already sent to the queue
+        self.write_errors = []
+        self.write_lock = threading.Lock()
+        self.write_stats = {}
+        # Backend for new blobs: one file per blob (loose) or packfiles
+        # Both are always readable
+        self.backend = "loose"
+        self.packs = PackStore()
+        self.compression = True  # Compress blobs according to size and type
+        self.chunking = False  # Split large files into content-defined chunks
 
         persistence_config.add(self)
 
     def set_path(self, config):
         """Set content_path"""
         self.content_path = join(config.provenance_path, CONTENT_DIRNAME)
+        self.packs.set_path(self.content_path)
 
-    def mock(self, config):                                                      # pylint: disable=unused-argument, no-self-use
+    def mock(self, config):                                                      # pylint: disable=unused-argument
         """Mock storage for tests"""
-        ContentDatabase.put = lambda s, c: hashlib.sha1(c).hexdigest()
-        ContentDatabase.get = lambda s, c: "".encode("utf-8")
+        self.put = lambda c: hashlib.sha1(c).hexdigest()
+        self.get = lambda c: "".encode("utf-8")
+        self.put_file = self.hash_file
 
     def connect(self, config):
         """Create content directory"""
@@ -47,28 +80,266 @@ class ContentDatabase(object):
         content -- binary text to be saved
         """
         content_hash = hashlib.sha1(content).hexdigest()
+        if self.write_queue is None:
+            self._write(content_hash, content)
+        elif content_hash not in self.pending_hashes:
+            self.pending_hashes.add(content_hash)
+            with self.write_lock:
+                stats = self.write_stats
+                stats["depth"] = max(
+                    stats["depth"], self.write_queue.qsize() + 1)
+            # Blocks when the queue is full
+            self.write_queue.put((content_hash, content))
+        return content_hash
+
+    def _content_dir(self, content_hash):
+        """Return content directory of hash. Create it if it does not exist"""
         content_dirname = join(self.content_path, content_hash[:2])
         if not isdir(content_dirname):
-            os.makedirs(content_dirname)
-        content_filename = join(content_dirname, content_hash[2:])
-        if not isfile(content_filename):
-            with self.std_open(content_filename, "wb") as content_file:
-                content_file.write(content)
+            try:
+                os.makedirs(content_dirname)
+            except OSError:
+                # Another writer may have created it
+                if not isdir(content_dirname):
+                    raise
+        return content_dirname
+
+    def _loose_filename(self, content_hash):
+        """Return path of loose object"""
+        return join(self.content_path, content_hash[:2], content_hash[2:])
+
+    def exists(self, content_hash):
+        """Check if content_hash is stored as a loose object or in a pack"""
+        return (isfile(self._loose_filename(content_hash)) or
+                self.packs.has(content_hash))
+
+    def _write(self, content_hash, content):
+        """Write content to the content database, if it does not exist"""
+        if self.exists(content_hash):
+            return 0
+        return self._store(
+            content_hash, compression.encode(content, self.compression))
+
+    def _store(self, content_hash, stored):
+        """Write stored representation of content_hash"""
+        if self.backend == "pack":
+            return self.packs.put(content_hash, stored)
+        content_filename = join(
+            self._content_dir(content_hash), content_hash[2:])
+        temp_filename = join(self.content_path, "tmp_{}_{}".format(
+            os.getpid(), next(self.temp_ids)))
+        try:
+            with self.std_open(temp_filename, "wb") as temp_file:
+                temp_file.write(stored)
+            if not isfile(content_filename):
+                os.rename(temp_filename, content_filename)
+        finally:
+            if isfile(temp_filename):
+                os.remove(temp_filename)
+        return len(stored)
+
+    def start_writers(self, count):
+        """Start threads that write blobs in background
+        put hashes the content inline and leaves the disk access to writers
+
+        Arguments:
+        count -- number of writer threads. 0 keeps writes synchronous
+        """
+        if not count or self.write_queue is not None:
+            return
+        self.write_queue = queue.Queue(WRITE_QUEUE_SIZE)
+        self.pending_hashes = set()
+        self.write_errors = []
+        self.write_stats = {"depth": 0, "writes": 0, "bytes": 0, "time": 0.0}
+        for _ in range(count):
+            writer = threading.Thread(target=self._write_worker)
+            writer.daemon = True
+            writer.start()
+            self.writers.append(writer)
+
+    def _write_worker(self):
+        """Drain the write queue until it receives None"""
+        write_queue = self.write_queue
+        while True:
+            item = write_queue.get()
+            try:
+                if item is None:
+                    return
+                before = time.time()
+                size = self._write(*item)
+                duration = time.time() - before
+                with self.write_lock:
+                    self.write_stats["writes"] += 1
+                    self.write_stats["bytes"] += size
+                    self.write_stats["time"] += duration
+            except Exception as exc:                                             # pylint: disable=broad-except
+                self.write_errors.append(exc)
+            finally:
+                write_queue.task_done()
+
+    def stop_writers(self):
+        """Wait for pending writes and stop writer threads
+        Report queue depth and write throughput to the meta profiler"""
+        if self.write_queue is None:
+            return
+        for _ in self.writers:
+            self.write_queue.put(None)
+        for writer in self.writers:
+            writer.join()
+        stats = self.write_stats
+        meta_profiler.data["content_queue_depth"] = stats["depth"]
+        meta_profiler.data["content_writes"] = stats["writes"]
+        if stats["time"]:
+            # MB/s while writing
+            meta_profiler.data["content_throughput"] = (
+                stats["bytes"] / stats["time"] / (1024 * 1024))
+        self.write_queue = None
+        self.writers = []
+        self.pending_hashes = set()
+        errors, self.write_errors = self.write_errors, []
+        if errors:
+            raise errors[0]
+
+    def hash_file(self, path):
+        """Return content hash of file in path without storing it
+
+        Arguments:
+        path -- file path
+        """
+        sha1 = hashlib.sha1()
+        with self.std_open(path, "rb") as fil:
+            for chunk in iter(lambda: fil.read(CHUNK_SIZE), b""):
+                sha1.update(chunk)
+        return sha1.hexdigest()
+
+    def _lookup_memo(self, path):
+        """Return (memo key, stat info, memoized hash or None)"""
+        key = os.path.abspath(path)
+        stat = os.stat(key)
+        mtime_ns = getattr(stat, "st_mtime_ns", None)
+        if mtime_ns is None:
+            mtime_ns = int(stat.st_mtime * 1000000000)
+        info = [stat.st_ino, stat.st_size, mtime_ns]
+        entry = self.stat_memo.get(key)
+        if entry is not None and entry[:3] == info:
+            self.stat_memo_used.add(key)
+            return key, info, entry[3]
+        return key, info, None
+
+    def _memoize(self, key, info, content_hash):
+        """Add file hash to memo, unless the file was modified recently"""
+        if time.time() - info[2] / 1000000000.0 > RACY_INTERVAL:
+            self.stat_memo[key] = info + [content_hash]
+            self.stat_memo_used.add(key)
+
+    def put_file(self, path):
+        """Put file content in the content database
+        Read file in chunks of CHUNK_SIZE to keep memory usage flat.
+        Content is written to a temporary file that is renamed into place
+        If the file stat matches the memo, return the memoized hash
+
+        Return: content hash code
+
+        Arguments:
+        path -- file path
+        """
+        if self.stat_memo is not None:
+            key, info, content_hash = self._lookup_memo(path)
+            if content_hash is not None:
+                return content_hash
+            content_hash = self._put_file(path)
+            self._memoize(key, info, content_hash)
+            return content_hash
+        return self._put_file(path)
+
+    def _put_file(self, path):
+        """Put file content in the content database without memo"""
+        if (self.write_queue is not None and
+                os.path.getsize(path) <= CHUNK_SIZE):
+            # Small files go through the write queue
+            with self.std_open(path, "rb") as fil:
+                return self.put(fil.read())
+        if self.chunking and os.path.getsize(path) > CHUNK_SIZE:
+            return self._put_chunked(path)
+        sha1 = hashlib.sha1()
+        temp_filename = join(self.content_path, "tmp_{}_{}".format(
+            os.getpid(), next(self.temp_ids)))
+        try:
+            with self.std_open(path, "rb") as fil:
+                with self.std_open(temp_filename, "wb") as temp_file:
+                    self._encode_stream(fil, temp_file, sha1)
+            content_hash = sha1.hexdigest()
+            if self.exists(content_hash):
+                return content_hash
+            if self.backend == "pack":
+                self.packs.put_file(content_hash, temp_filename)
+            else:
+                os.rename(temp_filename, join(
+                    self._content_dir(content_hash), content_hash[2:]))
+        finally:
+            if isfile(temp_filename):
+                os.remove(temp_filename)
+        return content_hash
+
+    def _put_chunked(self, path):
+        """Put file content as content-defined chunks and a manifest
+        The manifest is stored with the hash of the whole content"""
+        sha1 = hashlib.sha1()
+        hashes = []
+        size = 0
+        with self.std_open(path, "rb") as fil:
+            for chunk in chunking.split(fil.read, CHUNK_SIZE):
+                sha1.update(chunk)
+                size += len(chunk)
+                hashes.append(self.put(chunk))
+        content_hash = sha1.hexdigest()
+        if self.write_queue is not None:
+            # The manifest must not refer to chunks that are not stored yet
+            # Failed chunk writes are raised by stop_writers
+            self.write_queue.join()
+            if self.write_errors:
+                return content_hash
+        if not self.exists(content_hash):
+            self._store(
+                content_hash, compression.encode_manifest(size, hashes))
         return content_hash
 
+    def _encode_stream(self, fil, temp_file, sha1):
+        """Copy fil to temp_file in chunks, compressing them
+        Update sha1 with the uncompressed content"""
+        first = fil.read(CHUNK_SIZE)
+        codec = compression.RAW
+        if self.compression:
+            codec = compression.choose_codec(
+                first[:8], os.fstat(fil.fileno()).st_size)
+        comp = compression.compressor(codec)
+        has_header = comp is not None or first.startswith(compression.MAGIC)
+        if has_header:
+            # Placeholder. The original size is only known at the end
+            temp_file.write(compression.header(codec, 0))
+        size = 0
+        chunks = iter(lambda: fil.read(CHUNK_SIZE), b"")
+        for chunk in itertools.chain([first], chunks):
+            sha1.update(chunk)
+            size += len(chunk)
+            temp_file.write(comp.compress(chunk) if comp else chunk)
+        if comp is not None:
+            temp_file.write(comp.flush())
+        if has_header:
+            temp_file.seek(0)
+            temp_file.write(compression.header(codec, size))
+
     def find_subhash(self, content_hash):
         """Get hash that starts by content_hash"""
         content_dirname = content_hash[:2]
         contet_filename = content_hash[2:]
         content_dir = join(self.content_path, content_dirname)
-        if not isdir(content_dir):
-            return None
-        for _, _, filenames in os.walk(content_dir):
-            for name in filenames:
-                if name.startswith(contet_filename):
-                    return content_dirname + name
-        return None
-
+        if isdir(content_dir):
+            for _, _, filenames in os.walk(content_dir):
+                for name in filenames:
+                    if name.startswith(contet_filename):
+                        return content_dirname + name
+        return self.packs.find_subhash(content_hash)
 
     def get(self, content_hash):
         """Get content from the content database
@@ -78,8 +349,79 @@ class ContentDatabase(object):
         Arguments:
         content_hash -- content hash code
         """
-        content_filename = join(self.content_path,
-                                content_hash[:2],
-                                content_hash[2:])
+        stored = self.get_stored(content_hash)
+        hashes = compression.decode_manifest(stored)
+        if hashes is not None:
+            return b"".join(self.get(chunk_hash) for chunk_hash in hashes)
+        return compression.decode(stored)
+
+    def get_head(self, content_hash):
+        """Get compression header of content_hash
+        Return None if it does not exist"""
+        size = compression.HEADER.size
+        content_filename = self._loose_filename(content_hash)
+        if isfile(content_filename):
+            with self.std_open(content_filename, "rb") as content_file:
+                return content_file.read(size)
+        return self.packs.get(content_hash, size)
+
+    def get_stored(self, content_hash):
+        """Get stored representation of content_hash"""
+        content_filename = self._loose_filename(content_hash)
+        if not isfile(content_filename):
+            stored = self.packs.get(content_hash)
+            if stored is not None:
+                return stored
         with self.std_open(content_filename, "rb") as content_file:
             return content_file.read()
+
+    def flush(self):
+        """Finish current packfile"""
+        self.packs.finish()
+
+    def loose_objects(self):
+        """Iterate on (content_hash, path) of loose objects"""
+        if not isdir(self.content_path):
+            return
+        for dirname in sorted(os.listdir(self.content_path)):
+            content_dir = join(self.content_path, dirname)
+            if len(dirname) != 2 or not isdir(content_dir):
+                continue
+            for name in sorted(os.listdir(content_dir)):
+                yield dirname + name, join(content_dir, name)
+
+    def pack_loose_objects(self, remove=True):
+        """Move loose objects into packfiles
+
+        Return: number of objects and number of bytes moved
+
+        Keyword arguments:
+        remove -- remove loose objects after writing the pack index
+        """
+        count, size = 0, 0
+        moved = []
+        for content_hash, path in self.loose_objects():
+            if not self.packs.has(content_hash):
+                size += self.packs.put_file(content_hash, path)
+                count += 1
+            moved.append(path)
+        self.packs.finish()
+        if remove:
+            for path in moved:
+                os.remove(path)
+            for dirname in os.listdir(self.content_path):
+                content_dir = join(self.content_path, dirname)
+                if (dirname != PACK_DIRNAME and isdir(content_dir) and
+                        not os.listdir(content_dir)):
+                    os.rmdir(content_dir)
+        return count, size
+
+    def stored_objects(self):
+        """Iterate on (content_hash, stored size, header) of all objects
+        The header has compression.HEADER.size bytes"""
+        size = compression.HEADER.size
+        for content_hash, path in self.loose_objects():
+            with self.std_open(path, "rb") as fil:
+                yield content_hash, os.path.getsize(path), fil.read(size)
+        for content_hash, length, head in self.packs.heads(size):
+            yield content_hash, length, head
@@ -0,0 +1,275 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Garbage collection of the provenance store
+
+Remove contents that are not referenced by the relational database.
+The collection is divided in units (loose directories and packfiles) that
+are processed in order. When a time budget expires, the last processed unit
+is saved in a cursor file and the next collection resumes from it.
+"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import binascii
+import os
+import time
+
+from os.path import join, isdir, isfile
+
+from sqlalchemy import select
+
+from . import relational, content, compression
+from .models import Trial, Module, FunctionDef, FileAccess, GraphCache
+from .models import HashCache, Activation, ObjectValue, Variable, Value
+from .packfile import PACK_DIRNAME
+from .serializers import CONTENT_PREFIX
+
+
+CURSOR_FILENAME = "gc_cursor"
+RUNNING_LIMIT = 7 * 24 * 3600  # Unfinished trials older than it crashed
+# Columns that store content hashes
+HASH_COLUMNS = [
+    (Trial, "code_hash"),
+    (Module, "code_hash"),
+    (FunctionDef, "code_hash"),
+    (FileAccess, "content_hash_before"),
+    (FileAccess, "content_hash_after"),
+    (GraphCache, "content_hash"),
+]
+# Columns that may store CONTENT_PREFIX + content hash
+VALUE_COLUMNS = [
+    (Activation, "return_value"),
+    (ObjectValue, "value"),
+    (Variable, "value"),
+    (Value, "value"),
+]
+# Columns that may refer to chunked contents
+CHUNKED_COLUMNS = [
+    (Module, "code_hash"),
+    (FileAccess, "content_hash_before"),
+    (FileAccess, "content_hash_after"),
+]
+
+
+def column_values(model, name, session):
+    """Return distinct non null values of column"""
+    column = getattr(model.t.c, name)
+    query = select([column]).where(column != None).distinct()                    # pylint: disable=singleton-comparison
+    return {value for value, in session.execute(query)}
+
+
+class GarbageCollector(object):
+    """Remove unreferenced contents"""
+
+    def __init__(self, grace=3600, time_budget=0, dry_run=False):
+        self.grace = grace  # Contents newer than it (in seconds) are kept
+        self.time_budget = time_budget  # Seconds. 0 means no limit
+        self.dry_run = dry_run
+        self.start = None
+        self.cutoff = None  # Contents modified after it are kept
+        self.live = set()
+        self.removed_objects = 0
+        self.removed_bytes = 0
+        self.repacked = 0
+        self.removed_memo = 0
+        self.complete = False
+
+    @property
+    def cursor_path(self):
+        """Return path of cursor file"""
+        return join(content.content_path, CURSOR_FILENAME)
+
+    def load_live(self, session=None):
+        """Load hashes referenced by the relational database"""
+        session = session or relational.session
+        live = set()
+        for model, name in HASH_COLUMNS:
+            live |= column_values(model, name, session)
+        for model, name in VALUE_COLUMNS:
+            column = getattr(model.t.c, name)
+            query = select([column]).where(
+                column.like(CONTENT_PREFIX + "%")).distinct()
+            live.update(
+                value[len(CONTENT_PREFIX):]
+                for value, in session.execute(query))
+        for model, name in CHUNKED_COLUMNS:
+            for content_hash in column_values(model, name, session):
+                head = content.get_head(content_hash)
+                if head and compression.describe(
+                        head, len(head))[0] == "chunked":
+                    live.update(compression.decode_manifest(
+                        content.get_stored(content_hash)))
+        self.live = live
+        return live
+
+    def load_cutoff(self, session=None):
+        """Protect contents of running trials
+        Their contents are written before their rows"""
+        session = session or relational.session
+        self.cutoff = self.start - self.grace
+        ttrial = Trial.t
+        query = select([ttrial.c.start]).where(ttrial.c.finish == None)          # pylint: disable=singleton-comparison
+        for start, in session.execute(query):
+            if start is None:
+                continue
+            start = time.mktime(start.timetuple())
+            if start > self.start - RUNNING_LIMIT:
+                self.cutoff = min(self.cutoff, start)
+        return self.cutoff
+
+    def clean_memo(self, session=None):
+        """Remove hash cache entries that refer to dead contents"""
+        session = session or relational.session
+        dead = column_values(HashCache, "content_hash", session) - self.live
+        self.removed_memo = len(dead)
+        if dead and not self.dry_run:
+            thash = HashCache.t
+            dead = list(dead)
+            for start in range(0, len(dead), 500):
+                session.execute(thash.delete().where(
+                    thash.c.content_hash.in_(dead[start:start + 500])))
+            session.commit()
+
+    def units(self):
+        """Return sorted list of collection units"""
+        result = []
+        content_path = content.content_path
+        if isdir(content_path):
+            result.extend(
+                "loose/" + name for name in sorted(os.listdir(content_path))
+                if len(name) == 2 and isdir(join(content_path, name))
+            )
+        result.append("temp/")
+        result.extend(
+            "pack/" + os.path.basename(index.idx_path)
+            for index in content.packs.load()
+        )
+        return sorted(result)
+
+    def is_old(self, path):
+        """Check if path was modified before the cutoff"""
+        return os.path.getmtime(path) < self.cutoff
+
+    def expired(self):
+        """Check if time budget expired"""
+        return (self.time_budget and
+                time.time() - self.start > self.time_budget)
+
+    def remove(self, path):
+        """Remove file and count its size"""
+        self.removed_objects += 1
+        self.removed_bytes += os.path.getsize(path)
+        if not self.dry_run:
+            os.remove(path)
+
+    def collect_loose(self, dirname):
+        """Remove dead loose objects in directory"""
+        content_dir = join(content.content_path, dirname)
+        if not isdir(content_dir):
+            return
+        for name in os.listdir(content_dir):
+            path = join(content_dir, name)
+            if dirname + name not in self.live and self.is_old(path):
+                self.remove(path)
+        if not self.dry_run and not os.listdir(content_dir):
+            os.rmdir(content_dir)
+
+    def collect_temp(self):
+        """Remove temporary files and unfinished packfiles"""
+        content_path = content.content_path
+        pack_path = join(content_path, PACK_DIRNAME)
+        for name in os.listdir(content_path):
+            path = join(content_path, name)
+            if name.startswith("tmp_") and self.is_old(path):
+                self.remove(path)
+        if not isdir(pack_path):
+            return
+        for name in os.listdir(pack_path):
+            path = join(pack_path, name)
+            base, ext = os.path.splitext(path)
+            unfinished = (
+                ext == ".tmp" or
+                (ext == ".pack" and not isfile(base + ".idx"))
+            )
+            if unfinished and self.is_old(path):
+                self.remove(path)
+
+    def collect_pack(self, name):
+        """Rewrite packfile without dead contents"""
+        for index in content.packs.load():
+            if os.path.basename(index.idx_path) != name:
+                continue
+            if not self.is_old(index.pack_path):
+                return
+            if self.dry_run:
+                for position in range(len(index)):
+                    digest, _, length = index.entry(position)
+                    content_hash = binascii.hexlify(digest).decode("ascii")
+                    if content_hash not in self.live:
+                        self.removed_objects += 1
+                        self.removed_bytes += length
+                return
+            count, size = content.packs.rewrite(index, self.live.__contains__)
+            if count:
+                self.repacked += 1
+                self.removed_objects += count
+                self.removed_bytes += size
+            return
+
+    def collect_unit(self, unit):
+        """Collect unit"""
+        kind, name = unit.split("/", 1)
+        if kind == "loose":
+            self.collect_loose(name)
+        elif kind == "temp":
+            self.collect_temp()
+        elif kind == "pack":
+            self.collect_pack(name)
+
+    def read_cursor(self):
+        """Return last processed unit of an incomplete collection"""
+        if not isfile(self.cursor_path):
+            return None
+        with content.std_open(self.cursor_path, "r") as fil:
+            return fil.read().strip() or None
+
+    def write_cursor(self, unit):
+        """Save last processed unit. None removes the cursor"""
+        if self.dry_run:
+            return
+        if unit is None:
+            if isfile(self.cursor_path):
+                os.remove(self.cursor_path)
+            return
+        with content.std_open(self.cursor_path, "w") as fil:
+            fil.write(unit)
+
+    def vacuum(self):
+        """Rebuild database file to release free pages"""
+        relational.session.commit()
+        relational.session.close()
+        with relational.engine.connect() as connection:
+            connection.execute("VACUUM")
+
+    def collect(self, vacuum=True):
+        """Run garbage collection until it finishes or time budget expires"""
+        self.start = time.time()
+        content.flush()
+        self.load_cutoff()
+        self.load_live()
+        self.clean_memo()
+        cursor = self.read_cursor()
+        units = [unit for unit in self.units() if cursor is None or
+                 unit > cursor]
+        for unit in units:
+            self.collect_unit(unit)
+            if self.expired() and unit != units[-1]:
+                self.write_cursor(unit)
+                return self
+        self.write_cursor(None)
+        self.complete = True
+        if vacuum and not self.dry_run:
+            self.vacuum()
+        return self
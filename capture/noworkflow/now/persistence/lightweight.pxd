@@ -1,6 +1,10 @@
 cdef class BaseLW:
     pass
 
+cdef class ColumnarView(BaseLW):
+    cdef public object _store;
+    cdef public int _index;
+
 cdef class ModuleLW(BaseLW):
     cdef public int trial_id, id;
     cdef public str name, path, version, code_hash;
@@ -23,7 +27,8 @@ cdef class ObjectLW(BaseLW):
 cdef class ActivationLW(BaseLW):
     cdef public int trial_id, id, line, caller_id, lasti;
     cdef public str definition_file, filename, name, return_value;
-    cdef public object start, finish;
+    cdef public object start_ns, finish_ns;
+    cdef public double weight;
     cdef public list file_accesses, slice_stack, args, kwargs, starargs;
     cdef public list loops;
     cdef public list conditions;
@@ -31,6 +36,17 @@ cdef class ActivationLW(BaseLW):
     cdef public dict context;
     cdef public bint with_definition, is_main, has_parameters;
 
+cdef class AggregateActivationLW(BaseLW):
+    cdef public int trial_id, id, caller_id, line;
+    cdef public str name, first_arguments, last_arguments;
+    cdef public double count;
+    cdef public object total_duration, min_duration, max_duration;
+    cdef public bint done;
+
+cdef class ValueLW(BaseLW):
+    cdef public int trial_id, id;
+    cdef public str value;
+
 cdef class ObjectValueLW(BaseLW):
     cdef public int trial_id, id, function_activation_id;
     cdef public str name, value, type;
@@ -39,13 +55,19 @@ cdef class FileAccessLw(BaseLW):
     cdef public int trial_id, id, function_activation_id;
     cdef public str name, mode, buffering;
     cdef public str content_hash_before, content_hash_after;
-    cdef public object timestamp;
+    cdef public object timestamp_ns;
     cdef public bint done;
 
+cdef class GovernorEventLW(BaseLW):
+    cdef public int trial_id, id, depth;
+    cdef public str action, definition_file, name;
+    cdef public object timestamp;
+    cdef public double overhead;
+
 cdef class VariableLW(BaseLW):
     cdef public int trial_id, id, activation_id, line;
     cdef public str name, value, type;
-    cdef public object time;
+    cdef public object time_ns;
 
 cdef class VariableDependencyLW(BaseLW):
     cdef public int trial_id, id;
@@ -6,11 +6,50 @@
 from __future__ import (absolute_import, print_function,
                         division, unicode_literals)
 
-from datetime import datetime
+import sys
+
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from operator import attrgetter
+from weakref import WeakValueDictionary
 
 from future.utils import viewitems, viewvalues
 
 from . import content
+from ..utils.cross_version import perf_counter_ns
+
+
+class Clock(object):
+    """Monotonic clock for capture timestamps
+    Timestamps are integer nanoseconds since the wall-clock anchor of the trial
+    """
+
+    def __init__(self):
+        self.anchor = datetime.now()
+        self.origin = perf_counter_ns()
+
+    def reset(self):
+        """Anchor clock at trial start. Return anchor"""
+        self.anchor = datetime.now()
+        self.origin = perf_counter_ns()
+        return self.anchor
+
+    def now(self):
+        """Return nanoseconds since anchor"""
+        return perf_counter_ns() - self.origin
+
+    def datetime(self, offset):
+        """Convert nanoseconds since anchor into datetime"""
+        if offset is None:
+            return None
+        return self.anchor + timedelta(microseconds=offset // 1000)
+
+
+clock = Clock()                                                                  # pylint: disable=invalid-name
+
+# Estimated size of a LW object in bytes, including its attributes
+OBJECT_SIZE = 512
 
 
 class ObjectStore(object):
@@ -27,6 +66,8 @@ class ObjectStore(object):
         self.store = {}
         self.id = 0                                                              # pylint: disable=invalid-name
         self.count = 0
+        # Objects completed since the last partial store
+        self.completed = []
 
     def __getitem__(self, index):
         return self.store[index]
@@ -37,17 +78,20 @@ class ObjectStore(object):
 
     def add(self, *args):
         """Add object using its __init__ arguments and return id"""
-        self.id += 1
-        self.count += 1
-        self.store[self.id] = self.cls(self.id, *args)
-        return self.id
+        return self.add_object(*args).id
 
     def add_object(self, *args):
         """Add object using its __init__ arguments and return object"""
         self.id += 1
         self.count += 1
-        self.store[self.id] = self.cls(self.id, *args)
-        return self.store[self.id]
+        obj = self.store[self.id] = self.cls(self.id, *args)
+        if obj.is_complete():
+            self.completed.append(obj)
+        return obj
+
+    def complete(self, obj):
+        """Enqueue object that became complete after being added"""
+        self.completed.append(obj)
 
     def dry_add(self, *args):
         """Return object that would be added by add_object
@@ -88,29 +132,88 @@ class ObjectStore(object):
         self.count = len(self.store)
 
     def generator(self, trial_id, partial=False):
-        """Generator used for storing objects in database"""
-        for obj in self.values():
-            if partial and obj.is_complete():
-                del self[obj.id]
-            obj.trial_id = trial_id
-            yield obj
-        if partial:
-            self.clear()
+        """Generator used for storing objects in database
+        Partial stores yield and remove only completed objects. Incomplete
+        objects are stored at the end
+        """
+        completed, self.completed = self.completed, []
+        if not partial:
+            for obj in self.values():
+                obj.trial_id = trial_id
+                yield obj
+            return
+        store = self.store
+        for obj in completed:
+            if store.get(obj.id) is obj:
+                del store[obj.id]
+                self.count -= 1
+                obj.trial_id = trial_id
+                yield obj
+
+    def rows(self, trial_id, partial, keys, getter):                            # pylint: disable=unused-argument
+        """Generate rows with keys for storing objects in database"""
+        for obj in self.generator(trial_id, partial):
+            yield getter(obj)
 
     def has_items(self):
         """Return true if it has items"""
         return bool(self.count)
 
+    def memory_size(self):
+        """Return estimated size of stored objects in bytes"""
+        return self.count * OBJECT_SIZE
+
 
-def define_attrs(required, extra=[]):                                            # pylint: disable=dangerous-default-value
-    """Create __slots__ by adding extra attributes to required ones"""
+class ValueInterner(object):
+    """Map serialized values to ids of ValueLW objects in a store
+    Recent values are kept in a LRU cache. Values evicted from it receive
+    new ids when they appear again
+    """
+
+    def __init__(self, size=65536):
+        self.size = size
+        self.store = None
+        self.cache = OrderedDict()
+        # Python 2 OrderedDict does not have move_to_end
+        self.move_to_end = getattr(self.cache, "move_to_end", None)
+
+    def reset(self, store):
+        """Intern values into store"""
+        self.store = store
+        self.cache = OrderedDict()
+        self.move_to_end = getattr(self.cache, "move_to_end", None)
+
+    def intern(self, value):
+        """Return id of value"""
+        if value is None:
+            return None
+        cache = self.cache
+        vid = cache.get(value)
+        if vid is None:
+            vid = cache[value] = self.store.add(value)
+            if len(cache) > self.size:
+                cache.popitem(last=False)
+        elif self.move_to_end is not None:
+            self.move_to_end(value)
+        else:
+            cache[value] = cache.pop(value)
+        return vid
+
+
+values = ValueInterner()                                                         # pylint: disable=invalid-name
+
+
+def define_attrs(required, extra=[], derived=[]):                                # pylint: disable=dangerous-default-value
+    """Create __slots__ by adding extra attributes to required ones
+    Derived attributes are stored, but they are properties instead of slots
+    """
     slots = tuple(required + extra)
-    attributes = tuple(required)
+    attributes = tuple(required + derived)
 
     return slots, attributes
 
 
-class BaseLW:                                                                    # pylint: disable=too-few-public-methods
+class BaseLW(object):                                                            # pylint: disable=too-few-public-methods
     """Lightweight modules base class"""
 
     def keys(self):
@@ -126,6 +229,356 @@ class BaseLW:
         return getattr(self, key)
 
 
+try:
+    INT_TYPECODE = array("q").typecode
+except ValueError:
+    INT_TYPECODE = "l"
+# Represents None in integer columns
+NONE_INT = -(2 ** 63)
+
+
+def column_property(name, interned):
+    """Create property that accesses column of ColumnarObjectStore"""
+    def getter(self):
+        """Read column"""
+        store = self._store                                                      # pylint: disable=protected-access
+        position = self._index - store.offset                                    # pylint: disable=protected-access
+        if position < 0:
+            return getattr(store.stubs[self._index], name)                       # pylint: disable=protected-access
+        value = store.columns[name][position]
+        if interned:
+            return store.strings[value]
+        return None if value == NONE_INT else value
+
+    def setter(self, value):
+        """Write column"""
+        store = self._store                                                      # pylint: disable=protected-access
+        position = self._index - store.offset                                    # pylint: disable=protected-access
+        if position < 0:
+            setattr(store.stubs[self._index], name, value)                       # pylint: disable=protected-access
+            return
+        store.columns[name][position] = (
+            store.intern(value) if interned else
+            NONE_INT if value is None else value
+        )
+
+    return property(getter, setter)
+
+
+class ColumnarView(BaseLW):
+    """Lightweight view of a row of ColumnarObjectStore"""
+
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store, index):                                            # pylint: disable=super-init-not-called
+        self._store = store
+        self._index = index
+
+    @property
+    def id(self):                                                                # pylint: disable=invalid-name
+        """Return row id"""
+        return self._index
+
+    @id.setter
+    def id(self, value):                                                         # pylint: disable=invalid-name
+        """Row ids are defined by the store"""
+
+    @property
+    def trial_id(self):
+        """Return trial id of store"""
+        return self._store.trial_id
+
+    @trial_id.setter
+    def trial_id(self, value):
+        """Set trial id of store"""
+        self._store.trial_id = value
+
+    def __eq__(self, other):
+        return (isinstance(other, ColumnarView) and
+                self._store is other._store and                                  # pylint: disable=protected-access
+                self._index == other._index)                                     # pylint: disable=protected-access
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((id(self._store), self._index))
+
+    @classmethod
+    def create(cls, lwcls):
+        """Create view class for lightweight class
+        The view reuses the methods and properties of the lightweight class
+        and reads and writes its columns from the store
+        """
+        namespace = {"__slots__": ()}
+        for key, value in viewitems(lwcls.__dict__):
+            if key not in lwcls.__slots__ and key not in (
+                    "__init__", "__slots__", "__dict__", "__weakref__"):
+                namespace[key] = value
+        for name, kind in lwcls.columns:
+            namespace[name] = column_property(name, kind == "s")
+        return type(str(lwcls.__name__ + "View"), (cls,), namespace)
+
+
+class ColumnarObjectStore(object):
+    """Temporary storage for LW objects in array columns
+    The LW class must define columns: a tuple of (name, kind), where kind is
+    "i" for integers or "s" for interned strings. Besides columns, objects
+    have only id and trial_id. Objects are either always complete or never
+    complete. Items are views of rows
+
+    Stores with spill enabled track views that are alive. Evicting the store
+    keeps these rows as stubs and reads other rows through a loader
+    """
+
+    def __init__(self, cls):
+        """Initialize Columnar Object Store
+
+
+        Arguments:
+        cls -- LW object class
+        """
+        self.cls = cls
+        self.view = ColumnarView.create(cls)
+        self.init = cls.__dict__["__init__"]
+        self.kinds = dict(cls.columns)
+        self.id = 0                                                              # pylint: disable=invalid-name
+        self.count = 0
+        self.trial_id = -1
+        # Id of first row in columns
+        self.offset = 1
+        # Objects are always complete or never complete. None: unknown
+        self.always_complete = None
+        self.deleted = set()
+        self.columns = {}
+        self.strings = []
+        self.interned = {}
+        # Estimated size of strings in bytes
+        self.strings_size = 0
+        # Views that are alive by id. None: views are not tracked
+        self.views = None
+        # Evicted rows that are still referenced by id : LW object
+        self.stubs = {}
+        # Function that loads evicted rows by id. None: rows are lost
+        self.loader = None
+        self.reset()
+
+    def reset(self):
+        """Remove all rows"""
+        self.offset = self.id + 1
+        self.count = len(self.stubs)
+        self.deleted = set()
+        self.columns = {
+            name: array(INT_TYPECODE) for name, _ in self.cls.columns
+        }
+        self.strings = [None]
+        self.interned = {None: 0}
+        self.strings_size = 0
+
+    def intern(self, value):
+        """Return index of value in strings"""
+        try:
+            return self.interned[value]
+        except KeyError:
+            index = self.interned[value] = len(self.strings)
+            self.strings.append(value)
+            self.strings_size += sys.getsizeof(value)
+            return index
+
+    def exists(self, index):
+        """Check if object with id exists"""
+        return self.offset <= index <= self.id and index not in self.deleted
+
+    def get_view(self, index):
+        """Return view of row. Reuse tracked view if it is alive"""
+        views = self.views
+        if views is None:
+            return self.view(self, index)
+        view = views.get(index)
+        if view is None:
+            view = views[index] = self.view(self, index)
+        return view
+
+    def __getitem__(self, index):
+        if self.exists(index) or index in self.stubs:
+            return self.get_view(index)
+        if index < self.offset and self.loader is not None:
+            self.stubs[index] = self.loader(index)
+            self.count += 1
+            return self.get_view(index)
+        raise KeyError(index)
+
+    def __delitem__(self, index):
+        if index in self.stubs:
+            del self.stubs[index]
+        elif self.exists(index):
+            self.deleted.add(index)
+        else:
+            raise KeyError(index)
+        self.count -= 1
+
+    def add(self, *args):
+        """Add object using its __init__ arguments and return id"""
+        return self.add_object(*args).id
+
+    def add_object(self, *args):
+        """Add object using its __init__ arguments and return its view"""
+        self.id += 1
+        self.count += 1
+        kinds = self.kinds
+        for name, column in viewitems(self.columns):
+            column.append(0 if kinds[name] == "s" else NONE_INT)
+        view = self.get_view(self.id)
+        self.init(view, self.id, *args)
+        if self.always_complete is None:
+            self.always_complete = view.is_complete()
+        return view
+
+    def complete(self, obj):                                                     # pylint: disable=unused-argument, no-self-use
+        """Completeness is defined by the LW class"""
+        pass
+
+    def dry_add(self, *args):
+        """Return object that would be added by add_object
+        Do not add it to storage
+        """
+        return self.cls(-1, *args)
+
+    def remove(self, value):
+        """Remove object from storage"""
+        for obj in self.values():
+            if obj == value:
+                del self[obj.id]
+
+    def ids(self):
+        """Iterate on ids of existing objects"""
+        for index in sorted(self.stubs):
+            yield index
+        deleted = self.deleted
+        for index in range(self.offset, self.id + 1):
+            if index not in deleted:
+                yield index
+
+    def __iter__(self):
+        """Iterate on objects, and not ids"""
+        return self.values()
+
+    def items(self):
+        """Iterate on both ids and objects"""
+        for index in self.ids():
+            yield index, self.get_view(index)
+
+    iteritems = items
+
+    def values(self):
+        """Iterate on objects if they exist"""
+        for index in self.ids():
+            yield self.get_view(index)
+
+    def clear(self):
+        """Deleted rows are skipped. There is nothing to remove"""
+        pass
+
+    def generator(self, trial_id, partial=False):
+        """Generator used for storing objects in database"""
+        for row in self.rows(trial_id, partial, ("id",), None):
+            yield self.get_view(row[0])
+
+    def reader(self, key, trial_id):
+        """Return function that reads key of row by id and position"""
+        if key == "id":
+            return lambda index, position: index
+        if key == "trial_id":
+            return lambda index, position: trial_id
+        kind = self.kinds.get(key)
+        if kind is None:
+            # Derived attribute. The reader moves a private view across rows
+            view = self.view(self, self.offset)
+            getter = attrgetter(key)
+
+            def read_derived(index, position):                                   # pylint: disable=unused-argument
+                """Read derived attribute of row"""
+                view._index = index                                              # pylint: disable=protected-access
+                return getter(view)
+            return read_derived
+        column = self.columns[key]
+        if kind == "s":
+            strings = self.strings
+            return lambda index, position: strings[column[position]]
+        return lambda index, position: (
+            None if column[position] == NONE_INT else column[position])
+
+    def rows(self, trial_id, partial, keys, getter):                            # pylint: disable=unused-argument
+        """Generate rows with keys for storing objects in database
+        Rows are read from columns. Partial stores remove all rows of always
+        complete objects and do not store objects that are never complete
+        """
+        self.trial_id = trial_id
+        if partial and not self.always_complete:
+            return
+        if self.stubs:
+            read_stub = attrgetter(*keys)
+            for stub in viewvalues(self.stubs):
+                stub.trial_id = trial_id
+                row = read_stub(stub)
+                yield row if len(keys) > 1 else (row,)
+        readers = [self.reader(key, trial_id) for key in keys]
+        offset = self.offset
+        deleted = self.deleted
+        for index in range(offset, self.id + 1):
+            if index not in deleted:
+                position = index - offset
+                yield tuple(read(index, position) for read in readers)
+        if partial:
+            self.reset()
+
+    def has_items(self):
+        """Return true if it has items"""
+        return bool(self.count)
+
+    def memory_size(self):
+        """Return estimated size of rows and strings in bytes"""
+        return (
+            sum(len(column) * column.itemsize
+                for column in viewvalues(self.columns)) +
+            self.strings_size +
+            len(self.stubs) * OBJECT_SIZE
+        )
+
+    def enable_spill(self):
+        """Track views that are alive to keep them valid after evict"""
+        if self.views is None:
+            self.views = WeakValueDictionary()
+
+    def detach(self, index):
+        """Copy row into a LW object that does not depend on columns"""
+        view = self.view(self, index)
+        stub = self.cls.__new__(self.cls)
+        for name in self.kinds:
+            setattr(stub, name, getattr(view, name))
+        stub.id = index
+        stub.trial_id = self.trial_id
+        return stub
+
+    def evict(self, loader=None):
+        """Remove rows that were already stored in the database
+        Rows of views that are alive become stubs. Other rows are read by
+        loader when they are requested again
+        """
+        views = self.views or {}
+        stubs = {
+            index: stub for index, stub in viewitems(self.stubs)
+            if index in views
+        }
+        deleted = self.deleted
+        for index in range(self.offset, self.id + 1):
+            if index in views and index not in deleted:
+                stubs[index] = self.detach(index)
+        self.stubs = stubs
+        self.loader = loader
+        self.reset()
+
+
 # Deployment
 
 class ModuleLW(BaseLW):
@@ -282,13 +735,14 @@ class ActivationLW(BaseLW):
     """
 
     __slots__, attributes = define_attrs(
-        ["id", "name", "line", "return_value", "start", "finish", "caller_id",
-         "trial_id"],
+        ["id", "name", "line", "return_value", "start_ns", "finish_ns",
+         "caller_id", "weight", "trial_id"],
         ["file_accesses", "context", "slice_stack", "lasti", "definition_file",
          "args", "kwargs", "starargs", "with_definition", "filename",
          "is_main", "has_parameters",
          "loops", "conditions", "permanent_conditions",
-         "temp_context", "temp_line"]
+         "temp_context", "temp_line"],
+        ["start", "finish"]
     )
     special = {"caller_id"}
 
@@ -298,10 +752,13 @@ class ActivationLW(BaseLW):
         self.id = aid                                                            # pylint: disable=invalid-name
         self.name = name
         self.line = line
-        self.start = datetime.now()
-        self.finish = None
+        # Nanoseconds since trial start
+        self.start_ns = clock.now()
+        self.finish_ns = None
         self.caller_id = (caller_id if caller_id else -1)
         self.return_value = None
+        # Number of activations represented by this one in sampled trials
+        self.weight = 1
 
         # Name of the script with the call
         self.filename = filename
@@ -336,9 +793,19 @@ class ActivationLW(BaseLW):
         self.conditions = []
         self.permanent_conditions = []
 
+    @property
+    def start(self):
+        """Return start datetime"""
+        return clock.datetime(self.start_ns)
+
+    @property
+    def finish(self):
+        """Return finish datetime"""
+        return clock.datetime(self.finish_ns)
+
     def is_complete(self):
         """Activation can be removed from object store after setting finish"""
-        return self.finish is not None
+        return self.finish_ns is not None
 
     def is_comprehension(self):
         """Check if activation is comprehension"""
@@ -356,15 +823,98 @@ class ActivationLW(BaseLW):
         )
 
 
+class AggregateActivationLW(BaseLW):                                             # pylint: disable=too-many-instance-attributes
+    """AggregateActivation lightweight object
+    There are type definitions on lightweight.pxd
+    """
+
+    __slots__, attributes = define_attrs(
+        ["id", "name", "line", "count", "total_duration", "min_duration",
+         "max_duration", "first_arguments", "last_arguments", "caller_id",
+         "trial_id"],
+        ["done"]
+    )
+    special = {"caller_id"}
+
+    def __init__(self, aid, name, line, caller_id):
+        self.trial_id = -1
+        self.id = aid                                                            # pylint: disable=invalid-name
+        self.name = name
+        self.line = line
+        self.caller_id = (caller_id if caller_id else -1)
+        # Number of folded activations, considering sampling weights
+        self.count = 0
+        # Durations in microseconds
+        self.total_duration = 0
+        self.min_duration = None
+        self.max_duration = None
+        self.first_arguments = None
+        self.last_arguments = None
+        # The caller activation finished. No more calls will be folded
+        self.done = False
+
+    def add_call(self, weight, arguments):
+        """Fold call into aggregate"""
+        self.count += weight
+        if self.first_arguments is None:
+            self.first_arguments = arguments
+        self.last_arguments = arguments
+
+    def add_duration(self, duration):
+        """Add duration (in microseconds) of folded call"""
+        self.total_duration += duration
+        if self.min_duration is None or duration < self.min_duration:
+            self.min_duration = duration
+        if self.max_duration is None or duration > self.max_duration:
+            self.max_duration = duration
+
+    def is_complete(self):
+        """AggregateActivation can be removed once its caller finishes"""
+        return self.done
+
+    def __repr__(self):
+        return ("AggregateActivation(id={}, name={}, line={}, count={})"
+                "").format(self.id, self.name, self.line, self.count)
+
+
+class ValueLW(BaseLW):
+    """Value lightweight object
+    Serialized value referenced by object values and variables by id
+    There are type definitions on lightweight.pxd
+    """
+
+    __slots__, attributes = define_attrs(
+        ["trial_id", "id", "value"]
+    )
+    special = set()
+
+    def __init__(self, vid, value):
+        self.trial_id = -1
+        self.id = vid                                                            # pylint: disable=invalid-name
+        self.value = value
+
+    def is_complete(self):                                                       # pylint: disable=no-self-use
+        """Value can always be removed"""
+        return True
+
+    def __repr__(self):
+        return "Value(id={}, value={})".format(self.id, self.value)
+
+
 class ObjectValueLW(BaseLW):
     """ObjectValue lightweight object
     There are type definitions on lightweight.pxd
     """
 
     __slots__, attributes = define_attrs(
-        ["trial_id", "id", "name", "value", "type", "function_activation_id"]
+        ["trial_id", "id", "name", "type", "function_activation_id"],
+        ["value"],
+        ["value_id"]
     )
     special = set()
+    # Columns of ColumnarObjectStore
+    columns = (("name", "s"), ("value", "s"), ("type", "s"),
+               ("function_activation_id", "i"))
 
     def __init__(self, oid, name, value, otype, function_activation_id):         # pylint: disable=too-many-arguments
         self.trial_id = -1
@@ -374,6 +924,11 @@ class ObjectValueLW(BaseLW):
         self.type = otype
         self.function_activation_id = function_activation_id
 
+    @property
+    def value_id(self):
+        """Return id of interned value"""
+        return values.intern(self.value)
+
     def is_complete(self):                                                       # pylint: disable=no-self-use
         """ObjectValue can always be removed"""
         return True
@@ -394,10 +949,11 @@ class FileAccessLW(BaseLW):
     """
 
     __slots__, attributes = define_attrs(
-        ["id", "name", "mode", "buffering", "timestamp", "trial_id",
+        ["id", "name", "mode", "buffering", "timestamp_ns", "trial_id",
          "content_hash_before", "content_hash_after",
          "function_activation_id"],
-        ["done"]
+        ["done"],
+        ["timestamp"]
     )
     special = {"function_activation_id"}
 
@@ -409,10 +965,15 @@ class FileAccessLW(BaseLW):
         self.buffering = "default"
         self.content_hash_before = None
         self.content_hash_after = None
-        self.timestamp = datetime.now()
+        self.timestamp_ns = clock.now()
         self.function_activation_id = -1
         self.done = False
 
+    @property
+    def timestamp(self):
+        """Return access datetime"""
+        return clock.datetime(self.timestamp_ns)
+
     def update(self, variables):
         """Update file access with dict"""
         for key, value in viewitems(variables):
@@ -426,6 +987,36 @@ class FileAccessLW(BaseLW):
         return ("FileAccess(id={}, name={}").format(self.id, self.name)
 
 
+class GovernorEventLW(BaseLW):                                                   # pylint: disable=too-many-instance-attributes
+    """GovernorEvent lightweight object
+    There are type definitions on lightweight.pxd
+    """
+
+    __slots__, attributes = define_attrs(
+        ["id", "timestamp", "action", "definition_file", "name", "depth",
+         "overhead", "trial_id"]
+    )
+    special = set()
+
+    def __init__(self, gid, action, definition_file, name, depth, overhead):    # pylint: disable=too-many-arguments
+        self.trial_id = -1
+        self.id = gid                                                            # pylint: disable=invalid-name
+        self.timestamp = datetime.now()
+        self.action = action
+        self.definition_file = definition_file
+        self.name = name
+        self.depth = depth
+        self.overhead = overhead
+
+    def is_complete(self):                                                       # pylint: disable=no-self-use
+        """GovernorEvent can always be removed from object store"""
+        return True
+
+    def __repr__(self):
+        return ("GovernorEvent(id={}, action={}, name={}, depth={})").format(
+            self.id, self.action, self.name, self.depth)
+
+
 # Slicing
 
 class VariableLW(BaseLW):
@@ -433,20 +1024,35 @@ class VariableLW(BaseLW):
     There are type definitions on lightweight.pxd
     """
     __slots__, attributes = define_attrs(
-        ["id", "activation_id", "name", "line", "value", "time", "trial_id",
-         "type"]
+        ["id", "activation_id", "name", "line", "time_ns", "trial_id", "type"],
+        ["value"],
+        ["time", "value_id"]
     )
     special = set()
+    # Columns of ColumnarObjectStore
+    columns = (("activation_id", "i"), ("name", "s"), ("line", "i"),
+               ("value", "s"), ("time_ns", "i"), ("type", "s"))
 
-    def __init__(self, vid, activation_id, name, line, value, time, _type):             # pylint: disable=too-many-arguments
+    def __init__(self, vid, activation_id, name, line, value, time_ns, _type):          # pylint: disable=too-many-arguments
         self.id = vid                                                            # pylint: disable=invalid-name
         self.activation_id = activation_id
         self.name = name
         self.line = line
         self.value = value
-        self.time = time
+        # Nanoseconds since trial start
+        self.time_ns = time_ns
         self.type = _type
 
+    @property
+    def time(self):
+        """Return variable datetime"""
+        return clock.datetime(self.time_ns)
+
+    @property
+    def value_id(self):
+        """Return id of interned value"""
+        return values.intern(self.value)
+
     def is_complete(self):                                                       # pylint: disable=no-self-use
         """Variable can never be removed"""
         return False
@@ -466,6 +1072,10 @@ class VariableDependencyLW(BaseLW):
          "target_activation_id", "target_id", "trial_id", "type"]
     )
     special = set()
+    # Columns of ColumnarObjectStore
+    columns = (("source_activation_id", "i"), ("source_id", "i"),
+               ("target_activation_id", "i"), ("target_id", "i"),
+               ("type", "s"))
 
     def __init__(self, vid, source_activation_id, source_id,                     # pylint: disable=too-many-arguments
                  target_activation_id, target_id, _type):
@@ -502,6 +1112,9 @@ class VariableUsageLW(BaseLW):
          "line", "ctx", "trial_id"]
     )
     special = set()
+    # Columns of ColumnarObjectStore
+    columns = (("activation_id", "i"), ("variable_id", "i"), ("line", "i"),
+               ("ctx", "s"))
 
     def __init__(self, vid, activation_id, variable_id, line, ctx):              # pylint: disable=too-many-arguments
         self.id = vid                                                            # pylint: disable=invalid-name
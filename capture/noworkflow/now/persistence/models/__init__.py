@@ -13,15 +13,19 @@ from .base import Model, MetaModel
 
 # Database Models
 from .activation import Activation
+from .aggregate_activation import AggregateActivation
 from .dependency import Dependency
 from .environment_attr import EnvironmentAttr
 from .file_access import FileAccess, UniqueFileAccess
 from .function_def import FunctionDef
+from .governor_event import GovernorEvent
 from .graph_cache import GraphCache
+from .hash_cache import HashCache
 from .head import Head
 from .module import Module
 from .object import Object
 from .object_value import ObjectValue
+from .value import Value
 from .variable import Variable
 from .variable_dependency import VariableDependency
 from .variable_usage import VariableUsage
@@ -35,10 +39,11 @@ from .trial_prolog import TrialProlog
 
 
 ORDER = [
-    Trial, Head, Tag, GraphCache,  # Trial
+    Trial, Head, Tag, GraphCache, HashCache,  # Trial
     Module, Dependency, EnvironmentAttr,  # Deployment
     FunctionDef, Object,  # Definition
-    Activation, ObjectValue, FileAccess,  # Execution
+    Activation, AggregateActivation, ObjectValue, FileAccess,
+    GovernorEvent, Value,  # Execution
     Variable, VariableUsage, VariableDependency  # Slicing
 ]
 
@@ -7,7 +7,7 @@ from __future__ import (absolute_import, print_function,
                         division, unicode_literals)
 
 from future.builtins import map as cvmap
-from sqlalchemy import Column, Integer, Text, TIMESTAMP
+from sqlalchemy import Column, Integer, Float, Text, TIMESTAMP
 from sqlalchemy import PrimaryKeyConstraint, ForeignKeyConstraint
 from sqlalchemy.orm import backref
 
@@ -39,7 +39,13 @@ class Activation(AlchemyProxy):
     return_value = Column(Text)
     start = Column(TIMESTAMP)
     finish = Column(TIMESTAMP)
+    # Nanoseconds since trial start. Old trials do not have them
+    start_ns = Column(Integer, index=True)
+    finish_ns = Column(Integer)
     caller_id = Column(Integer, index=True)
+    weight = Column(Float)
+    # Columns that may store references to the content database
+    __content_values__ = ("return_value",)
 
     _children = backref("children", order_by="Activation.start")
     caller = one(
@@ -49,6 +55,7 @@ class Activation(AlchemyProxy):
 
     object_values = many_viewonly_ref("activation", "ObjectValue")
     file_accesses = many_viewonly_ref("activation", "FileAccess")
+    aggregates = many_viewonly_ref("caller", "AggregateActivation")
 
     variables = many_ref("activation", "Variable")
     variables_usages = many_viewonly_ref("activation", "VariableUsage")
@@ -114,7 +121,9 @@ class Activation(AlchemyProxy):
 
     @property
     def duration(self):
-        """Calculate activation duration"""
+        """Calculate activation duration in microseconds"""
+        if self.finish_ns is not None and self.start_ns is not None:
+            return (self.finish_ns - self.start_ns) // 1000
         return int((self.finish - self.start).total_seconds() * 1000000)
 
     def show(self, _print=lambda x, offset=0: print(x)):
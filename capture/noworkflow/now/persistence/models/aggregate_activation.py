@@ -0,0 +1,58 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Aggregate Activation Model"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+from sqlalchemy import Column, Integer, Float, Text
+from sqlalchemy import PrimaryKeyConstraint, ForeignKeyConstraint
+
+from .base import AlchemyProxy, proxy_class, backref_one
+
+
+@proxy_class
+class AggregateActivation(AlchemyProxy):
+    """Represent calls to a function in the same line of a caller activation
+    that were folded into a single record after --aggregate activations"""
+
+    __tablename__ = "aggregate_activation"
+    __table_args__ = (
+        PrimaryKeyConstraint("trial_id", "id"),
+        ForeignKeyConstraint(["trial_id", "caller_id"],
+                             ["function_activation.trial_id",
+                              "function_activation.id"], ondelete="CASCADE"),
+        ForeignKeyConstraint(["trial_id"], ["trial.id"], ondelete="CASCADE"),
+    )
+    trial_id = Column(Integer, index=True)
+    id = Column(Integer, index=True)                                             # pylint: disable=invalid-name
+    name = Column(Text)
+    line = Column(Integer)
+    count = Column(Float)
+    total_duration = Column(Integer)
+    min_duration = Column(Integer)
+    max_duration = Column(Integer)
+    first_arguments = Column(Text)
+    last_arguments = Column(Text)
+    caller_id = Column(Integer, index=True)
+
+    trial = backref_one("trial")  # Trial.aggregate_activations
+    caller = backref_one("caller")  # Activation.aggregates
+
+    def show(self, _print=lambda x, offset=0: print(x)):
+        """Show object
+
+        Keyword arguments:
+        _print -- custom print function (default=print)
+        """
+        _print("{0.line}: {0.name} x{0.count:g} (total: {0.total_duration}us, "
+               "min: {0.min_duration}us, max: {0.max_duration}us)".format(self))
+        if self.first_arguments:
+            _print("First arguments: {}".format(self.first_arguments), 1)
+        if self.last_arguments:
+            _print("Last arguments: {}".format(self.last_arguments), 1)
+
+    def __repr__(self):
+        return "AggregateActivation({0.trial_id}, {0.id}, {0.name})".format(
+            self)
@@ -6,16 +6,47 @@
 from __future__ import (absolute_import, print_function,
                         division, unicode_literals)
 
+import time
 import weakref
 
 from collections import OrderedDict, namedtuple
 from functools import wraps
+from operator import attrgetter
 
 from future.utils import with_metaclass, viewitems, viewvalues, viewkeys
-from sqlalchemy import Column
+from sqlalchemy import Column, select
 from sqlalchemy.orm import relationship
 
-from .. import relational
+from .. import relational, content
+from ..serializers import CONTENT_PREFIX
+from ...utils.metaprofiler import meta_profiler
+
+
+FAST_INSERTS = {}  # (table, attributes) -> (sql, getter, converters)
+
+
+def fast_insert(table, lwcls, dialect):
+    """Return INSERT OR REPLACE statement, keys, row getter and converters
+    for storing lightweight objects of lwcls into table"""
+    key = (table.name, lwcls.attributes)
+    if key not in FAST_INSERTS:
+        keys = [name for name in lwcls.attributes if name in table.c]
+        quote = dialect.identifier_preparer.quote
+        sql = "INSERT OR REPLACE INTO {} ({}) VALUES ({})".format(
+            quote(table.name), ", ".join(quote(name) for name in keys),
+            ", ".join("?" for _ in keys)
+        )
+        getter = attrgetter(*keys)
+        if len(keys) == 1:
+            getter = lambda obj, _get=getter: (_get(obj),)
+        converters = []
+        for index, name in enumerate(keys):
+            processor = table.c[name].type.bind_processor(dialect)
+            special = name in lwcls.special
+            if processor or special:
+                converters.append((index, processor, special))
+        FAST_INSERTS[key] = (sql, keys, getter, converters)
+    return FAST_INSERTS[key]
 
 
 class MetaModel(type):
@@ -230,15 +261,77 @@ class AlchemyProxy(Model):
 
     @classmethod
     def fast_store(cls, trial_id, object_store, partial, conn=None):
-        """Bulk insert lightweight objects from ObjectStore"""
-        if object_store.has_items():
-            _conn = conn if conn else relational.engine.connect()
-            _conn.execute(
-                cls.__model__.__table__.insert().prefix_with("OR REPLACE"),
-                *object_store.generator(trial_id, partial)
-            )
-            if conn is None:
-                _conn.close()
+        """Bulk insert lightweight objects from ObjectStore
+        Rows are streamed to executemany in the store transaction"""
+        if not object_store.has_items():
+            return
+        if conn is None:
+            with relational.store_transaction() as store_conn:
+                return cls.fast_store(trial_id, object_store, partial,
+                                      conn=store_conn)
+        before = time.time()
+        sql, keys, getter, converters = fast_insert(
+            cls.__table__, object_store.cls, conn.dialect)
+        count = [0]
+
+        def rows():
+            """Convert and count rows"""
+            for row in object_store.rows(trial_id, partial, keys, getter):
+                count[0] += 1
+                if converters:
+                    row = list(row)
+                    for index, processor, special in converters:
+                        value = row[index]
+                        if special and value == -1:
+                            value = None
+                        if processor is not None and value is not None:
+                            value = processor(value)
+                        row[index] = value
+                yield row
+
+        cursor = conn.connection.cursor()
+        cursor.executemany(sql, rows())
+        cursor.close()
+        data = meta_profiler.data
+        data["stored_rows"] += count[0]
+        data["store_time"] += time.time() - before
+        if data["store_time"]:
+            data["rows_per_second"] = data["stored_rows"] / data["store_time"]
+
+    @classmethod
+    def fast_load(cls, trial_id, oid, lwcls):
+        """Load lightweight object stored by fast_store
+        Raise KeyError if it does not exist"""
+        table = cls.__table__
+        query = select([table]).where(
+            (table.c.trial_id == trial_id) & (table.c.id == oid))
+        interned = getattr(cls, "__interned_values__", {})
+        obj = lwcls.__new__(lwcls)
+
+        def load(conn):
+            """Load row and interned values. Return False if it is missing"""
+            row = conn.execute(query).first()
+            if row is None:
+                return False
+            for key in lwcls.__slots__:
+                if key in table.c:
+                    setattr(obj, key, row[key])
+            for name, id_name in viewitems(interned):
+                if row[name] is None and row[id_name] is not None:
+                    setattr(obj, name, interned_value(
+                        trial_id, row[id_name], conn))
+            return True
+
+        with relational.store_transaction() as conn:
+            found = load(conn)
+        if not found and relational.memory_conn is not None:
+            # Row was flushed from the in-memory database
+            with relational.engine.connect() as conn:
+                found = load(conn)
+        if not found:
+            raise KeyError(oid)
+        return obj
+
 
 def create_relationship(proxy_func):
     """Create proxy descriptor"""
@@ -306,6 +399,69 @@ def backref_one(name):
     return proxy_attr(name)
 
 
+def interned_value(trial_id, value_id, conn=None):
+    """Return serialized value of value table by id"""
+    table = relational.base.metadata.tables["value"]
+    query = select([table.c.value]).where(
+        (table.c.trial_id == trial_id) & (table.c.id == value_id))
+    if conn is None:
+        return relational.session.execute(query).scalar()
+    return conn.execute(query).scalar()
+
+
+def interned_view(table, interned):
+    """Return CREATE VIEW statement that exposes interned columns by value"""
+    columns = []
+    for column in table.columns:
+        if column.name in interned:
+            columns.append(
+                'COALESCE(t."{0}", "value"."value") AS "{0}"'.format(
+                    column.name))
+        elif column.name not in viewvalues(interned):
+            columns.append('t."{}"'.format(column.name))
+    joins = " ".join(
+        'LEFT JOIN "value" ON "value".trial_id = t.trial_id '
+        'AND "value".id = t."{}"'.format(id_name)
+        for id_name in viewvalues(interned)
+    )
+    return (
+        'CREATE VIEW IF NOT EXISTS "{0}_view" AS '
+        'SELECT {1} FROM "{0}" t {2}'
+    ).format(table.name, ", ".join(columns), joins)
+
+
+class ContentValue(object):                                                      # pylint: disable=too-few-public-methods
+    """Column descriptor that resolves interned values and references to the
+    content database. The stored value is kept in the instance and resolved
+    on the first read
+    """
+
+    def __init__(self, name, id_name=None):
+        self.name = name
+        self.id_name = id_name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = instance.__dict__.get(self.name)
+        if value is None and self.id_name:
+            value_id = instance.__dict__.get(self.id_name)
+            if value_id is not None:
+                value = interned_value(instance.trial_id, value_id)
+                instance.__dict__[self.name] = value
+        if value and value.startswith(CONTENT_PREFIX):
+            try:
+                value = content.get(value[len(CONTENT_PREFIX):]).decode(
+                    "utf-8", "replace")
+            except EnvironmentError:
+                return value
+            instance.__dict__[self.name] = value
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.name] = value
+
+
 def proxy_class(cls):
     """Proxy decorator
 
@@ -334,11 +490,17 @@ def proxy_class(cls):
 
     for name in to_remove:
         delattr(cls, name)
+    interned = description.get("__interned_values__", {})
+    for name in description.get("__content_values__", ()):
+        setattr(cls, name, ContentValue(name, interned.get(name)))
 
     cls.__modelname__ = cls.__name__
     cls.m = cls.__model__ = type(cls.__name__, (relational.base,), attributes)
     cls.t = cls.__table__ = cls.__model__.__table__
     cls.__columns__ = cls.__table__.columns.keys()
+    if interned:
+        relational.views[cls.__table__.name + "_view"] = interned_view(
+            cls.__table__, interned)
 
     AlchemyProxy.__alchemy_refs__[cls.__model__] = cls
 
@@ -42,6 +42,8 @@ class FileAccess(AlchemyProxy):
     content_hash_before = Column(Text)
     content_hash_after = Column(Text)
     timestamp = Column(TIMESTAMP)
+    # Nanoseconds since trial start. Old trials do not have it
+    timestamp_ns = Column(Integer)
     function_activation_id = Column(Integer, index=True)
 
     trial = backref_one("trial")  # Trial.file_accesses
@@ -0,0 +1,50 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Governor Event Model"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+from sqlalchemy import Column, Integer, Float, Text, TIMESTAMP
+from sqlalchemy import PrimaryKeyConstraint, ForeignKeyConstraint
+
+from .base import AlchemyProxy, proxy_class, backref_one
+
+
+@proxy_class
+class GovernorEvent(AlchemyProxy):
+    """Represent an adjustment of the capture during the execution
+    Activations that started after it and before the next event were
+    captured with its depth and without the untraced functions"""
+
+    __tablename__ = "governor_event"
+    __table_args__ = (
+        PrimaryKeyConstraint("trial_id", "id"),
+        ForeignKeyConstraint(["trial_id"], ["trial.id"], ondelete="CASCADE"),
+    )
+    trial_id = Column(Integer, index=True)
+    id = Column(Integer, index=True)                                             # pylint: disable=invalid-name
+    timestamp = Column(TIMESTAMP)
+    action = Column(Text)  # untrace, trace, lower_depth, raise_depth
+    definition_file = Column(Text)
+    name = Column(Text)
+    depth = Column(Integer)
+    overhead = Column(Float)
+
+    trial = backref_one("trial")  # Trial.governor_events
+
+    def show(self, _print=lambda x, offset=0: print(x)):
+        """Show object
+
+        Keyword arguments:
+        _print -- custom print function (default=print)
+        """
+        function = ""
+        if self.name is not None:
+            function = " {0.name} ({0.definition_file})".format(self)
+        _print("{0.timestamp} {0.action}{1}. Depth: {0.depth}. "
+               "Overhead: {2:.1%}".format(self, function, self.overhead))
+
+    def __repr__(self):
+        return "GovernorEvent({0.trial_id}, {0.id}, {0.action})".format(self)
@@ -52,6 +52,9 @@ def merge(node1, node2, id_to_node1, id_to_node2):
     new_node.children2 = node2.children
     new_node.activations.update(node2.activations)
     new_node.duration.update(node2.duration)
+    # Cached graphs may not have calls
+    new_node.calls = copy(node1.get("calls", {}))
+    new_node.calls.update(node2.get("calls", {}))
     new_node.tooltip.update(node2.tooltip)
     new_node.trial_ids.extend(node2.trial_ids)
     new_node.full_tooltip &= node2.full_tooltip
@@ -75,6 +78,8 @@ def create_mapping(root1, root2):
 
     combined_duration = copy(root1.duration)
     combined_duration.update(root2.duration)
+    combined_calls = copy(root1.get("calls", {}))
+    combined_calls.update(root2.get("calls", {}))
     trial_ids = root1.trial_ids + root2.trial_ids
     id_to_node1 = {}
     id_to_node2 = {}
@@ -111,6 +116,7 @@ def create_mapping(root1, root2):
             children2=[root2],
             activations=[],
             duration=combined_duration,
+            calls=combined_calls,
             full_tooltip=True,
             tooltip={x: "Diff" for x in trial_ids},
             children_index=-1,
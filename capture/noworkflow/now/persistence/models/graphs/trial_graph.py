@@ -91,7 +91,7 @@ class Summarization(object):
         trial_id = 0 if len(ids) > 1 else next(iter(ids))
         self.edges[source.index][target.index][type_][trial_id] += count
 
-    def insert_node(self, activation, parent, match=None):
+    def insert_node(self, activation, parent, match=None, merge=None):
         """Create node for activation
 
         Arguments:
@@ -99,6 +99,7 @@ class Summarization(object):
         activation -- activation element
         parent -- previously created parent node
         match -- matching key
+        merge -- merge function (default=self.merge)
         """
         node = Node(
             index=self.nid,
@@ -108,13 +109,14 @@ class Summarization(object):
             children=[],
             activations=defaultdict(list),
             duration=defaultdict(int),
+            calls=defaultdict(int),
             full_tooltip=False,
             tooltip=defaultdict(str),
             children_index=-1,
             trial_ids=[],
             has_return=False,
         )
-        self.merge(node, activation)
+        (merge or self.merge)(node, activation)
         self.nid += 1
         if parent is not None:
             node.parent_index = parent.index
@@ -211,12 +213,50 @@ class LineNameSummarization(Summarization):
         if trial_id not in node.trial_ids:
             node.trial_ids.append(trial_id)
         node.activations[trial_id].append(activation.id)
-        node.duration[trial_id] += activation.duration
+        # Sampled activations represent weight activations
+        weight = activation.weight or 1
+        node.duration[trial_id] += activation.duration * weight
+        node.calls[trial_id] += weight
 
         node.tooltip[trial_id] += "T{} - {}<br>Line {}<br>".format(
             trial_id, activation.id, activation.line
         )
 
+    def merge_aggregate(self, node, aggregate):                                  # pylint: disable=no-self-use
+        """Add folded calls of aggregate activation to node"""
+        trial_id = aggregate.trial_id
+        if trial_id not in node.trial_ids:
+            node.trial_ids.append(trial_id)
+        node.duration[trial_id] += aggregate.total_duration or 0
+        node.calls[trial_id] += aggregate.count or 0
+
+        node.tooltip[trial_id] += (
+            "T{} - {:g} aggregated calls<br>Line {}<br>"
+        ).format(trial_id, aggregate.count or 0, aggregate.line)
+
+    def insert_aggregates(self, aggregates):
+        """Merge aggregate activations into the nodes of their callers"""
+        nodes = {}
+        for node in self.nodes:
+            for trial_id, ids in viewitems(node.activations):
+                for aid in ids:
+                    nodes[(trial_id, aid)] = node
+        for aggregate in aggregates:
+            parent = nodes.get((aggregate.trial_id, aggregate.caller_id))
+            if parent is None:
+                continue
+            match = self.calculate_match(aggregate)
+            node = self.matches[parent.index].get(match)
+            if node is None:
+                node = self.insert_node(aggregate, parent, match,
+                                        merge=self.merge_aggregate)
+                self.add_edge(parent, node, 'call')
+                self.add_edge(node, parent, 'return')
+                node.has_return = True
+            else:
+                self.merge_aggregate(node, aggregate)
+        return self
+
     def calculate_match(self, node):
         """Calculate match. Use line and name"""
         return (node.line, node.name)
@@ -235,10 +275,10 @@ class NoMatchSummarization(LineNameSummarization):
         self.match_id += 1
         return self.match_id
 
-    def insert_node(self, activation, parent, match=None):
+    def insert_node(self, activation, parent, match=None, merge=None):
         """Insert node. Create base repr"""
         node = super(NoMatchSummarization, self).insert_node(
-            activation, parent, match
+            activation, parent, match, merge
         )
         node.repr = '{0.line}-{0.name}'.format(activation)
         return node
@@ -271,6 +311,7 @@ class StructureSummarization(Summarization):
         for trial_id in activation.trial_ids:
             node.activations[trial_id].extend(activation.activations[trial_id])
             node.duration[trial_id] += activation.duration[trial_id]
+            node.calls[trial_id] += activation.calls[trial_id]
             node.tooltip[trial_id] += activation.tooltip[trial_id] + "<br>"
             if trial_id not in node.trial_ids:
                 node.trial_ids.append(trial_id)
@@ -336,7 +377,9 @@ class TrialGraph(Graph):
     @cache("no_match")
     def no_match(self):
         """Convert tree structure into dict graph without node matchings"""
-        return self.result(NoMatchSummarization(self.trial.activations))
+        return self.result(NoMatchSummarization(
+            self.trial.activations
+        ).insert_aggregates(self.trial.aggregate_activations))
 
     @cache("exact_match")
     def exact_match(self):
@@ -346,7 +389,9 @@ class TrialGraph(Graph):
     @cache("namespace_match")
     def namespace_match(self):
         """Convert tree structure into dict graph and match namespaces"""
-        return self.result(LineNameSummarization(self.trial.activations))
+        return self.result(LineNameSummarization(
+            self.trial.activations
+        ).insert_aggregates(self.trial.aggregate_activations))
 
     def _ipython_display_(self):
         from IPython.display import display
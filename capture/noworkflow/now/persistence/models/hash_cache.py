@@ -0,0 +1,90 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Hash Cache Model"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+from datetime import datetime
+
+from future.utils import viewitems
+from sqlalchemy import Column, Integer, Text, TIMESTAMP, select
+
+from .. import relational, content
+
+from .base import AlchemyProxy, proxy_class
+
+
+@proxy_class
+class HashCache(AlchemyProxy):
+    """Represent a file hash memo entry
+    Map (path, inode, size, mtime_ns) to the hash of the file content"""
+
+    __tablename__ = "hash_cache"
+    path = Column(Text, primary_key=True)
+    inode = Column(Integer)
+    size = Column(Integer)
+    mtime_ns = Column(Integer)
+    content_hash = Column(Text)
+    last_access = Column(TIMESTAMP, index=True)
+
+    def __repr__(self):
+        return "HashCache({0.path}, {0.content_hash})".format(self)
+
+    @classmethod  # query
+    def load_memo(cls, max_entries, session=None):
+        """Load memo table into the content database
+
+        Arguments:
+        max_entries -- maximum number of entries. 0 disables the memo
+
+
+        Keyword arguments:
+        session -- specify session for loading (default=relational.session)
+        """
+        if not max_entries:
+            content.stat_memo = None
+            return
+        session = session or relational.session
+        thash = cls.t
+        content.stat_memo = {
+            path: [inode, size, mtime_ns, content_hash]
+            for path, inode, size, mtime_ns, content_hash in session.execute(
+                select([thash.c.path, thash.c.inode, thash.c.size,
+                        thash.c.mtime_ns, thash.c.content_hash])
+            )
+        }
+        content.stat_memo_used = set()
+
+    @classmethod  # query
+    def store_memo(cls, max_entries, session=None):
+        """Store used memo entries and evict the least recently used ones
+
+        Arguments:
+        max_entries -- maximum number of entries to keep in the table
+
+
+        Keyword arguments:
+        session -- specify session for loading (default=relational.session)
+        """
+        memo = content.stat_memo
+        if memo is None or not content.stat_memo_used:
+            return
+        session = session or relational.session
+        thash = cls.t
+        now = datetime.now()
+        session.execute(thash.insert().prefix_with("OR REPLACE"), [
+            {"path": path, "inode": entry[0], "size": entry[1],
+             "mtime_ns": entry[2], "content_hash": entry[3],
+             "last_access": now}
+            for path, entry in viewitems(memo)
+            if path in content.stat_memo_used
+        ])
+        content.stat_memo_used = set()
+        session.execute(thash.delete().where(thash.c.path.in_(
+            select([thash.c.path])
+            .order_by(thash.c.last_access.desc())
+            .offset(max_entries)
+        )))
+        session.commit()
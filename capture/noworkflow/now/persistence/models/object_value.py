@@ -32,8 +32,13 @@ class ObjectValue(AlchemyProxy):
     function_activation_id = Column(Integer, index=True)
     id = Column(Integer, index=True)                                             # pylint: disable=invalid-name
     name = Column(Text)
-    value = Column(Text)
+    value = Column(Text)  # Old trials. New trials use value_id
+    value_id = Column(Integer)
     type = Column(Text, CheckConstraint("type IN ('GLOBAL', 'ARGUMENT')"))       # pylint: disable=invalid-name
+    # Columns that may store references to the content database
+    __content_values__ = ("value",)
+    # Columns resolved from the value table by id
+    __interned_values__ = {"value": "value_id"}
 
     trial = backref_one("trial")  # Trial.object_values
     activation = backref_one("activation")  # Ativation.object_values
@@ -93,9 +93,12 @@ class Trial(AlchemyProxy):
     environment_attrs = many_ref("trial", "EnvironmentAttr")
     activations = many_ref("trial", "Activation",
                            order_by=Activation.m.start)
+    aggregate_activations = many_viewonly_ref("trial", "AggregateActivation")
     file_accesses = many_viewonly_ref("trial", "FileAccess")
+    governor_events = many_viewonly_ref("trial", "GovernorEvent")
     objects = many_viewonly_ref("trial", "Object")
     object_values = many_viewonly_ref("trial", "ObjectValue")
+    interned_values = many_viewonly_ref("trial", "Value")
     variables = many_viewonly_ref("trial", "Variable")
     variable_usages = many_viewonly_ref("trial", "VariableUsage")
     variable_dependencies = many_viewonly_ref("trial", "VariableDependency")
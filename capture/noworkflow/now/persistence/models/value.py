@@ -0,0 +1,37 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Value Model"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+from sqlalchemy import Column, Integer, Text
+from sqlalchemy import PrimaryKeyConstraint, ForeignKeyConstraint
+
+from .base import AlchemyProxy, proxy_class, backref_one
+
+
+@proxy_class
+class Value(AlchemyProxy):
+    """Represent a serialized value of a trial
+    Object values and variables refer to values by value_id"""
+
+    __tablename__ = "value"
+    __table_args__ = (
+        PrimaryKeyConstraint("trial_id", "id"),
+        ForeignKeyConstraint(["trial_id"], ["trial.id"], ondelete="CASCADE"),
+    )
+    trial_id = Column(Integer)
+    id = Column(Integer)                                                         # pylint: disable=invalid-name
+    value = Column(Text)
+    # Columns that may store references to the content database
+    __content_values__ = ("value",)
+
+    trial = backref_one("trial")  # Trial.interned_values
+
+    def __repr__(self):
+        return "Value({0.trial_id}, {0.id}, {0.value})".format(self)
+
+    def __str__(self):
+        return self.value
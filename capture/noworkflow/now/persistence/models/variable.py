@@ -37,9 +37,16 @@ class Variable(AlchemyProxy):
     id = Column(Integer, index=True)                                             # pylint: disable=invalid-name
     name = Column(Text)
     line = Column(Integer)
-    value = Column(Text)
+    value = Column(Text)  # Old trials. New trials use value_id
+    value_id = Column(Integer)
     time = Column(TIMESTAMP)
+    # Nanoseconds since trial start. Old trials do not have it
+    time_ns = Column(Integer)
     type = Column(Text)                                                          # pylint: disable=invalid-name
+    # Columns that may store references to the content database
+    __content_values__ = ("value",)
+    # Columns resolved from the value table by id
+    __interned_values__ = {"value": "value_id"}
 
     usages = many_ref("variable", "VariableUsage")
 
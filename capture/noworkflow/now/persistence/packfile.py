@@ -0,0 +1,286 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Packfiles for the Content Database
+
+A packfile is the concatenation of several blobs.
+Each packfile has an index file with a header followed by fixed size
+entries (sha1 digest, offset, length) sorted by digest.
+"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import atexit
+import binascii
+import bisect
+import mmap
+import os
+import struct
+import threading
+import time
+
+from os.path import join, isdir
+
+
+PACK_DIRNAME = "pack"
+PACK_SIZE = 256 * 1024 * 1024  # Start a new packfile after it
+COPY_SIZE = 1024 * 1024
+IDX_HEADER = b"NWIDX\x00\x00\x01"
+IDX_ENTRY = struct.Struct(">20sQQ")
+
+
+class PackIndex(object):
+    """Sorted index of a packfile read through mmap
+    Behaves as a sequence of digests to support bisect"""
+
+    def __init__(self, idx_path, std_open):
+        self.idx_path = idx_path
+        self.pack_path = idx_path[:-4] + ".pack"
+        self.std_open = std_open
+        with std_open(idx_path, "rb") as fil:
+            self.map = mmap.mmap(fil.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(IDX_HEADER)] != IDX_HEADER:
+            raise ValueError("invalid pack index: {}".format(idx_path))
+        self.pack_map = None
+
+    def __len__(self):
+        return (len(self.map) - len(IDX_HEADER)) // IDX_ENTRY.size
+
+    def __getitem__(self, index):
+        start = len(IDX_HEADER) + index * IDX_ENTRY.size
+        return self.map[start:start + 20]
+
+    def entry(self, index):
+        """Return (digest, offset, length) of entry"""
+        return IDX_ENTRY.unpack_from(
+            self.map, len(IDX_HEADER) + index * IDX_ENTRY.size)
+
+    def find(self, digest):
+        """Return (offset, length) of digest or None"""
+        index = bisect.bisect_left(self, digest)
+        if index < len(self) and self[index] == digest:
+            return self.entry(index)[1:]
+        return None
+
+    def read(self, offset, length):
+        """Read blob from packfile"""
+        if not length:
+            return b""
+        if self.pack_map is None:
+            with self.std_open(self.pack_path, "rb") as fil:
+                self.pack_map = mmap.mmap(
+                    fil.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.pack_map[offset:offset + length]
+
+    def close(self):
+        """Close maps"""
+        self.map.close()
+        if self.pack_map is not None:
+            self.pack_map.close()
+
+
+class PackStore(object):
+    """Store blobs in packfiles"""
+
+    def __init__(self):
+        self.pack_path = None
+        self.std_open = open
+        self.indexes = None  # Loaded lazily
+        self.lock = threading.RLock()
+        # Current packfile
+        self.pack_name = None
+        self.pack_file = None
+        self.pack_entries = {}  # digest -> (offset, length)
+        self.pack_offset = 0
+        self.registered = False
+
+    def set_path(self, content_path):
+        """Set pack_path"""
+        self.close()
+        self.pack_path = join(content_path, PACK_DIRNAME)
+
+    def load(self):
+        """Open indexes of existing packfiles"""
+        if self.indexes is not None:
+            return self.indexes
+        self.indexes = []
+        if self.pack_path is not None and isdir(self.pack_path):
+            for name in sorted(os.listdir(self.pack_path)):
+                if name.endswith(".idx"):
+                    self.indexes.append(PackIndex(
+                        join(self.pack_path, name), self.std_open))
+        return self.indexes
+
+    def find(self, content_hash):
+        """Return (index or None, offset, length) of content_hash or None
+        None index represents the current packfile"""
+        digest = binascii.unhexlify(content_hash)
+        with self.lock:
+            if digest in self.pack_entries:
+                return (None,) + self.pack_entries[digest]
+            for index in self.load():
+                result = index.find(digest)
+                if result is not None:
+                    return (index,) + result
+        return None
+
+    def has(self, content_hash):
+        """Check if content_hash is in a packfile"""
+        return self.find(content_hash) is not None
+
+    def get(self, content_hash, size=None):
+        """Get content from packfiles. Return None if it does not exist
+
+        Keyword arguments:
+        size -- read at most size bytes (default=None: read everything)
+        """
+        with self.lock:
+            found = self.find(content_hash)
+            if found is None:
+                return None
+            index, offset, length = found
+            if size is not None:
+                length = min(size, length)
+            if index is not None:
+                return index.read(offset, length)
+            self.pack_file.flush()
+            with self.std_open(self.pack_file.name, "rb") as fil:
+                fil.seek(offset)
+                return fil.read(length)
+
+    def _start_pack(self):
+        """Create a new packfile"""
+        if not isdir(self.pack_path):
+            os.makedirs(self.pack_path)
+        self.pack_name = join(self.pack_path, "pack-{:x}-{}".format(
+            int(time.time() * 1000000), os.getpid()))
+        self.pack_file = self.std_open(self.pack_name + ".pack", "wb")
+        self.pack_entries = {}
+        self.pack_offset = 0
+        if not self.registered:
+            atexit.register(self.finish)
+            self.registered = True
+
+    def _append(self, content_hash, chunks):
+        """Append chunks to the current packfile
+        Return number of written bytes"""
+        with self.lock:
+            if self.has(content_hash):
+                return 0
+            if self.pack_file is None:
+                self._start_pack()
+            length = 0
+            for chunk in chunks:
+                self.pack_file.write(chunk)
+                length += len(chunk)
+            digest = binascii.unhexlify(content_hash)
+            self.pack_entries[digest] = (self.pack_offset, length)
+            self.pack_offset += length
+            if self.pack_offset >= PACK_SIZE:
+                self.finish()
+            return length
+
+    def put(self, content_hash, content):
+        """Append content to packfile"""
+        return self._append(content_hash, [content])
+
+    def put_file(self, content_hash, path):
+        """Append file content to packfile in chunks"""
+        with self.std_open(path, "rb") as fil:
+            return self._append(
+                content_hash, iter(lambda: fil.read(COPY_SIZE), b""))
+
+    def finish(self):
+        """Close current packfile and write its index"""
+        with self.lock:
+            if self.pack_file is None:
+                return
+            self.pack_file.close()
+            self.pack_file = None
+            idx_name = self.pack_name + ".idx"
+            temp_name = self.pack_name + ".tmp"
+            with self.std_open(temp_name, "wb") as fil:
+                fil.write(IDX_HEADER)
+                for digest in sorted(self.pack_entries):
+                    offset, length = self.pack_entries[digest]
+                    fil.write(IDX_ENTRY.pack(digest, offset, length))
+            os.rename(temp_name, idx_name)
+            if self.indexes is not None:
+                self.indexes.append(PackIndex(idx_name, self.std_open))
+            self.pack_entries = {}
+            self.pack_offset = 0
+
+    def close(self):
+        """Finish current packfile and close indexes"""
+        self.finish()
+        for index in self.indexes or []:
+            index.close()
+        self.indexes = None
+
+    def find_subhash(self, content_hash):
+        """Get hash that starts by content_hash"""
+        prefix = content_hash.lower()
+        padded = prefix + "0" * (len(prefix) % 2)
+        digest = binascii.unhexlify(padded)
+        with self.lock:
+            for candidate in self.pack_entries:
+                full = binascii.hexlify(candidate).decode("ascii")
+                if full.startswith(prefix):
+                    return full
+            for index in self.load():
+                position = bisect.bisect_left(index, digest)
+                if position < len(index):
+                    full = binascii.hexlify(index[position]).decode("ascii")
+                    if full.startswith(prefix):
+                        return full
+        return None
+
+    def heads(self, size):
+        """Iterate on (content_hash, length, first size bytes) of blobs"""
+        self.finish()
+        for index in self.load():
+            for position in range(len(index)):
+                digest, offset, length = index.entry(position)
+                yield (binascii.hexlify(digest).decode("ascii"), length,
+                       index.read(offset, min(size, length)))
+
+    def rewrite(self, index, keep):
+        """Copy blobs of index accepted by keep into a new packfile
+        Remove the old packfile
+
+        Return: number of removed blobs and number of removed bytes
+
+        Arguments:
+        index -- PackIndex of packfile
+        keep -- function that receives a content hash and returns a bool
+        """
+        with self.lock:
+            self.finish()
+            entries = [index.entry(position) for position in range(len(index))]
+            kept = [
+                entry for entry in entries
+                if keep(binascii.hexlify(entry[0]).decode("ascii"))
+            ]
+            if len(kept) == len(entries):
+                return 0, 0
+            self.load().remove(index)
+            for digest, offset, length in kept:
+                self._append(binascii.hexlify(digest).decode("ascii"),
+                             [index.read(offset, length)])
+            self.finish()
+            index.close()
+            os.remove(index.idx_path)
+            os.remove(index.pack_path)
+            return len(entries) - len(kept), (
+                sum(entry[2] for entry in entries) -
+                sum(entry[2] for entry in kept))
+
+    def hashes(self):
+        """Iterate on all hashes stored in packfiles"""
+        with self.lock:
+            digests = list(self.pack_entries)
+            for index in self.load():
+                digests.extend(index[i] for i in range(len(index)))
+        for digest in digests:
+            yield binascii.hexlify(digest).decode("ascii")
@@ -8,9 +8,12 @@ from __future__ import (absolute_import, print_function,
 
 import threading
 
+from collections import OrderedDict
+from contextlib import contextmanager
 from os.path import join, exists
 
-from sqlalchemy import create_engine
+from future.utils import viewvalues
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import scoped_session, sessionmaker
 
@@ -18,6 +21,7 @@ from ..utils.io import print_msg
 
 
 DB_FILENAME = "db.sqlite"
+SYNCHRONOUS = ("OFF", "NORMAL", "FULL", "EXTRA")
 
 
 class RelationalDatabase(object):
@@ -28,8 +32,15 @@ class RelationalDatabase(object):
         self.engine = None
         self._session_map = {}
         self.session_factory = sessionmaker()
+        self.journal_mode = "WAL"
+        self.synchronous = "NORMAL"  # One of SYNCHRONOUS
+        self.store_conn = None  # Connection shared by a store cycle
+        self.memory_engine = None  # In-memory capture database
+        self.memory_conn = None
+        self.memory_limit = 0  # Flush memory database after it (in bytes)
 
         self.base = declarative_base()
+        self.views = OrderedDict()  # View name -> CREATE VIEW statement
 
         persistence_config.add(self)
 
@@ -53,13 +64,158 @@ class RelationalDatabase(object):
         self.engine = create_engine(
             "sqlite://" + ("/" if self.db_path else "") + self.db_path,
             echo=False)
+        if self.db_path:
+            event.listen(self.engine, "connect", self._set_pragmas)
         self.session_factory.configure(bind=self.engine, autoflush=False,
                                        expire_on_commit=True)
         self._session_map = {}
 
         if new_db:
             print_msg("creating provenance database")
-            self.base.metadata.create_all(self.engine)
+        # Create tables that do not exist yet (new tables in old databases)
+        self.base.metadata.create_all(self.engine)
+        if not new_db:
+            self.add_missing_columns()
+        self.create_views()
+
+    def create_views(self):
+        """Create views that do not exist yet"""
+        with self.engine.begin() as conn:
+            for sql in viewvalues(self.views):
+                conn.execute(sql)
+
+    def add_missing_columns(self):
+        """Add new columns to tables of old databases
+        Existing rows have NULL values on them"""
+        dbapi_connection = self.engine.raw_connection()
+        cursor = dbapi_connection.cursor()
+        try:
+            for table in self.base.metadata.sorted_tables:
+                cursor.execute('PRAGMA table_info("{}")'.format(table.name))
+                existing = {row[1] for row in cursor.fetchall()}
+                for column in table.columns:
+                    if column.name in existing:
+                        continue
+                    cursor.execute('ALTER TABLE "{}" ADD COLUMN "{}" {}'.format(
+                        table.name, column.name,
+                        column.type.compile(self.engine.dialect)))
+                    if column.index:
+                        cursor.execute(
+                            'CREATE INDEX IF NOT EXISTS "ix_{0}_{1}" '
+                            'ON "{0}" ("{1}")'.format(table.name, column.name))
+            dbapi_connection.commit()
+        finally:
+            cursor.close()
+            dbapi_connection.close()
+
+    def _set_pragmas(self, dbapi_connection, connection_record):                 # pylint: disable=unused-argument
+        """Configure journal and synchronous mode of new connections"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode={}".format(self.journal_mode))
+        cursor.execute("PRAGMA synchronous={}".format(self.synchronous))
+        cursor.close()
+
+    @contextmanager
+    def store_transaction(self):
+        """Share a single connection and transaction in a store cycle
+        Nested calls reuse the outer transaction"""
+        if self.store_conn is not None:
+            yield self.store_conn
+            return
+        memory = self.memory_conn is not None
+        conn = self.memory_conn if memory else self.engine.connect()
+        trans = conn.begin()
+        self.store_conn = conn
+        try:
+            yield conn
+            trans.commit()
+        except:                                                                  # pylint: disable=bare-except
+            trans.rollback()
+            raise
+        finally:
+            self.store_conn = None
+            if not memory:
+                conn.close()
+        if memory and self.memory_limit and (
+                self.memory_size() > self.memory_limit):
+            self.flush_memory()
+
+    def start_memory_capture(self, limit=0):
+        """Store provenance rows in an in-memory database
+        Rows are merged into the provenance database by flush_memory
+
+        Keyword arguments:
+        limit -- flush rows when the memory database exceeds limit bytes
+                 (default=0: flush only at the end)
+        """
+        if not self.db_path or self.memory_conn is not None:
+            return
+        self.memory_engine = create_engine("sqlite://", echo=False)
+        self.base.metadata.create_all(self.memory_engine)
+        self.memory_conn = self.memory_engine.connect()
+        self.memory_limit = limit
+
+    def memory_size(self):
+        """Return size of the in-memory database in bytes
+        Pages freed by flush_memory remain in the freelist and do not count
+        """
+        cursor = self.memory_conn.connection.cursor()
+        cursor.execute("PRAGMA page_count")
+        pages = cursor.fetchone()[0]
+        cursor.execute("PRAGMA freelist_count")
+        pages -= cursor.fetchone()[0]
+        cursor.execute("PRAGMA page_size")
+        size = pages * cursor.fetchone()[0]
+        cursor.close()
+        return size
+
+    def flush_memory(self):
+        """Merge rows of the in-memory database into the provenance database
+        The merge runs in a single transaction of the memory connection"""
+        if self.memory_conn is None:
+            return
+        dbapi_connection = self.memory_conn.connection
+        cursor = dbapi_connection.cursor()
+        cursor.execute("ATTACH DATABASE ? AS disk", (self.db_path,))
+        try:
+            cursor.execute("PRAGMA disk.synchronous={}".format(
+                self.synchronous))
+            # Inspect tables before writing: pysqlite may commit on PRAGMA
+            merge = []
+            for table in self.base.metadata.sorted_tables:
+                cursor.execute('SELECT 1 FROM "{}" LIMIT 1'.format(table.name))
+                if cursor.fetchone() is None:
+                    continue
+                cursor.execute('PRAGMA disk.table_info("{}")'.format(
+                    table.name))
+                existing = {row[1] for row in cursor.fetchall()}
+                merge.append((table.name, ", ".join(
+                    '"{}"'.format(column.name) for column in table.columns
+                    if column.name in existing
+                )))
+            for name, columns in merge:
+                cursor.execute(
+                    'INSERT OR REPLACE INTO disk."{0}" ({1}) '
+                    'SELECT {1} FROM main."{0}"'.format(name, columns))
+                cursor.execute('DELETE FROM main."{}"'.format(name))
+            dbapi_connection.commit()
+        except:                                                                  # pylint: disable=bare-except
+            dbapi_connection.rollback()
+            raise
+        finally:
+            cursor.execute("DETACH DATABASE disk")
+            cursor.close()
+
+    def stop_memory_capture(self):
+        """Flush and close the in-memory database"""
+        if self.memory_conn is None:
+            return
+        try:
+            self.flush_memory()
+        finally:
+            self.memory_conn.close()
+            self.memory_engine.dispose()
+            self.memory_conn = self.memory_engine = None
 
     def make_session(self):
         """Create thread safe session"""
@@ -0,0 +1,136 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Trial retention policies and pruning"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+from collections import defaultdict
+
+from sqlalchemy import select, bindparam
+
+from . import relational
+from .models import ORDER, Trial, Head, Tag, Module, Dependency, GraphCache
+
+
+BATCH_SIZE = 500  # SQLite limits the number of bound parameters
+
+
+def trial_models():
+    """Return models that store data of a trial, except Trial and Head"""
+    return [
+        model for model in ORDER
+        if model not in (Trial, Head) and "trial_id" in model.t.c
+    ]
+
+
+class RetentionPolicy(object):
+    """Select trials that should be kept"""
+
+    def __init__(self, keep_last=None, keep_since=None, keep_tagged=True):
+        self.keep_last = keep_last  # Number of trials kept per script
+        self.keep_since = keep_since  # Keep trials that started after it
+        self.keep_tagged = keep_tagged  # Keep trials with non AUTO tags
+
+    def select(self, session=None):
+        """Return (kept trial ids, removed trial ids)"""
+        session = session or relational.session
+        ttrial = Trial.t
+        trials = list(session.execute(select([
+            ttrial.c.id, ttrial.c.script, ttrial.c.start,
+            ttrial.c.inherited_id
+        ]).order_by(ttrial.c.id.desc())))
+
+        keep = set()
+        per_script = defaultdict(int)
+        for tid, script, start, _ in trials:
+            per_script[script] += 1
+            if self.keep_last is not None and (
+                    per_script[script] <= self.keep_last):
+                keep.add(tid)
+            if self.keep_since is not None and (
+                    start is not None and start >= self.keep_since):
+                keep.add(tid)
+        if self.keep_tagged:
+            ttag = Tag.t
+            keep.update(tid for tid, in session.execute(
+                select([ttag.c.trial_id]).where(ttag.c.type != "AUTO")))
+        keep.update(tid for tid, in session.execute(
+            select([Head.t.c.trial_id])))
+
+        # Kept trials that bypassed modules need their inherited trials
+        inherited = {tid: inherited_id for tid, _, _, inherited_id in trials}
+        pending = list(keep)
+        while pending:
+            inherited_id = inherited.get(pending.pop())
+            if inherited_id is not None and inherited_id not in keep:
+                keep.add(inherited_id)
+                pending.append(inherited_id)
+
+        keep &= set(inherited)
+        remove = {tid for tid, _, _, _ in trials if tid not in keep}
+        return keep, remove
+
+
+def new_parents(remove, session=None):
+    """Return map of kept trial id to its closest kept ancestor
+    Only trials whose parents will be removed are included"""
+    session = session or relational.session
+    ttrial = Trial.t
+    parents = {
+        tid: parent_id for tid, parent_id in session.execute(
+            select([ttrial.c.id, ttrial.c.parent_id]))
+    }
+    result = {}
+    for tid, parent_id in parents.items():
+        if tid in remove or parent_id not in remove:
+            continue
+        while parent_id in remove:
+            parent_id = parents.get(parent_id)
+        result[tid] = parent_id
+    return result
+
+
+def prune_trials(remove, session=None):
+    """Remove trials and all their data in a single transaction
+    Children of removed trials point to their closest kept ancestor
+    Graph caches are removed because they may include removed trials
+
+    Arguments:
+    remove -- set of trial ids
+    """
+    session = session or relational.session
+    if not remove:
+        return 0
+    ttrial = Trial.t
+    relink = new_parents(remove, session=session)
+    remove = sorted(remove)
+    batches = [
+        remove[start:start + BATCH_SIZE]
+        for start in range(0, len(remove), BATCH_SIZE)
+    ]
+    try:
+        if relink:
+            session.execute(
+                ttrial.update()
+                .where(ttrial.c.id == bindparam("tid"))
+                .values(parent_id=bindparam("new_parent")),
+                [{"tid": tid, "new_parent": parent_id}
+                 for tid, parent_id in relink.items()])
+        for model in trial_models():
+            table = model.t
+            for batch in batches:
+                session.execute(table.delete().where(
+                    table.c.trial_id.in_(batch)))
+        tmodule, tdependency = Module.t, Dependency.t
+        session.execute(tmodule.delete().where(
+            ~tmodule.c.id.in_(select([tdependency.c.module_id]))))
+        session.execute(GraphCache.t.delete())
+        for batch in batches:
+            session.execute(ttrial.delete().where(ttrial.c.id.in_(batch)))
+        session.commit()
+    except:                                                                      # pylint: disable=bare-except
+        session.rollback()
+        raise
+    return len(remove)
@@ -6,87 +6,361 @@
 from __future__ import (absolute_import, print_function,
                         division, unicode_literals)
 
+import hashlib
 
 from array import array
 from collections import deque
+from datetime import date, time, timedelta
 
 from future.utils import viewitems
 
-from ..utils.cross_version import IMMUTABLE
+from ..utils.cross_version import IMMUTABLE, string
 
 from . import content
 
 
+# Prefix of values stored in the content database
+CONTENT_PREFIX = "now-content:"
+
+
 def jsonpickle_content(obj):
     """Use jsonpickle to get objects representation
     Store representation in the content database"""
     import jsonpickle
-    return "now-content:" + content.put(jsonpickle.encode(obj))
+    return CONTENT_PREFIX + content.put(jsonpickle.encode(obj))
+
+
+def large_values_content(serialize, threshold):
+    """Store representations longer than threshold in the content database
+    Identical representations share the same content"""
+    def serialize_value(obj):
+        """Serialize obj and return reference if it is large"""
+        value = serialize(obj)
+        if len(value) > threshold:
+            return CONTENT_PREFIX + content.put(value.encode("utf-8"))
+        return value
+    return serialize_value
+
+
+# Types serialized by repr without dispatch
+SCALARS = frozenset((type(None), bool, int, float, complex))
 
 
 class SimpleSerializer(object):                                                  # pylint: disable=too-few-public-methods
-    """Simple serializer. Get objects representations without repr"""
+    """Simple serializer. Get objects representations without repr
+    Representations have at most max_length characters and max_depth nested
+    levels. Serialization stops as soon as the length budget ends, without
+    visiting the remaining items
+
+    Handlers are registered by type. Objects use the handler of the nearest
+    registered type in their MRO. The dispatch is cached by type
+    """
 
-    def _iter(self, obj, maxlevel):
-        """Default serialization for iterables"""
-        return ", ".join(self.serialize(x, maxlevel=maxlevel - 1)
-                         for x in obj)
+    # Handlers by registered type : type -> function
+    handlers = {}
+    # Handlers by (module, name) of types of optional libraries. They do not
+    # import the library : (str, str) -> function
+    named_handlers = {}
+    # Handlers by object type, including subclasses : type -> function
+    dispatch = {}
 
-    def _default(self, obj):                                                     # pylint: disable=no-self-use
-        """Default serialization for non iterables"""
-        if isinstance(obj, IMMUTABLE):
-            return repr(obj)
+    def __init__(self, max_length=1000, max_depth=5):
+        self.max_length = max_length
+        self.max_depth = max_depth
 
-        if hasattr(obj, "__class__"):
-            return "<{} instance at 0x{:x}".format(
-                obj.__class__.__name__, id(obj))
+    @classmethod
+    def register(cls, *types):
+        """Register handler for types
+        Handlers receive (serializer, obj, out, budget, level). They write
+        strings with serializer.emit and nested objects with serializer.write
+        """
+        def decorator(handler):
+            """Add handler to registry"""
+            for typ in types:
+                cls.handlers[typ] = handler
+            cls.dispatch.clear()
+            return handler
+        return decorator
 
-        if hasattr(obj, "__name__"):
-            return "<{} at 0x{:x}".format(obj.__name__, id(obj))
+    @classmethod
+    def register_name(cls, module, name):
+        """Register handler for type by module and name
+        The handler applies only if the script imports the type
+        """
+        def decorator(handler):
+            """Add handler to registry"""
+            cls.named_handlers[(module, name)] = handler
+            cls.dispatch.clear()
+            return handler
+        return decorator
 
-        if hasattr(obj, "__call__"):
-            return "<callable at 0x{:x}>".format(id(obj))
+    def handler(self, typ):
+        """Return handler of type"""
+        try:
+            return self.dispatch[typ]
+        except KeyError:
+            handlers, named = self.handlers, self.named_handlers
+            result = default_handler
+            for base in getattr(typ, "__mro__", ()):
+                if base in handlers:
+                    result = handlers[base]
+                    break
+                key = (getattr(base, "__module__", None), base.__name__)
+                if key in named:
+                    result = named[key]
+                    break
+            self.dispatch[typ] = result
+            return result
 
-        return "<unsupported type at 0x{:x}>".format(id(obj))
+    @staticmethod
+    def emit(text, out, budget):
+        """Write text and consume budget"""
+        out.append(text)
+        budget[0] -= len(text)
 
-    def serialize(self, obj, maxlevel=5):
+    def write(self, obj, out, budget, level):
+        """Write representation of obj
+        Failing handlers discard their output and use the default handler
+        """
+        if budget[0] > 0:
+            start, remaining = len(out), budget[0]
+            try:
+                self.handler(type(obj))(self, obj, out, budget, level)
+            except Exception:                                                    # pylint: disable=broad-except
+                del out[start:]
+                budget[0] = remaining
+                default_handler(self, obj, out, budget, level)
+
+    def serialize(self, obj, maxlevel=None):
         """Serialize obj"""
-        if isinstance(obj, IMMUTABLE) or not maxlevel:
-            return self._default(obj)
-
-        typ = result = ""
-        if isinstance(obj, tuple):
-            typ = "tuple"
-            result = self._iter(obj, maxlevel)
-        elif isinstance(obj, list):
-            typ = "list"
-            result = self._iter(obj, maxlevel)
-        elif isinstance(obj, array):
-            typ = "array"
-            result = "{}, [{}]".format(obj.typecode, self._iter(obj, maxlevel))
-        elif isinstance(obj, set):
-            typ = "set"
-            result = self._iter(obj, maxlevel)
-        elif isinstance(obj, frozenset):
-            typ = "frozenset"
-            result = self._iter(obj, maxlevel)
-        elif isinstance(obj, deque):
-            typ = "deque"
-            result = self._iter(obj, maxlevel)
-        elif isinstance(obj, dict):
-            typ = "dict"
-            result = ", ".join(
-                "({}, {})".format(
-                    self.serialize(key, maxlevel - 1),
-                    self.serialize(value, maxlevel - 1)
-                ) for key, value in viewitems(obj))
-
-        if not typ:
-            return self._default(obj)
-
-        cls = obj.__class__ if hasattr(obj, "__class__") else type(obj)
-        cls_name = "_".join(cls.__name__.split())
-
-        if typ == "array":
-            return "{}({})".format(cls_name, result)
-        return "{}([{}])".format(cls_name, result)
+        if type(obj) in SCALARS:                                                 # pylint: disable=unidiomatic-typecheck
+            result = repr(obj)
+        else:
+            out = []
+            self.write(obj, out, [self.max_length],
+                       self.max_depth if maxlevel is None else maxlevel)
+            result = "".join(out)
+        if len(result) > self.max_length:
+            result = result[:max(self.max_length - 3, 0)] + "..."
+        return result
+
+
+def class_name(obj):
+    """Return class name of obj without spaces"""
+    cls = obj.__class__ if hasattr(obj, "__class__") else type(obj)
+    return "_".join(cls.__name__.split())
+
+
+def default_handler(serializer, obj, out, budget, level):                        # pylint: disable=unused-argument
+    """Default serialization for objects without handlers"""
+    if isinstance(obj, IMMUTABLE):
+        text = repr(obj)
+    elif hasattr(obj, "__class__"):
+        text = "<{} instance at 0x{:x}>".format(obj.__class__.__name__, id(obj))
+    elif hasattr(obj, "__name__"):
+        text = "<{} at 0x{:x}>".format(obj.__name__, id(obj))
+    elif hasattr(obj, "__call__"):
+        text = "<callable at 0x{:x}>".format(id(obj))
+    else:
+        text = "<unsupported type at 0x{:x}>".format(id(obj))
+    serializer.emit(text, out, budget)
+
+
+@SimpleSerializer.register(*string)
+def string_handler(serializer, obj, out, budget, level):                         # pylint: disable=unused-argument
+    """Serialize strings. Only the prefix that fits the budget is copied"""
+    serializer.emit(repr(obj[:budget[0]]), out, budget)
+
+
+def iter_handler(serializer, obj, out, budget, level, items=None):               # pylint: disable=too-many-arguments
+    """Serialize items of iterable"""
+    emit = serializer.emit
+    if level <= 0:
+        emit("...", out, budget)
+        return
+    first = True
+    for item in obj if items is None else items:
+        if budget[0] <= 0:
+            emit(", ...", out, budget)
+            return
+        if not first:
+            emit(", ", out, budget)
+        first = False
+        serializer.write(item, out, budget, level - 1)
+
+
+@SimpleSerializer.register(tuple, list, set, frozenset, deque)
+def sequence_handler(serializer, obj, out, budget, level):
+    """Serialize sequences and sets as name([items])"""
+    serializer.emit(class_name(obj) + "([", out, budget)
+    iter_handler(serializer, obj, out, budget, level)
+    serializer.emit("])", out, budget)
+
+
+@SimpleSerializer.register(array)
+def array_handler(serializer, obj, out, budget, level):
+    """Serialize arrays as name(typecode, [items])"""
+    serializer.emit("{}({}, [".format(class_name(obj), obj.typecode),
+                    out, budget)
+    iter_handler(serializer, obj, out, budget, level)
+    serializer.emit("])", out, budget)
+
+
+@SimpleSerializer.register(date, time, timedelta)
+def repr_handler(serializer, obj, out, budget, level):                           # pylint: disable=unused-argument
+    """Serialize objects with small representations by repr"""
+    serializer.emit(repr(obj), out, budget)
+
+
+class DictItem(object):                                                          # pylint: disable=too-few-public-methods
+    """Key-value pair written as (key, value)"""
+
+    __slots__ = ("key", "value")
+
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+
+
+@SimpleSerializer.register(DictItem)
+def dict_item_handler(serializer, obj, out, budget, level):
+    """Serialize dict items. Keys and values are in the level of the item"""
+    serializer.emit("(", out, budget)
+    serializer.write(obj.key, out, budget, level)
+    serializer.emit(", ", out, budget)
+    serializer.write(obj.value, out, budget, level)
+    serializer.emit(")", out, budget)
+
+
+@SimpleSerializer.register(dict)
+def dict_handler(serializer, obj, out, budget, level):
+    """Serialize dicts as name([(key, value), ...])"""
+    serializer.emit(class_name(obj) + "([", out, budget)
+    iter_handler(serializer, obj, out, budget, level, items=(
+        DictItem(key, value) for key, value in viewitems(obj)))
+    serializer.emit("])", out, budget)
+
+
+# Optional libraries
+# Arrays and data frames are summarized by shape, type, size, digest of
+# their contents and a sample of their first items
+
+# Number of items in samples
+HEAD = 3
+# Number of columns listed in data frame summaries
+COLUMNS = 10
+
+
+def buffer_digest(data):
+    """Return digest of C-contiguous buffer without copying it"""
+    digest = (hashlib.blake2b(digest_size=16) if hasattr(hashlib, "blake2b")
+              else hashlib.sha1())
+    digest.update(memoryview(data))
+    return digest.hexdigest()
+
+
+class Raw(object):                                                               # pylint: disable=too-few-public-methods
+    """Text that emit_fields writes without repr"""
+
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+
+def emit_fields(serializer, obj, out, budget, level, fields):                    # pylint: disable=too-many-arguments
+    """Write name(field=value, ...). Values are written by the serializer"""
+    serializer.emit(class_name(obj) + "(", out, budget)
+    for index, (name, value) in enumerate(fields):
+        if budget[0] <= 0:
+            break
+        serializer.emit("{}{}=".format(", " if index else "", name),
+                        out, budget)
+        if isinstance(value, Raw):
+            serializer.emit(value.text, out, budget)
+        else:
+            serializer.write(value, out, budget, level - 1)
+    serializer.emit(")", out, budget)
+
+
+@SimpleSerializer.register_name("numpy", "ndarray")
+def ndarray_handler(serializer, obj, out, budget, level):
+    """Serialize numpy arrays as summaries
+    Object arrays have no digest: their buffer holds references.
+    Non-contiguous arrays are copied before the digest.
+    Subclasses, such as masked arrays and matrices, are read as plain arrays
+    """
+    import numpy
+    base = obj.view(numpy.ndarray)
+    digest = None
+    if not base.dtype.hasobject:
+        data = base
+        if not base.flags.c_contiguous:
+            data = numpy.ascontiguousarray(base)
+        digest = Raw(buffer_digest(data.reshape(-1).view(numpy.uint8)))
+    emit_fields(serializer, obj, out, budget, level, (
+        ("shape", Raw(str(obj.shape))),
+        ("dtype", Raw(str(obj.dtype))),
+        ("nbytes", obj.nbytes),
+        ("digest", digest),
+        ("head", base.flat[:HEAD].tolist()),
+    ))
+
+
+def frame_digest(obj):
+    """Return digest of row hashes of pandas objects. None if unhashable"""
+    from pandas.util import hash_pandas_object
+    try:
+        return Raw(buffer_digest(hash_pandas_object(obj, index=True).values))
+    except TypeError:
+        return None
+
+
+@SimpleSerializer.register_name("pandas", "DataFrame")
+@SimpleSerializer.register_name("pandas.core.frame", "DataFrame")
+def dataframe_handler(serializer, obj, out, budget, level):
+    """Serialize pandas data frames as summaries"""
+    emit_fields(serializer, obj, out, budget, level, (
+        ("shape", Raw(str(obj.shape))),
+        ("columns", Raw("[" + ", ".join(
+            "({}, {})".format(name, dtype)
+            for name, dtype in obj.dtypes.iloc[:COLUMNS].items()
+        ) + ("" if obj.shape[1] <= COLUMNS else ", ...") + "]")),
+        ("nbytes", int(obj.memory_usage(index=True, deep=False).sum())),
+        ("digest", frame_digest(obj)),
+        ("head", obj.iloc[:HEAD, :COLUMNS].values.tolist()),
+    ))
+
+
+@SimpleSerializer.register_name("pandas", "Series")
+@SimpleSerializer.register_name("pandas.core.series", "Series")
+def series_handler(serializer, obj, out, budget, level):
+    """Serialize pandas series as summaries"""
+    emit_fields(serializer, obj, out, budget, level, (
+        ("shape", Raw(str(obj.shape))),
+        ("dtype", Raw(str(obj.dtype))),
+        ("nbytes", int(obj.memory_usage(index=True, deep=False))),
+        ("digest", frame_digest(obj)),
+        ("head", obj.iloc[:HEAD].tolist()),
+    ))
+
+
+SERIALIZERS = ("repr", "simple", "content")
+
+
+def create_serializer(name, max_length=1000, max_depth=5, threshold=0):
+    """Return serializer function by name
+    repr uses the representation of objects.
+    simple uses the SimpleSerializer.
+    content stores jsonpickle representations in the content database.
+    Other serializers store representations longer than threshold in the
+    content database. 0 disables it
+    """
+    if name == "content":
+        return jsonpickle_content
+    serialize = repr
+    if name == "simple":
+        serialize = SimpleSerializer(max_length, max_depth).serialize
+    if threshold:
+        serialize = large_values_content(serialize, threshold)
+    return serialize
@@ -7,6 +7,7 @@
 import array
 
 from collections import Counter
+from opcode import HAVE_ARGUMENT, EXTENDED_ARG, hasjrel, hasjabs
 from types import CodeType
 
 from .dis import code_dis_sorted_line, findlinestarts
@@ -31,12 +32,13 @@ def reconstruct_lnotab(first_line, offsets, lines):
             new_lnotab.append(255)
             new_lnotab.append(0)
             new_offset -= 255
-        new_lnotab.append(new_offset)
         new_line = line - current_line
         while new_line > 255:
+            new_lnotab.append(new_offset)
             new_lnotab.append(255)
-            new_lnotab.append(0)
+            new_offset = 0
             new_line -= 255
+        new_lnotab.append(new_offset)
         new_lnotab.append(new_line)
         current_offset, current_line = offset, line
     return array.array('B', new_lnotab).tostring()
@@ -84,21 +86,34 @@ def recreate_code(code, codes_offsets, codes_lines):
         else:
             new_consts.append(const)
 
+    return replace_code(code, code.co_code, new_consts, code.co_stacksize,
+                        new_lnotab)
+
+
+def replace_code(code, co_code, consts, stacksize, lnotab):
+    """Create copy of code object with new bytecode, constants and lnotab
+
+
+    Arguments:
+    code -- original code object
+    co_code -- new bytecode
+    consts -- new constants list
+    stacksize -- new stack size
+    lnotab -- new lnotab
+    """
     if PY3:
-        new_code = CodeType(
+        return CodeType(
             code.co_argcount, code.co_kwonlyargcount, code.co_nlocals,
-            code.co_stacksize, code.co_flags, code.co_code, tuple(new_consts),
-            code.co_names, code.co_varnames, code.co_filename, code.co_name,
-            code.co_firstlineno, new_lnotab, code.co_freevars, code.co_cellvars
-        )
-    else:
-        new_code = CodeType(
-            code.co_argcount, code.co_nlocals,
-            code.co_stacksize, code.co_flags, code.co_code, tuple(new_consts),
+            stacksize, code.co_flags, co_code, tuple(consts),
             code.co_names, code.co_varnames, code.co_filename, code.co_name,
-            code.co_firstlineno, new_lnotab, code.co_freevars, code.co_cellvars
+            code.co_firstlineno, lnotab, code.co_freevars, code.co_cellvars
         )
-    return new_code
+    return CodeType(
+        code.co_argcount, code.co_nlocals,
+        stacksize, code.co_flags, co_code, tuple(consts),
+        code.co_names, code.co_varnames, code.co_filename, code.co_name,
+        code.co_firstlineno, lnotab, code.co_freevars, code.co_cellvars
+    )
 
 
 def insert_new_lines(compiled, process):                                         # pylint: disable=too-many-locals
@@ -138,3 +153,137 @@ def insert_new_lines(compiled, process):
         new_codes_lines[code_id] = new_lines
 
     return size, recreate_code(compiled, codes_offsets, new_codes_lines)
+
+
+def decode_instructions(code):
+    """Return list of [offset, opcode, arg] of code
+    EXTENDED_ARG is merged into the next instruction. Jump args are
+    replaced by the offset of their targets"""
+    co_code = bytearray(code.co_code)
+    result = []
+    offset, start, extended = 0, 0, 0
+    while offset < len(co_code):
+        opcode = co_code[offset]
+        arg = None
+        offset += 1
+        if opcode >= HAVE_ARGUMENT:
+            arg = co_code[offset] + co_code[offset + 1] * 256 + extended
+            offset += 2
+            if opcode == EXTENDED_ARG:
+                extended = arg << 16
+                continue
+            if opcode in hasjrel:
+                arg += offset
+        result.append([start, opcode, arg])
+        start, extended = offset, 0
+    return result
+
+
+def instruction_size(opcode, arg):
+    """Return size of instruction in bytes"""
+    if opcode < HAVE_ARGUMENT:
+        return 1
+    return 6 if arg > 0xFFFF else 3
+
+
+def assemble(blocks):
+    """Assemble blocks of (opcode, arg, target)
+    Return bytecode and offset of each block
+
+    target is None or the index of the block that the jump points to
+    Instructions are resized until all EXTENDED_ARG are known
+    """
+    sizes = [[instruction_size(opcode, 0) for opcode, _, _ in block]
+             for block in blocks]
+    while True:
+        starts, offset = [], 0
+        for block_sizes in sizes:
+            starts.append(offset)
+            offset += sum(block_sizes)
+        changed = False
+        offset = 0
+        for index, block in enumerate(blocks):
+            for position, (opcode, arg, target) in enumerate(block):
+                size = sizes[index][position]
+                if target is not None:
+                    arg = starts[target]
+                    if opcode in hasjrel:
+                        arg -= offset + size
+                new_size = instruction_size(opcode, arg or 0)
+                if new_size > size:
+                    sizes[index][position] = new_size
+                    changed = True
+                offset += size
+        if not changed:
+            break
+
+    co_code = bytearray()
+    for index, block in enumerate(blocks):
+        for position, (opcode, arg, target) in enumerate(block):
+            size = sizes[index][position]
+            if target is not None:
+                arg = starts[target]
+                if opcode in hasjrel:
+                    arg -= len(co_code) + size
+            if size == 6:
+                co_code.extend([EXTENDED_ARG, (arg >> 16) & 0xFF,
+                                (arg >> 24) & 0xFF])
+                arg &= 0xFFFF
+            co_code.append(opcode)
+            if opcode >= HAVE_ARGUMENT:
+                co_code.extend([arg & 0xFF, arg >> 8])
+    return bytes(co_code), starts
+
+
+def insert_instructions(code, process, extra_stack):                             # pylint: disable=too-many-locals
+    """Insert instructions around instructions of code and of nested codes
+    Return new code
+
+    Arguments:
+    code -- original code object
+    process -- process(code, offset, opcode, arg, line, const) function that
+               returns lists of (opcode, arg) inserted before and after the
+               instruction. const(value) returns the index of a new constant
+    extra_stack -- stack size required by inserted instructions
+    """
+    consts = [
+        insert_instructions(const, process, extra_stack)
+        if isinstance(const, CodeType) else const
+        for const in code.co_consts
+    ]
+
+    def const(value):
+        """Add constant and return its index"""
+        consts.append(value)
+        return len(consts) - 1
+
+    instructions = decode_instructions(code)
+    positions = {inst[0]: index for index, inst in enumerate(instructions)}
+    linestarts = dict(findlinestarts(code))
+    blocks = []
+    line = code.co_firstlineno
+    for offset, opcode, arg in instructions:
+        line = linestarts.get(offset, line)
+        before, after = process(code, offset, opcode, arg, line, const)
+        target = None
+        if opcode in hasjrel or opcode in hasjabs:
+            target, arg = positions[arg], None
+        blocks.append(
+            [(new_op, new_arg, None) for new_op, new_arg in before] +
+            [(opcode, arg, target)] +
+            [(new_op, new_arg, None) for new_op, new_arg in after]
+        )
+    if len(consts) == len(code.co_consts) and all(
+            len(block) == 1 for block in blocks):
+        return replace_code(code, code.co_code, consts, code.co_stacksize,
+                            code.co_lnotab)
+
+    co_code, starts = assemble(blocks)
+    sorted_lines = sorted(linestarts.items())
+    lnotab = reconstruct_lnotab(
+        code.co_firstlineno,
+        [starts[positions[offset]] for offset, _ in sorted_lines],
+        [line for _, line in sorted_lines]
+    )
+    return replace_code(code, co_code, consts,
+                        code.co_stacksize + extra_stack, lnotab)
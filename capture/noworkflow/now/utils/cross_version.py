@@ -15,10 +15,24 @@ except ImportError:
     from io import StringIO
 
 
+try:
+    from time import perf_counter_ns                                             # pylint: disable=unused-import
+except ImportError:
+    try:
+        from time import perf_counter                                            # pylint: disable=ungrouped-imports
+    except ImportError:
+        from time import time as perf_counter                                    # pylint: disable=ungrouped-imports
+
+    def perf_counter_ns():
+        """Return monotonic counter in nanoseconds"""
+        return int(perf_counter() * 1000000000)
+
+
 PY3 = (sys.version_info >= (3, 0))
 if PY3:
     import builtins                                                              # pylint: disable=wrong-import-position, unused-import
     import pickle                                                                # pylint: disable=wrong-import-position, unused-import
+    import queue                                                                 # pylint: disable=wrong-import-position, unused-import
     import reprlib                                                               # pylint: disable=wrong-import-position, unused-import
     from itertools import zip_longest                                            # pylint: disable=wrong-import-position, unused-import
 
@@ -31,6 +45,7 @@ else:
         import cPickle as pickle                                                 # pylint: disable=wrong-import-position, unused-import
     except ImportError:
         import pickle                                                            # pylint: disable=wrong-import-position, unused-import, ungrouped-imports
+    import Queue as queue                                                        # pylint: disable=wrong-import-position, unused-import, import-error
     import repr as reprlib                                                       # pylint: disable=wrong-import-position, unused-import, import-error
     from itertools import izip_longest as zip_longest                            # pylint: disable=wrong-import-position, unused-import, ungrouped-imports
 
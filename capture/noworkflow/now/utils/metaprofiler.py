@@ -29,7 +29,9 @@ class MetaProfiler(object):
             "definition",
             "deployment", "environment", "modules",
             "execution",
-            "storage"
+            "storage",
+            "content_queue_depth", "content_writes", "content_throughput",
+            "stored_rows", "rows_per_second"
         ]
         self.data = defaultdict(float)
 
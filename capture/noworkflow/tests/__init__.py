@@ -13,7 +13,19 @@ persistence_config.connect(".")
 
 
 from .prov_definition import TestSlicingDependencies
-from .prov_execution import TestCallSlicing
+from .prov_execution import TestCallSlicing, TestInstrumenter, TestProfiler
+from .prov_execution import TestSliceStack
 from .prov_deployment import TestProvDeployment
 from .cross_version_test import TestCrossVersion
 from .formatter_test import TestFormatter
+from .compression_test import TestCompression
+from .chunking_test import TestChunking
+from .lightweight_test import TestObjectStore, TestColumnarObjectStore
+from .lightweight_test import TestValueInterner
+from .serializers_test import TestSimpleSerializer
+from .garbage_test import TestGarbageCollector
+from .retention_test import TestRetention
+from .trial_graph_test import TestTrialGraph
+from .content_database_test import TestContentDatabase
+from .packfile_test import TestPackfile
+from .relational_database_test import TestRelationalDatabase
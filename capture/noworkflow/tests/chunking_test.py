@@ -0,0 +1,50 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test now.persistence.chunking module"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import io
+import unittest
+from ..now.persistence import chunking
+
+
+def rows(start, end):
+    """Return csv-like content"""
+    return "".join(
+        "{0},{1},{2}\n".format(i, i * 7 % 13, "value" * (i % 5))
+        for i in range(start, end)
+    ).encode("ascii")
+
+
+class TestChunking(unittest.TestCase):
+    """TestCase for now.persistence.chunking module"""
+
+    def split(self, data, block_size=4096):
+        """Split bytes"""
+        return list(chunking.split(io.BytesIO(data).read, block_size))
+
+    def test_split_reassembles_content(self):
+        data = rows(0, 50000)
+        chunks = self.split(data)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(data, b"".join(chunks))
+
+    def test_chunk_sizes_are_bounded(self):
+        data = rows(0, 50000) + b"x" * chunking.MAX_SIZE * 2
+        chunks = self.split(data)
+        for chunk in chunks[:-1]:
+            self.assertGreaterEqual(len(chunk), chunking.MIN_SIZE)
+            self.assertLessEqual(len(chunk), chunking.MAX_SIZE)
+
+    def test_append_preserves_previous_chunks(self):
+        data = rows(0, 50000)
+        before = self.split(data)
+        after = self.split(data + rows(50000, 51000))
+        self.assertEqual(before[:-1], after[:len(before) - 1])
+
+    def test_block_size_does_not_change_boundaries(self):
+        data = rows(0, 50000)
+        self.assertEqual(self.split(data, 1000), self.split(data, 100000))
@@ -0,0 +1,44 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test now.persistence.compression module"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import unittest
+from ..now.persistence import compression
+
+
+class TestCompression(unittest.TestCase):
+    """TestCase for now.persistence.compression module"""
+
+    def test_small_content_is_raw(self):
+        content = b"a" * 10
+        self.assertEqual(content, compression.encode(content))
+
+    def test_large_content_is_compressed(self):
+        content = b"line\n" * 1000
+        stored = compression.encode(content)
+        self.assertTrue(stored.startswith(compression.MAGIC))
+        self.assertLess(len(stored), len(content))
+        self.assertEqual(content, compression.decode(stored))
+
+    def test_compressed_formats_are_raw(self):
+        content = b"\x1f\x8b" + b"a" * 1000
+        self.assertEqual(content, compression.encode(content))
+
+    def test_content_with_magic(self):
+        content = compression.MAGIC + b"abc"
+        stored = compression.encode(content)
+        self.assertNotEqual(content, stored)
+        self.assertEqual(content, compression.decode(stored))
+
+    def test_describe(self):
+        content = b"line\n" * 1000
+        stored = compression.encode(content)
+        self.assertEqual(
+            ("zlib", len(content)),
+            compression.describe(stored[:compression.HEADER.size],
+                                 len(stored)))
+        self.assertEqual(("raw", 5), compression.describe(b"abcde", 5))
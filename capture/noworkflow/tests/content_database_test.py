@@ -0,0 +1,185 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test now.persistence.content_database module"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import hashlib
+import os
+import time
+
+from ..now.persistence import content, compression, content_database
+from ..now.persistence.models import HashCache
+
+from .chunking_test import rows
+from .garbage_test import StoreTestCase
+
+
+class ReadRecorder(object):
+    """File wrapper that records the sizes of reads"""
+
+    def __init__(self, fil, sizes):
+        self.fil = fil
+        self.sizes = sizes
+
+    def read(self, size=-1):
+        """Record size and read"""
+        self.sizes.append(size)
+        return self.fil.read(size)
+
+    def __getattr__(self, name):
+        return getattr(self.fil, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.fil.close()
+
+
+class TestContentDatabase(StoreTestCase):
+    """TestCase for now.persistence.content_database module"""
+
+    def write_file(self, name, data):
+        """Write data to file in the temporary directory. Return its path"""
+        path = os.path.join(self.path, name)
+        with content.std_open(path, "wb") as fil:
+            fil.write(data)
+        return path
+
+    def test_put_file(self):
+        small, large = b"x,y\n1,2\n", rows(0, 60000)
+        self.assertGreater(len(large), content_database.CHUNK_SIZE)
+        for name, data in [("small.csv", small), ("large.csv", large)]:
+            path = self.write_file(name, data)
+            content_hash = content.put_file(path)
+            self.assertEqual(hashlib.sha1(data).hexdigest(), content_hash)
+            self.assertEqual(content_hash, content.hash_file(path))
+            self.assertEqual(data, content.get(content_hash))
+            # Storing it again keeps the stored content
+            self.assertEqual(content_hash, content.put_file(path))
+        # Temporary files are renamed or removed
+        self.assertEqual([], [
+            name for name in os.listdir(content.content_path)
+            if name.startswith("tmp_")
+        ])
+
+    def test_put_file_reads_bounded_chunks(self):
+        data = rows(0, 60000)
+        path = self.write_file("large.csv", data)
+        sizes = []
+        std_open = content.std_open
+
+        def recording_open(name, mode="r", *args):
+            """Record reads of path"""
+            fil = std_open(name, mode, *args)
+            return ReadRecorder(fil, sizes) if name == path else fil
+
+        content.std_open = recording_open
+        self.addCleanup(setattr, content, "std_open", std_open)
+        content_hash = content.put_file(path)
+        self.assertEqual(data, content.get(content_hash))
+        self.assertGreater(len(sizes), 1)
+        for size in sizes:
+            self.assertTrue(0 < size <= content_database.CHUNK_SIZE, size)
+
+    def write_old_file(self, name, data):
+        """Write file modified before the racy interval. Return its path"""
+        path = self.write_file(name, data)
+        mtime = time.time() - 10 * content_database.RACY_INTERVAL
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_stat_memo(self):
+        self.addCleanup(setattr, content, "stat_memo", None)
+        content.stat_memo = {}
+        path = self.write_old_file("data.csv", b"1,2\n")
+        content_hash = content.put_file(path)
+        self.assertIn(os.path.abspath(path), content.stat_memo_used)
+
+        def fail(path):
+            """Files with memoized stats must not be read"""
+            self.fail("{} was read".format(path))
+
+        content._put_file = fail                                                 # pylint: disable=protected-access
+        self.assertEqual(content_hash, content.put_file(path))
+        del content._put_file                                                    # pylint: disable=protected-access
+
+        # Changed stat: read it again
+        path = self.write_old_file("data.csv", b"1,2\n3,4\n")
+        self.assertEqual(
+            hashlib.sha1(b"1,2\n3,4\n").hexdigest(), content.put_file(path))
+
+    def test_recent_files_are_not_memoized(self):
+        self.addCleanup(setattr, content, "stat_memo", None)
+        content.stat_memo = {}
+        path = self.write_file("data.csv", b"1,2\n")
+        content.put_file(path)
+        self.assertEqual({}, content.stat_memo)
+
+    def test_hash_cache_table(self):
+        self.addCleanup(setattr, content, "stat_memo_used", set())
+        self.addCleanup(setattr, content, "stat_memo", None)
+        HashCache.load_memo(10)
+        self.assertEqual({}, content.stat_memo)
+        paths = [
+            self.write_old_file("file{}.csv".format(index), rows(0, index))
+            for index in range(1, 4)
+        ]
+        for path in paths:
+            content.put_file(path)
+        memo = dict(content.stat_memo)
+        HashCache.store_memo(10)
+        HashCache.load_memo(10)
+        self.assertEqual(memo, content.stat_memo)
+        # Entries above the limit are evicted
+        content.stat_memo_used = set(memo)
+        HashCache.store_memo(2)
+        HashCache.load_memo(10)
+        self.assertEqual(2, len(content.stat_memo))
+        # 0 disables the memo
+        HashCache.load_memo(0)
+        self.assertIsNone(content.stat_memo)
+
+    def test_background_writers(self):
+        datas = [rows(start, start + 100) for start in range(0, 5000, 100)]
+        paths = [
+            self.write_file("file{}.csv".format(index), data)
+            for index, data in enumerate(datas[:10])
+        ]
+        content.start_writers(2)
+        hashes = [content.put(data) for data in datas]
+        hashes.extend(content.put_file(path) for path in paths)
+        # Repeated contents are queued once
+        content.put(datas[0])
+        content.stop_writers()
+        self.assertIsNone(content.write_queue)
+        self.assertEqual(len(datas), content.write_stats["writes"])
+        for data, content_hash in zip(datas + datas[:10], hashes):
+            self.assertEqual(hashlib.sha1(data).hexdigest(), content_hash)
+            self.assertEqual(data, content.get(content_hash))
+
+    def test_chunks_are_stored_before_manifest(self):
+        data = rows(0, 60000)
+        path = self.write_file("data.csv", data)
+        self.addCleanup(setattr, content, "chunking", False)
+        content.chunking = True
+        write = content._write                                                   # pylint: disable=protected-access
+
+        def slow_write(content_hash, stored):
+            """Delay background writes"""
+            time.sleep(0.001)
+            return write(content_hash, stored)
+
+        content._write = slow_write                                              # pylint: disable=protected-access
+        self.addCleanup(vars(content).pop, "_write")
+        content.start_writers(1)
+        content_hash = content.put_file(path)
+        hashes = compression.decode_manifest(content.get_stored(content_hash))
+        self.assertGreater(len(hashes), 1)
+        for chunk_hash in hashes:
+            self.assertTrue(content.exists(chunk_hash))
+        content.stop_writers()
+        self.assertEqual(data, content.get(content_hash))
@@ -0,0 +1,12 @@
+def inner(value):
+    return value + 1
+
+
+def outer(value):
+    return inner(value) * 2
+
+
+class Counter(object):
+
+    def count(self, value):
+        return outer(value)
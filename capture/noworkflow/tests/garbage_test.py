@@ -0,0 +1,152 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test now.persistence.garbage module"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import hashlib
+import io
+import shutil
+import tempfile
+import unittest
+
+from datetime import datetime
+
+from ..now.persistence import persistence_config, content, relational
+from ..now.persistence import chunking, compression
+from ..now.persistence.garbage import GarbageCollector
+from ..now.persistence.models import Trial, Activation, FileAccess, Value
+from ..now.persistence.serializers import CONTENT_PREFIX
+
+from .chunking_test import rows
+
+
+class StoreTestCase(unittest.TestCase):
+    """TestCase that connects to a temporary .noworkflow"""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        persistence_config.should_mock = False
+        # Use the real storage methods instead of the mocked ones
+        for name in ("put", "get", "put_file"):
+            vars(content).pop(name, None)
+        persistence_config.connect(self.path)
+        self.addCleanup(self.disconnect)
+
+    def disconnect(self):
+        """Restore mocked persistence and remove temporary .noworkflow"""
+        content.stop_writers()
+        content.packs.close()
+        relational.session.close()
+        relational.engine.dispose()
+        persistence_config.mock()
+        persistence_config.connect(".")
+        shutil.rmtree(self.path)
+
+    def insert(self, model, *rows_):
+        """Insert rows into model table"""
+        relational.session.execute(model.t.insert(), list(rows_))
+        relational.session.commit()
+
+
+class TestGarbageCollector(StoreTestCase):
+    """TestCase for now.persistence.garbage module"""
+
+    def put(self, data):
+        """Store data synchronously. Return its hash"""
+        content_hash = hashlib.sha1(data).hexdigest()
+        content._write(content_hash, data)                                       # pylint: disable=protected-access
+        return content_hash
+
+    def put_packed(self, *datas):
+        """Store datas in a single packfile. Return their hashes"""
+        content.backend = "pack"
+        try:
+            return [self.put(data) for data in datas]
+        finally:
+            content.flush()
+            content.backend = "loose"
+
+    def put_chunked(self, data):
+        """Store data as chunks and a manifest. Return their hashes"""
+        hashes = [
+            self.put(chunk)
+            for chunk in chunking.split(io.BytesIO(data).read, 4096)
+        ]
+        content_hash = hashlib.sha1(data).hexdigest()
+        content._store(content_hash, compression.encode_manifest(                # pylint: disable=protected-access
+            len(data), hashes))
+        return content_hash, hashes
+
+    def add_trial(self, code_hash, **values):
+        """Insert finished trial 1 with code_hash and FileAccess values"""
+        now = datetime.now()
+        self.insert(Trial, dict(
+            id=1, start=now, finish=now, script="script.py",
+            code_hash=code_hash))
+        if values:
+            self.insert(FileAccess, dict(trial_id=1, id=1, name="data.csv",
+                                         **values))
+
+    def collect(self):
+        """Collect all unreferenced contents, regardless of their age"""
+        return GarbageCollector(grace=-60).collect()
+
+    def assertKept(self, datas):                                                 # pylint: disable=invalid-name
+        """Check if datas are still readable"""
+        for data in datas:
+            self.assertEqual(data, content.get(hashlib.sha1(data).hexdigest()))
+
+    def assertRemoved(self, hashes):                                             # pylint: disable=invalid-name
+        """Check if hashes were removed"""
+        for content_hash in hashes:
+            self.assertFalse(content.exists(content_hash))
+
+    def test_loose_contents(self):
+        code, dead = b"print(1)\n", b"print(2)\n"
+        self.add_trial(self.put(code))
+        dead_hash = self.put(dead)
+        collector = self.collect()
+        self.assertTrue(collector.complete)
+        self.assertEqual(1, collector.removed_objects)
+        self.assertKept([code])
+        self.assertRemoved([dead_hash])
+
+    def test_packed_contents(self):
+        code, before, after, dead = b"code", b"before", b"after", b"dead"
+        hashes = self.put_packed(code, before, after, dead)
+        self.add_trial(hashes[0], content_hash_before=hashes[1],
+                       content_hash_after=hashes[2])
+        collector = self.collect()
+        self.assertEqual(1, collector.removed_objects)
+        self.assertEqual(1, collector.repacked)
+        self.assertKept([code, before, after])
+        self.assertRemoved([hashes[3]])
+
+    def test_chunked_contents(self):
+        data, dead = rows(0, 50000), rows(50000, 60000)
+        content_hash, chunks = self.put_chunked(data)
+        self.assertGreater(len(chunks), 1)
+        dead_hash, dead_chunks = self.put_chunked(dead)
+        code_hash = self.put(b"code")
+        self.add_trial(code_hash, content_hash_after=content_hash)
+        collector = self.collect()
+        self.assertEqual(set(chunks) | {content_hash, code_hash},
+                         collector.live)
+        self.assertKept([data])
+        self.assertRemoved([dead_hash] + list(set(dead_chunks) - set(chunks)))
+
+    def test_content_values(self):
+        returned, value, dead = b"[1, 2]", b"{'a': 1}", b"[3]"
+        self.add_trial(self.put(b"code"))
+        self.insert(Activation, dict(
+            trial_id=1, id=1, name="f",
+            return_value=CONTENT_PREFIX + self.put(returned)))
+        self.insert(Value, dict(
+            trial_id=1, id=1, value=CONTENT_PREFIX + self.put(value)))
+        dead_hash = self.put(dead)
+        self.collect()
+        self.assertKept([b"code", returned, value])
+        self.assertRemoved([dead_hash])
@@ -0,0 +1,111 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test now.persistence.lightweight module"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import unittest
+from ..now.persistence.lightweight import ObjectStore, ColumnarObjectStore
+from ..now.persistence.lightweight import ActivationLW, ObjectValueLW
+from ..now.persistence.lightweight import VariableLW, ValueLW, ValueInterner
+from ..now.persistence.lightweight import clock
+
+
+class TestObjectStore(unittest.TestCase):
+    """TestCase for now.persistence.lightweight.ObjectStore"""
+
+    def add_activation(self, store):
+        return store.add_object("def.py", "call.py", "f", 1, 0, None, True)
+
+    def test_partial_store_yields_completed_objects(self):
+        store = ObjectStore(ActivationLW)
+        first = self.add_activation(store)
+        second = self.add_activation(store)
+        second.finish_ns = clock.now()
+        store.complete(second)
+        self.assertEqual([second], list(store.generator(1, partial=True)))
+        self.assertEqual([first], list(store.values()))
+        self.assertEqual([], list(store.generator(1, partial=True)))
+
+    def test_complete_objects_are_enqueued_on_add(self):
+        store = ObjectStore(ObjectValueLW)
+        value = store.add_object("x", "1", "ARGUMENT", 1)
+        self.assertEqual([value], list(store.generator(1, partial=True)))
+        self.assertFalse(store.has_items())
+
+    def test_final_store_yields_remaining_objects(self):
+        store = ObjectStore(ActivationLW)
+        first = self.add_activation(store)
+        second = self.add_activation(store)
+        second.finish_ns = clock.now()
+        store.complete(second)
+        self.assertEqual({first, second}, set(store.generator(1)))
+        self.assertEqual([], list(store.generator(1, partial=True)))
+
+
+class TestValueInterner(unittest.TestCase):
+    """TestCase for now.persistence.lightweight.ValueInterner"""
+
+    def test_repeated_values_share_ids(self):
+        interner = ValueInterner(size=2)
+        interner.reset(ObjectStore(ValueLW))
+        self.assertEqual(1, interner.intern("0"))
+        self.assertEqual(2, interner.intern("None"))
+        self.assertEqual(1, interner.intern("0"))
+        self.assertEqual(3, interner.intern("True"))
+        self.assertEqual(None, interner.intern(None))
+        # "None" was the least recently used value
+        self.assertEqual(4, interner.intern("None"))
+        self.assertEqual(["0", "None", "True", "None"],
+                         [value.value for value in interner.store.values()])
+
+
+class TestColumnarObjectStore(unittest.TestCase):
+    """TestCase for now.persistence.lightweight.ColumnarObjectStore"""
+
+    def test_views_read_and_write_columns(self):
+        store = ColumnarObjectStore(VariableLW)
+        vid = store.add(1, "x", 3, "10", 0, "normal")
+        store[vid].value = "20"
+        variable = store[vid]
+        self.assertEqual((vid, 1, "x", 3, "20", "normal"), (
+            variable.id, variable.activation_id, variable.name,
+            variable.line, variable.value, variable.type))
+        self.assertEqual(store[vid], variable)
+
+    def test_rows_are_read_from_columns(self):
+        store = ColumnarObjectStore(ObjectValueLW)
+        store.add("x", "1", "ARGUMENT", 1)
+        store.add("y", None, "ARGUMENT", 1)
+        keys = ("id", "trial_id", "name", "value")
+        self.assertEqual([(1, 5, "x", "1"), (2, 5, "y", None)],
+                         list(store.rows(5, True, keys, None)))
+        self.assertFalse(store.has_items())
+        self.assertRaises(KeyError, lambda: store[1])
+        self.assertEqual(3, store.add("z", "2", "ARGUMENT", 2))
+
+    def test_incomplete_objects_are_stored_at_the_end(self):
+        store = ColumnarObjectStore(VariableLW)
+        store.add(1, "x", 3, "10", 0, "normal")
+        self.assertEqual([], list(store.rows(1, True, ("id",), None)))
+        self.assertEqual([(1,)], list(store.rows(1, False, ("id",), None)))
+
+    def test_evict_keeps_referenced_rows_as_stubs(self):
+        store = ColumnarObjectStore(VariableLW)
+        store.enable_spill()
+        variable = store.add_object(1, "x", 3, "10", 0, "normal")
+        store.add(1, "y", 4, "20", 0, "normal")
+        list(store.rows(7, False, ("id",), None))
+        loaded = []
+        store.evict(lambda vid: loaded.append(vid) or VariableLW(
+            vid, 1, "y", 4, "20", 0, "normal"))
+        variable.value = "30"
+        self.assertEqual("30", store[1].value)
+        self.assertEqual("y", store[2].name)
+        self.assertEqual([2], loaded)
+        self.assertEqual(3, store.add(1, "z", 5, "40", 0, "normal"))
+        keys = ("id", "trial_id", "value")
+        self.assertEqual([(1, 7, "30"), (2, 7, "20"), (3, 7, "40")],
+                         sorted(store.rows(7, False, keys, None)))
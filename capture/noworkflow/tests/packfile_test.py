@@ -0,0 +1,100 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test now.persistence.packfile module"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import hashlib
+import os
+
+from ..now.persistence import content
+from ..now.persistence.packfile import PackStore, PACK_DIRNAME
+
+from .chunking_test import rows
+from .garbage_test import StoreTestCase
+
+
+class TestPackfile(StoreTestCase):
+    """TestCase for now.persistence.packfile module"""
+
+    def setUp(self):
+        super(TestPackfile, self).setUp()
+        self.addCleanup(setattr, content, "backend", "loose")
+        self.datas = [b"", b"print(1)\n", rows(0, 1000), rows(0, 1000) + b"\n"]
+
+    def put(self):
+        """Put datas in the content database. Return their hashes"""
+        return [content.put(data) for data in self.datas]
+
+    def loose_files(self):
+        """Return loose object files"""
+        return [path for _, path in content.loose_objects()]
+
+    def assertStored(self, hashes):                                              # pylint: disable=invalid-name
+        """Check if hashes of datas are readable from the content database"""
+        for data, content_hash in zip(self.datas, hashes):
+            self.assertEqual(hashlib.sha1(data).hexdigest(), content_hash)
+            self.assertTrue(content.exists(content_hash))
+            self.assertEqual(data, content.get(content_hash))
+
+    def test_current_packfile(self):
+        content.backend = "pack"
+        hashes = self.put()
+        # Readable before the index is written
+        self.assertStored(hashes)
+        self.assertEqual([], self.loose_files())
+        self.assertEqual(
+            [os.path.basename(content.packs.pack_name) + ".pack"],
+            os.listdir(os.path.join(content.content_path, PACK_DIRNAME)))
+
+    def test_packfile_index(self):
+        content.backend = "pack"
+        hashes = self.put()
+        pack_name = content.packs.pack_name
+        content.flush()
+        self.assertEqual(
+            [pack_name + ".idx", pack_name + ".pack"],
+            sorted(os.path.join(content.packs.pack_path, name)
+                   for name in os.listdir(content.packs.pack_path)))
+        self.assertStored(hashes)
+        # Read by a new store
+        packs = PackStore()
+        packs.set_path(content.content_path)
+        self.addCleanup(packs.close)
+        for content_hash in hashes:
+            self.assertEqual(
+                content.get_stored(content_hash), packs.get(content_hash))
+        self.assertEqual(
+            os.path.getsize(pack_name + ".pack"),
+            sum(packs.find(content_hash)[2] for content_hash in hashes))
+        self.assertIsNone(packs.get("0" * 40))
+        # Stored contents are not appended again
+        self.put()
+        self.assertIsNone(content.packs.pack_file)
+
+    def test_find_subhash(self):
+        content.backend = "pack"
+        hashes = self.put()
+        for content_hash in hashes:
+            self.assertEqual(content_hash, content.find_subhash(
+                content_hash[:7]))
+        content.flush()
+        for content_hash in hashes:
+            self.assertEqual(content_hash, content.find_subhash(
+                content_hash[:7]))
+        self.assertIsNone(content.find_subhash(
+            "".join("0" if c != "0" else "1" for c in hashes[1][:8])))
+
+    def test_pack_loose_objects(self):
+        hashes = self.put()
+        self.assertEqual(len(self.datas), len(self.loose_files()))
+        count, size = content.pack_loose_objects()
+        self.assertEqual(len(self.datas), count)
+        self.assertGreater(size, 0)
+        self.assertEqual([], self.loose_files())
+        self.assertEqual([PACK_DIRNAME], os.listdir(content.content_path))
+        self.assertStored(hashes)
+        # Packed objects are not packed again
+        self.assertEqual((0, 0), content.pack_loose_objects())
@@ -7,7 +7,13 @@ from __future__ import (absolute_import, print_function,
                         division, unicode_literals)
 
 from .call_slicing_test import TestCallSlicing
+from .instrumenter_test import TestInstrumenter
+from .profiler_test import TestProfiler
+from .slice_stack_test import TestSliceStack
 
 __all__ = [
     b'TestCallSlicing',
+    b'TestInstrumenter',
+    b'TestProfiler',
+    b'TestSliceStack',
 ]
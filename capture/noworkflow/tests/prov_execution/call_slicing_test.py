@@ -22,6 +22,13 @@ class Args(object):
     def __init__(self):
         self.verbose = False
         self.bypass_modules = False
+        self.hash_cache_size = 100000
+        self.content_writers = 0
+        self.content_backend = "loose"
+        self.content_chunking = False
+        self.synchronous = "NORMAL"
+        self.capture_in_memory = False
+        self.memory_flush = 256
         self.context = "main"
         self.depth = sys.getrecursionlimit()
         self.non_user_depth = 1
@@ -37,6 +44,14 @@ class Args(object):
         self.disasm = False
         self.save_frequency = 0
         self.call_storage_frequency = 10000
+        self.sample = 1
+        self.aggregate = 0
+        self.max_overhead = 0
+        self.max_capture_memory = 0
+        self.serializer = "repr"
+        self.serializer_length = 1000
+        self.serializer_depth = 5
+        self.value_threshold = 0
 
 
 class TestCallSlicing(unittest.TestCase):
@@ -0,0 +1,77 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test now.collection.prov_execution.instrumenter module"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import sys
+import unittest
+
+from ...now.cmd.cmd_run import run
+from ...now.collection.metadata import Metascript
+
+from .call_slicing_test import Args, NAME
+
+
+CODE = ("import calls\n"
+        "def run(x):\n"
+        "    return calls.outer(x)\n"
+        "result = [run(x) for x in range(2)]\n"
+        "total = calls.Counter().count(result[0])\n")
+
+
+class TestInstrumenter(unittest.TestCase):
+    """TestCase for now.collection.prov_execution.instrumenter module
+    Activations of the Instrumenter must match the Profiler's"""
+
+    def setUp(self):
+        self.addCleanup(sys.modules.pop, "calls", None)
+
+    def activations(self, provider, preload):
+        """Run CODE with provider
+        Return (name, caller name) pairs of activations of user code
+
+        Arguments:
+        provider -- execution provider
+        preload -- import calls before the execution, as the deployment
+                   provenance collection does
+        """
+        args = Args()
+        args.execution_provenance = provider
+        args.context = "package"
+        sys.argv = ["now", "run", "-e", provider, "__init__.py"]
+        metascript = Metascript().read_cmd_args(args)
+        metascript.fake_path(NAME, CODE.encode("utf-8"))
+
+        import __main__
+        metascript.namespace = __main__.__dict__
+        metascript.clear_sys()
+        metascript.clear_namespace()
+        sys.modules.pop("calls", None)
+        if preload:
+            __import__("calls")
+        run(metascript)
+
+        activations = metascript.activations_store
+        return [
+            (activation.name, activations[activation.caller_id].name)
+            for activation in sorted(activations.values(),
+                                     key=lambda activation: activation.id)
+            if activation.definition_file in metascript.paths and
+            activation.caller_id in activations.store
+        ]
+
+    def test_modules_imported_before_execution(self):
+        profiler = self.activations("Profiler", preload=True)
+        self.assertIn(("inner", "outer"), profiler)
+        self.assertIn(("count", NAME), profiler)
+        # Probes are inserted into the loaded module
+        self.assertEqual(profiler, self.activations("Instrumenter", True))
+
+    def test_modules_imported_by_script(self):
+        profiler = self.activations("Profiler", preload=False)
+        self.assertIn(("noworkflow/tests/examples/calls.py", NAME), profiler)
+        # Probes are inserted by the import hook
+        self.assertEqual(profiler, self.activations("Instrumenter", False))
@@ -0,0 +1,192 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test now.collection.prov_execution.profiler module"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import sys
+import unittest
+
+from ...now.cmd.cmd_run import run
+from ...now.collection.metadata import Metascript
+from ...now.collection.prov_execution.profiler import Profiler
+from ...now.collection.prov_execution.slicing import Tracer
+
+from .call_slicing_test import Args, NAME
+
+
+# Opens an existing file. Its content is stored before the open call
+CODE = ("def read(name):\n"
+        "    with open(name) as fil:\n"
+        "        return fil.read()\n"
+        "def f(x):\n"
+        "    return x + 1\n"
+        "text = read('noworkflow/tests/examples/calls.py')\n"
+        "result = f(len(text))\n")
+# Calls f ten times from main level
+LOOP = ("def f(x):\n"
+        "    return x + 1\n"
+        "for i in range(10):\n"
+        "    f(i)\n")
+# Calls a library function defined in Python
+LIBRARY = ("import json\n"
+           "def f(x):\n"
+           "    y = json.dumps(x)\n"
+           "    return y\n"
+           "r = f([1, 2])\n")
+
+
+class TestProfiler(unittest.TestCase):
+    """TestCase for now.collection.prov_execution.profiler module"""
+
+    def run_code(self, provider, code=CODE, sample=1):
+        """Run code with provider. Return activations store"""
+        return self.run_metascript(provider, code, sample).activations_store
+
+    def run_metascript(self, provider, code=CODE, sample=1):
+        """Run code with provider. Return metascript"""
+        args = Args()
+        args.execution_provenance = provider
+        args.sample = sample
+        sys.argv = ["now", "run", "-e", provider, "__init__.py"]
+        metascript = Metascript().read_cmd_args(args)
+        metascript.fake_path(NAME, code.encode("utf-8"))
+
+        import __main__
+        metascript.namespace = __main__.__dict__
+        metascript.clear_sys()
+        metascript.clear_namespace()
+        run(metascript)
+        return metascript
+
+    def check_file_snapshot(self, provider):
+        """Activations after opening an existing file keep their callers"""
+        activations = self.run_code(provider)
+        calls = [
+            (activation.name, activations[activation.caller_id].name)
+            for activation in activations.values()
+            if activation.caller_id in activations.store
+        ]
+        self.assertIn(("read", NAME), calls)
+        self.assertIn(("open", "read"), calls)
+        # file.read (Python 2) or TextIOWrapper.read (Python 3)
+        self.assertTrue(any(
+            name.endswith(".read") and caller == "read"
+            for name, caller in calls))
+        self.assertIn(("len", NAME), calls)
+        self.assertIn(("f", NAME), calls)
+        for activation in activations.values():
+            self.assertIsNotNone(activation.finish, activation.name)
+
+    def test_file_snapshot_profiler(self):
+        self.check_file_snapshot("Profiler")
+
+    def test_file_snapshot_tracer(self):
+        self.check_file_snapshot("Tracer")
+
+    def weights(self, sample):
+        """Return weights of activations of f"""
+        activations = self.run_code("Profiler", LOOP, sample)
+        return [
+            activation.weight for activation in activations.values()
+            if activation.name == "f"
+        ]
+
+    def test_sample_interval(self):
+        # Calls from main level are sampled as well
+        self.assertEqual([3, 3, 3, 3], self.weights(3))
+
+    def test_sample_probability(self):
+        weights = self.weights(0.5)
+        self.assertLessEqual(len(weights), 10)
+        self.assertEqual([2.0] * len(weights), weights)
+
+    def test_no_sample(self):
+        self.assertEqual([1] * 10, self.weights(1))
+
+    def test_library_frames_are_not_line_traced(self):
+        filenames = set()
+        trace_line = Tracer.trace_line
+
+        def record_line(provider, frame, event, arg):
+            """Record filenames of line events"""
+            filenames.add(frame.f_code.co_filename)
+            return trace_line(provider, frame, event, arg)
+
+        Tracer.trace_line = record_line
+        self.addCleanup(setattr, Tracer, "trace_line", trace_line)
+        metascript = self.run_metascript("Tracer", LIBRARY)
+        self.assertGreater(metascript.execution.provider.skipped_frames, 0)
+        self.assertEqual({NAME}, filenames)
+        # Variables of user code are still captured
+        values = {
+            variable.name: variable.value
+            for variable in metascript.variables_store.values()
+        }
+        self.assertEqual("'[1, 2]'", values["y"])
+        self.assertEqual("'[1, 2]'", values["r"])
+
+    def governed_profiler(self):
+        """Return Profiler with a 10% overhead limit inside two activations"""
+        args = Args()
+        args.execution_provenance = "Profiler"
+        args.max_overhead = 10
+        sys.argv = ["now", "run", "-e", "Profiler", "__init__.py"]
+        metascript = Metascript().read_cmd_args(args)
+        provider = Profiler(metascript)
+        # The governor does not depend on enabled. Keep open unchanged
+        provider.teardown()
+        provider.activation_stack.extend([1, 2])
+        provider.depth_user = 2
+        return provider
+
+    def govern(self, provider, overhead):                                        # pylint: disable=no-self-use
+        """Close a 1 second governor window with overhead"""
+        provider.window_start = 0.0
+        provider.tracer_time = overhead
+        provider.govern(1.0)
+
+    def test_governor_untraces_hot_function(self):
+        provider = self.governed_profiler()
+        self.assertEqual(provider.governed_tracer, provider.tracer)
+        for name in ["f", "g", "f", "f"]:
+            self.assertEqual(1, provider.sample_weight("script.py", name))
+        # Below the limit
+        self.govern(provider, 0.05)
+        self.assertEqual(set(), provider.untraced)
+        for name in ["f", "g", "f", "f"]:
+            provider.sample_weight("script.py", name)
+        self.govern(provider, 0.5)
+        self.assertEqual({("script.py", "f")}, provider.untraced)
+        self.assertEqual(0, provider.sample_weight("script.py", "f"))
+        self.assertEqual(1, provider.sample_weight("script.py", "g"))
+        # Below half of the limit
+        self.govern(provider, 0.01)
+        self.assertEqual(set(), provider.untraced)
+        self.assertEqual(1, provider.sample_weight("script.py", "f"))
+        self.assertEqual(["untrace", "trace"], [
+            event.action for event in provider.governor_events.values()])
+
+    def test_governor_lowers_depth(self):
+        provider = self.governed_profiler()
+        provider.governor_untrace = False
+        threshold = provider.depth_threshold
+        provider.sample_weight("script.py", "f")
+        self.govern(provider, 0.5)
+        self.assertEqual(1, provider.depth_target)
+        # Open frames keep their depth
+        provider.follow_depth_target()
+        self.assertEqual(2, provider.depth_threshold)
+        provider.depth_user = 1
+        provider.follow_depth_target()
+        self.assertEqual(1, provider.depth_threshold)
+        self.assertFalse(provider.valid_depth(extra=1))
+        self.govern(provider, 0.01)
+        self.assertEqual(threshold, provider.depth_target)
+        provider.follow_depth_target()
+        self.assertEqual(threshold, provider.depth_threshold)
+        self.assertTrue(provider.valid_depth(extra=1))
+        self.assertEqual(["lower_depth", "raise_depth"], [
+            event.action for event in provider.governor_events.values()])
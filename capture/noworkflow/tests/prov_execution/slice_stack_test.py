@@ -0,0 +1,58 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test slice stack of now.collection.prov_execution.slicing module"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import sys
+import unittest
+
+from ...now.cmd.cmd_run import run
+from ...now.collection.metadata import Metascript
+
+from .call_slicing_test import Args, NAME
+
+
+CODE = ("def fn():\n"
+        "    big = [0] * 1000\n"
+        "    size = len(big)\n"
+        "    return pending(big, size)\n"
+        "r = fn()\n")
+
+
+class TestSliceStack(unittest.TestCase):
+    """Pending lines of the slice stack keep only the values slicing needs"""
+
+    def test_pending_lines_do_not_keep_other_locals(self):
+        sys.argv = ["now", "run", "-e", "Tracer", "__init__.py"]
+        metascript = Metascript().read_cmd_args(Args())
+        metascript.fake_path(NAME, CODE.encode("utf-8"))
+
+        import __main__
+        metascript.namespace = __main__.__dict__
+        metascript.clear_sys()
+        metascript.clear_namespace()
+        retained = []
+
+        def pending(big, size):
+            """Collect pending values that refer to big"""
+            provider = metascript.execution.provider
+            for aid in provider.activation_stack[1:]:
+                for line in provider.activations[aid].slice_stack:
+                    retained.extend(
+                        name for name, value in line[2].items()
+                        if value is big)
+            return size
+
+        metascript.namespace["pending"] = pending
+        run(metascript)
+        # The return line of fn reads only "return"
+        self.assertEqual([], retained)
+        values = {
+            variable.name: variable.value
+            for variable in metascript.variables_store.values()
+        }
+        self.assertEqual("1000", values["size"])
+        self.assertEqual("1000", values["r"])
@@ -0,0 +1,143 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test now.persistence.relational_database module"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import sqlite3
+
+from datetime import datetime
+
+from ..now.persistence import persistence_config, relational
+from ..now.persistence.models import Trial, Activation
+
+from .garbage_test import StoreTestCase
+
+
+class TestRelationalDatabase(StoreTestCase):
+    """TestCase for now.persistence.relational_database module"""
+
+    def trials(self, *ids):
+        """Return rows of trials"""
+        now = datetime.now()
+        return [
+            dict(id=tid, script="script.py", start=now, finish=now)
+            for tid in ids
+        ]
+
+    def stored_trials(self):
+        """Return ids of trials in the provenance database"""
+        relational.session.commit()
+        return sorted(
+            tid for tid, in relational.session.execute("SELECT id FROM trial"))
+
+    def pragma(self, name):
+        """Return pragma value of a new connection"""
+        relational.engine.dispose()
+        with relational.engine.connect() as conn:
+            return conn.execute("PRAGMA {}".format(name)).scalar()
+
+    def test_pragmas(self):
+        self.assertEqual("wal", self.pragma("journal_mode"))
+        self.assertEqual(1, self.pragma("synchronous"))
+        self.addCleanup(setattr, relational, "synchronous", "NORMAL")
+        relational.synchronous = "FULL"
+        self.assertEqual(2, self.pragma("synchronous"))
+
+    def test_store_transaction(self):
+        with relational.store_transaction() as conn:
+            conn.execute(Trial.t.insert(), self.trials(1))
+            with relational.store_transaction() as nested:
+                self.assertIs(conn, nested)
+                nested.execute(Trial.t.insert(), self.trials(2))
+            # Nested calls do not commit
+            self.assertEqual([], self.stored_trials())
+        self.assertIsNone(relational.store_conn)
+        self.assertEqual([1, 2], self.stored_trials())
+
+    def test_store_transaction_rollback(self):
+        with self.assertRaises(ValueError):
+            with relational.store_transaction() as conn:
+                conn.execute(Trial.t.insert(), self.trials(1))
+                with relational.store_transaction() as nested:
+                    nested.execute(Trial.t.insert(), self.trials(2))
+                    raise ValueError("store failed")
+        self.assertIsNone(relational.store_conn)
+        self.assertEqual([], self.stored_trials())
+
+    def start_memory_capture(self, limit=0):
+        """Capture in memory until the end of the test"""
+        relational.start_memory_capture(limit)
+        self.addCleanup(relational.stop_memory_capture)
+
+    def test_memory_capture(self):
+        self.insert(Trial, *self.trials(1))
+        self.start_memory_capture()
+        with relational.store_transaction() as conn:
+            self.assertIs(relational.memory_conn, conn)
+            conn.execute(Trial.t.insert(), self.trials(2, 3))
+            conn.execute(Activation.t.insert(), [
+                dict(trial_id=2, id=aid, name="f") for aid in range(1, 2001)
+            ])
+        self.assertEqual([1], self.stored_trials())
+        size = relational.memory_size()
+        relational.flush_memory()
+        self.assertEqual([1, 2, 3], self.stored_trials())
+        # Freed pages do not count
+        self.assertLess(relational.memory_size(), size)
+        with relational.store_transaction() as conn:
+            conn.execute(Trial.t.insert(), self.trials(4))
+        relational.stop_memory_capture()
+        self.assertIsNone(relational.memory_conn)
+        self.assertEqual([1, 2, 3, 4], self.stored_trials())
+        self.assertEqual(2000, relational.session.execute(
+            "SELECT count(*) FROM function_activation").scalar())
+
+    def test_memory_limit(self):
+        self.start_memory_capture(limit=1)
+        for tid in range(1, 4):
+            with relational.store_transaction() as conn:
+                conn.execute(Trial.t.insert(), self.trials(tid))
+            # Rows above the limit are flushed by the store cycle
+            self.assertEqual(list(range(1, tid + 1)), self.stored_trials())
+
+    def test_add_missing_columns(self):
+        relational.session.close()
+        relational.engine.dispose()
+        # function_activation before start_ns, finish_ns and weight
+        conn = sqlite3.connect(relational.db_path)
+        conn.executescript(
+            "DROP TABLE function_activation;"
+            "CREATE TABLE function_activation ("
+            "    trial_id INTEGER, id INTEGER, name TEXT, line INTEGER,"
+            "    return_value TEXT, start TIMESTAMP, finish TIMESTAMP,"
+            "    caller_id INTEGER, PRIMARY KEY (trial_id, id));"
+            "INSERT INTO trial (id, script, start, finish) VALUES"
+            "    (1, 'script.py', '2016-01-01 10:00:00.000000',"
+            "     '2016-01-01 10:00:02.000000');"
+            "INSERT INTO function_activation VALUES"
+            "    (1, 1, 'script.py', 0, NULL, '2016-01-01 10:00:00.000000',"
+            "     '2016-01-01 10:00:01.500000', NULL);"
+        )
+        conn.commit()
+        conn.close()
+        persistence_config.connect(self.path)
+        columns = {
+            row[1] for row in relational.session.execute(
+                'PRAGMA table_info("function_activation")')
+        }
+        self.assertTrue({"start_ns", "finish_ns", "weight"} <= columns)
+        self.assertIn("ix_function_activation_start_ns", {
+            row[1] for row in relational.session.execute(
+                'PRAGMA index_list("function_activation")')
+        })
+        activation = Activation((1, 1))
+        self.assertIsNone(activation.start_ns)
+        self.assertIsNone(activation.finish_ns)
+        self.assertEqual(1500000, activation.duration)
+        # New rows use the new columns
+        self.insert(Activation, dict(
+            trial_id=1, id=2, name="f", start_ns=1000, finish_ns=3000))
+        self.assertEqual(2, Activation((1, 2)).duration)
@@ -0,0 +1,88 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test now.persistence.retention module"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from ..now.persistence import relational
+from ..now.persistence.models import Trial, Head, Tag, Module
+from ..now.persistence.retention import RetentionPolicy, prune_trials
+from ..now.persistence.retention import trial_models
+
+from .garbage_test import StoreTestCase
+
+
+# Trial id -> script. Trials run in id order, each one child of the previous
+SCRIPTS = {1: "a.py", 2: "a.py", 3: "b.py", 4: "a.py", 5: "b.py",
+           6: "a.py", 7: "b.py"}
+START = datetime(2016, 1, 1)
+
+
+class TestRetention(StoreTestCase):
+    """TestCase for now.persistence.retention module"""
+
+    def setUp(self):
+        super(TestRetention, self).setUp()
+        for tid, script in sorted(SCRIPTS.items()):
+            start = START + timedelta(days=tid)
+            self.insert(Trial, dict(
+                id=tid, script=script, start=start, finish=start,
+                parent_id=tid - 1 if tid > 1 else None,
+                # Trial 6 bypassed modules and inherited them from trial 1
+                inherited_id=1 if tid == 6 else None))
+            self.insert(Module, dict(id=tid, name="module{}".format(tid)))
+            for model in trial_models():
+                # Every trial table receives one row of each trial
+                row = {
+                    column.name: tid for column in model.t.primary_key.columns
+                }
+                row["trial_id"] = tid
+                if model is Tag:
+                    row["type"] = "AUTO"
+                self.insert(model, row)
+        self.insert(Tag, dict(id=100, trial_id=2, type="USER", name="paper"))
+        self.insert(Head, dict(id=1, script="b.py", trial_id=3))
+
+    def column(self, model, name):
+        """Return set of values of column"""
+        column = getattr(model.t.c, name)
+        return {value for value, in relational.session.execute(
+            select([column]))}
+
+    def test_keep_last(self):
+        keep, remove = RetentionPolicy(keep_last=1).select()
+        # 6 and 7 are the last of each script, 2 is tagged, 3 is a head
+        # and 1 is inherited by 6
+        self.assertEqual({1, 2, 3, 6, 7}, keep)
+        self.assertEqual({4, 5}, remove)
+
+    def test_keep_since(self):
+        keep, remove = RetentionPolicy(
+            keep_since=START + timedelta(days=5), keep_tagged=False).select()
+        self.assertEqual({1, 3, 5, 6, 7}, keep)
+        self.assertEqual({2, 4}, remove)
+
+    def test_prune_removes_rows_of_every_trial_table(self):
+        keep, remove = RetentionPolicy(keep_last=1).select()
+        self.assertEqual(2, prune_trials(remove))
+        self.assertEqual(keep, self.column(Trial, "id"))
+        for model in trial_models():
+            self.assertEqual(keep, self.column(model, "trial_id"),
+                             model.__name__)
+        # Modules without dependencies are removed
+        self.assertEqual(keep, self.column(Module, "id"))
+        self.assertEqual({3}, self.column(Head, "trial_id"))
+
+    def test_prune_links_children_to_kept_ancestor(self):
+        _, remove = RetentionPolicy(keep_last=1).select()
+        prune_trials(remove)
+        ttrial = Trial.t
+        parents = dict(list(relational.session.execute(
+            select([ttrial.c.id, ttrial.c.parent_id]))))
+        self.assertEqual({1: None, 2: 1, 3: 2, 6: 3, 7: 6}, parents)
@@ -0,0 +1,97 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test now.persistence.serializers module"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import unittest
+from array import array
+from ..now.persistence.serializers import SimpleSerializer, create_serializer
+from ..now.persistence.serializers import CONTENT_PREFIX
+
+try:
+    import numpy
+except ImportError:
+    numpy = None                                                                 # pylint: disable=invalid-name
+
+
+class TestSimpleSerializer(unittest.TestCase):
+    """TestCase for now.persistence.serializers.SimpleSerializer"""
+
+    def test_containers(self):
+        serialize = SimpleSerializer().serialize
+        self.assertEqual("list([1, tuple([{!r}])])".format("a"),
+                         serialize([1, ("a",)]))
+        self.assertEqual("dict([(1, 2)])", serialize({1: 2}))
+        self.assertEqual("array(i, [1, 2])", serialize(array("i", [1, 2])))
+
+    def test_budgets(self):
+        serialize = SimpleSerializer(max_length=20).serialize
+        result = serialize(list(range(10 ** 6)))
+        self.assertEqual(20, len(result))
+        self.assertTrue(result.endswith("..."))
+        self.assertEqual(20, len(serialize("x" * 10 ** 6)))
+        serialize = SimpleSerializer(max_depth=1).serialize
+        self.assertEqual("list([list([...])])", serialize([[[1]]]))
+
+    def test_registered_handler_applies_to_subclasses(self):
+        class Base(object):
+            """Registered type"""
+
+        class Derived(Base):
+            """Subclass of registered type"""
+
+        class Serializer(SimpleSerializer):                                      # pylint: disable=too-few-public-methods
+            """Serializer with its own registry"""
+            handlers = dict(SimpleSerializer.handlers)
+            dispatch = {}
+
+        @Serializer.register(Base)
+        def handler(serializer, obj, out, budget, level):                        # pylint: disable=unused-argument, unused-variable
+            """Serialize Base"""
+            serializer.emit("base", out, budget)
+
+        self.assertEqual("list([base])", Serializer().serialize([Derived()]))
+        self.assertNotIn(Base, SimpleSerializer.handlers)
+
+    def test_failing_handler_uses_default_handler(self):
+        class Broken(list):
+            """List that cannot be iterated"""
+
+            def __iter__(self):
+                raise ValueError("broken")
+
+        result = SimpleSerializer().serialize([1, Broken()])
+        self.assertTrue(result.startswith("list([1, <Broken instance at 0x"))
+        self.assertTrue(result.endswith(">])"))
+
+    def test_large_values_are_stored_as_content(self):
+        serialize = create_serializer("repr", threshold=10)
+        self.assertEqual(repr("short"), serialize("short"))
+        reference = serialize("x" * 20)
+        self.assertTrue(reference.startswith(CONTENT_PREFIX))
+        self.assertEqual(reference, serialize("x" * 20))
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_ndarray_summary(self):
+        serialize = SimpleSerializer().serialize
+        matrix = numpy.arange(6.0).reshape(2, 3)
+        result = serialize(matrix)
+        self.assertTrue(result.startswith(
+            "ndarray(shape=(2, 3), dtype=float64, nbytes=48, digest="))
+        self.assertTrue(result.endswith("head=list([0.0, 1.0, 2.0]))"))
+        self.assertEqual(result, serialize(matrix.copy()))
+        self.assertNotEqual(result, serialize(matrix + 1))
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_ndarray_subclasses(self):
+        serialize = SimpleSerializer().serialize
+        masked = numpy.ma.masked_array([1.0, 2.0, 3.0], mask=[0, 1, 0])
+        result = serialize(masked)
+        self.assertTrue(result.startswith(
+            "MaskedArray(shape=(3,), dtype=float64, nbytes=24, digest="))
+        self.assertEqual(result, serialize(masked.copy()))
+        self.assertTrue(serialize(numpy.matrix([[1, 2, 3]])).endswith(
+            "head=list([1, 2, 3]))"))
@@ -0,0 +1,56 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test now.persistence.models.graphs.trial_graph module"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+from datetime import datetime
+
+from ..now.persistence.models import Trial, Activation, AggregateActivation
+
+from .garbage_test import StoreTestCase
+
+
+class TestTrialGraph(StoreTestCase):
+    """TestCase for now.persistence.models.graphs.trial_graph module"""
+
+    def setUp(self):
+        super(TestTrialGraph, self).setUp()
+        now = datetime.now()
+        self.insert(Trial, dict(
+            id=1, script="script.py", start=now, finish=now))
+        # script.py calls f twice. f calls h 8 times, folded in 2 records
+        self.insert(Activation, *[
+            dict(trial_id=1, id=aid, name=name, line=line, caller_id=caller,
+                 start=now, finish=now, start_ns=aid, finish_ns=aid + 1000)
+            for aid, name, line, caller in [
+                (1, "script.py", 0, None), (2, "f", 5, 1), (3, "f", 5, 1)
+            ]
+        ])
+        self.insert(AggregateActivation, *[
+            dict(trial_id=1, id=aid, name="h", line=2, caller_id=caller,
+                 count=count, total_duration=count * 10)
+            for aid, caller, count in [(1, 2, 5), (2, 3, 3)]
+        ])
+
+    def test_all_modes(self):
+        trial = Trial(1, graph_use_cache=False)
+        graph = trial.graph
+        for mode in sorted(graph._modes):                                        # pylint: disable=protected-access
+            finished, _, nodes = graph._modes[mode]()                            # pylint: disable=protected-access
+            self.assertTrue(finished)
+            self.assertEqual(
+                ["script.py", "f"], [node.name for node in nodes][:2], mode)
+
+    def test_aggregates(self):
+        trial = Trial(1, graph_use_cache=False)
+        graph = trial.graph
+        for mode, nodes_h in [(1, 2), (3, 1)]:
+            nodes = [
+                node for node in graph._modes[mode]()[2]                         # pylint: disable=protected-access
+                if node.name == "h"
+            ]
+            self.assertEqual(nodes_h, len(nodes), mode)
+            self.assertEqual(8, sum(node.calls[1] for node in nodes), mode)
@@ -0,0 +1,27 @@
+"""Compare the simple serializer with repr on large values
+Run it with python, not with now run"""
+from __future__ import print_function
+
+import timeit
+
+from noworkflow.now.persistence.serializers import SimpleSerializer
+
+
+serialize = SimpleSerializer().serialize
+values = {
+    "int": 10,
+    "small list": [1, 2, 3],
+    "large list": list(range(10 ** 7)),
+    "large dict": {i: str(i) for i in range(10 ** 6)},
+    "large str": "x" * 10 ** 7,
+    "nested": [[list(range(1000))] * 1000] * 10,
+}
+
+print("{:<12} {:>12} {:>12} {:>10} {:>10}".format(
+    "value", "repr (s)", "simple (s)", "repr len", "simple len"))
+for name, value in values.items():
+    number = 1000 if name in ("int", "small list") else 1
+    repr_time = timeit.timeit(lambda: repr(value), number=number) / number
+    simple_time = timeit.timeit(lambda: serialize(value), number=number) / number
+    print("{:<12} {:>12.6f} {:>12.6f} {:>10} {:>10}".format(
+        name, repr_time, simple_time, len(repr(value)), len(serialize(value))))